@@ -5,46 +5,148 @@ Usage:
   python import_courses.py ../Digital_Accessibility_Framework_Course_Mapping__4_.xlsx ../content/courses
 
 This script reads the spreadsheet and writes one .md file per course with YAML frontmatter.
+The first sheet is streamed row by row (openpyxl read-only mode), so large catalogs
+import in bounded memory. Course files whose content is unchanged are left alone and
+keep their date_added. Courses sharing a title get the slugs <slug>, <slug>-2, <slug>-3
+... in spreadsheet order, so each keeps its own file from run to run.
+
+It also writes catalog.json next to the course files, so a course browser can list and
+filter every course with one download:
+  fields   column names of the rows in courses
+  courses  one compact row per course, sorted by title
+  facets   facet -> value -> positions in courses (framework, type, level, duration)
+  counts   facet -> value -> number of courses
+  slugs    slug -> position in courses
 """
 import sys
-import os
-import pandas as pd
+import re
+import json
+import datetime
 from pathlib import Path
+from openpyxl import load_workbook
+
+date_added_re = re.compile(r'^date_added: "(.*)"$', re.M)
+length_re = re.compile(r'^\s*(?:(\d+)\s*h)?\s*(?:(\d+)\s*m)?\s*$')
+CATALOG_FIELDS = ['slug', 'title', 'framework', 'type', 'level', 'duration', 'minutes']
+FACETS = ['framework', 'type', 'level', 'duration']
+# duration facet buckets: (upper bound in minutes, label)
+DURATION_BUCKETS = [(60, 'Under 1h'), (180, '1h-3h'), (600, '3h-10h'), (None, '10h+')]
 
 def slugify(s):
     return ''.join(c.lower() if c.isalnum() else '-' for c in s).strip('-').replace('--','-')
 
+def unique_slug(slug, taken):
+    """slug, or the first of slug-2, slug-3 ... not in taken."""
+    candidate, n = slug, 1
+    while candidate in taken:
+        n += 1
+        candidate = f"{slug}-{n}"
+    return candidate
+
+def cell(value):
+    return '' if value is None else value
+
+def iter_courses(src_xlsx):
+    """Yield one dict per spreadsheet row, keyed by the header row."""
+    wb = load_workbook(src_xlsx, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = [str(h).strip() if h is not None else '' for h in next(rows, ())]
+        for values in rows:
+            yield dict(zip(header, values))
+    finally:
+        wb.close()
+
+def render(row, slug, date_added):
+    title = str(row.get('Course Title') or row.get('Course') or '')
+    desc = cell(row.get('Description'))
+    front = ["---",
+             f"title: \"{title}\"",
+             f"slug: \"{slug}\"",
+             f"framework: \"{cell(row.get('Framework'))}\"",
+             f"type: \"{cell(row.get('Type'))}\"",
+             f"duration: \"{cell(row.get('Length'))}\"",
+             f"level: \"{cell(row.get('Level'))}\"",
+             f"description_excerpt: \"{desc}\"",
+             f"linkedin_url: \"\"",
+             f"source: \"imported_spreadsheet\"",
+             f"date_added: \"{date_added}\"",
+             "---\n"]
+    return '\n'.join(front) + '\n' + str(desc)
+
+def length_minutes(length):
+    m = length_re.match(str(length))
+    if not m or not any(m.groups()):
+        return None
+    return int(m.group(1) or 0) * 60 + int(m.group(2) or 0)
+
+def catalog_record(row, slug, title):
+    length = str(cell(row.get('Length'))).strip()
+    return {'slug': slug, 'title': title, 'framework': str(cell(row.get('Framework'))).strip(),
+            'type': str(cell(row.get('Type'))).strip(), 'level': str(cell(row.get('Level'))).strip(),
+            'duration': length, 'minutes': length_minutes(length)}
+
+def facet_values(course, facet):
+    if facet == 'duration':
+        if course['minutes'] is None:
+            return []
+        return [next(label for bound, label in DURATION_BUCKETS if bound is None or course['minutes'] < bound)]
+    if facet == 'level':
+        # e.g. "Beginner,Intermediate" belongs to both levels
+        return [v.strip() for v in course['level'].split(',') if v.strip()]
+    return [course[facet]] if course[facet] else []
+
+def build_catalog(courses):
+    """courses: slug -> catalog record. Returns the catalog.json structure."""
+    ordered = sorted(courses.values(), key=lambda c: (c['title'].lower(), c['slug']))
+    facets = {facet: {} for facet in FACETS}
+    for pos, course in enumerate(ordered):
+        for facet in FACETS:
+            for value in facet_values(course, facet):
+                facets[facet].setdefault(value, []).append(pos)
+    return {
+        'fields': CATALOG_FIELDS,
+        'courses': [[c[f] for f in CATALOG_FIELDS] for c in ordered],
+        'facets': {f: dict(sorted(values.items())) for f, values in facets.items()},
+        'counts': {f: {v: len(p) for v, p in sorted(values.items())} for f, values in facets.items()},
+        'slugs': {c['slug']: pos for pos, c in enumerate(ordered)},
+    }
+
+def write_catalog(out_dir, courses):
+    path = Path(out_dir) / 'catalog.json'
+    text = json.dumps(build_catalog(courses), ensure_ascii=False, separators=(',', ':')) + '\n'
+    if path.exists() and path.read_text(encoding='utf-8') == text:
+        return False
+    path.write_text(text, encoding='utf-8')
+    return True
+
 def main(src_xlsx, out_dir):
-    df = pd.read_excel(src_xlsx)
     Path(out_dir).mkdir(parents=True, exist_ok=True)
-    for idx, row in df.iterrows():
-        title = str(row.get('Course Title') or row.get('Course') or row.get('Course Title'))
+    today = datetime.date.today().isoformat()
+    written = unchanged = 0
+    courses = {}
+    for row in iter_courses(src_xlsx):
+        title = str(row.get('Course Title') or row.get('Course') or '')
         if not title or title.lower().startswith('nan'):
             continue
-        framework = row.get('Framework', '')
-        typ = row.get('Type', '')
-        duration = row.get('Length', '')
-        level = row.get('Level', '')
-        desc = row.get('Description', '')
-        slug = slugify(title)
+        slug = unique_slug(slugify(title), courses)
+        courses[slug] = catalog_record(row, slug, title)
         filename = Path(out_dir) / f"{slug}.md"
-        front = ["---",
-                 f"title: \"{title}\"",
-                 f"slug: \"{slug}\"",
-                 f"framework: \"{framework}\"",
-                 f"type: \"{typ}\"",
-                 f"duration: \"{duration}\"",
-                 f"level: \"{level}\"",
-                 f"description_excerpt: \"{desc}\"",
-                 f"linkedin_url: \"\"",
-                 f"source: \"imported_spreadsheet\"",
-                 f"date_added: \"{pd.Timestamp('today').date()}\"",
-                 "---\n"]
+        try:
+            old = filename.read_text(encoding='utf-8')
+        except OSError:
+            old = None
+        if old is not None:
+            m = date_added_re.search(old)
+            if m and render(row, slug, m.group(1)) == old:
+                unchanged += 1
+                continue
         with open(filename, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(front))
-            f.write('\n')
-            f.write(desc or '')
-    print(f"Wrote course files to {out_dir}")
+            f.write(render(row, slug, today))
+        written += 1
+    print(f"Wrote {written} course files to {out_dir} ({unchanged} unchanged)")
+    if write_catalog(out_dir, courses):
+        print(f"Wrote catalog index for {len(courses)} courses to {Path(out_dir) / 'catalog.json'}")
 
 if __name__ == '__main__':
     if len(sys.argv) < 3:
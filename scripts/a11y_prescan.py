@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Static accessibility pre-scan: markup checks that need no browser, run ahead
+of the Playwright axe scan (run-axe-playwright.js).
+Usage: python3 scripts/a11y_prescan.py                     # work/web and docs
+       python3 scripts/a11y_prescan.py --fail-on moderate docs/home.html
+       python3 scripts/a11y_prescan.py --clean-list work/output/axe-clean-pages.txt
+       node scripts/run-axe-playwright.js --pages work/output/axe-clean-pages.txt
+
+Every page is parsed once, across a process pool, and checked against the
+axe rules that only depend on the markup: image-alt, input-image-alt, label,
+select-name, duplicate-id(-aria), heading-order, html-has-lang,
+document-title, landmark-one-main, bypass and skip-link. Results are written
+per page in the axe-core result format (violations / passes / inapplicable,
+same rule ids, impacts, tags and help URLs) to work/output/axe-prescan/, so
+parse-axe-reports.js and other axe tooling read them unchanged, together with
+summary.json. A report keeps its timestamp while its results stay the same,
+so a rerun only rewrites the reports of pages whose results changed.
+
+The scan exits with status 2 when a violation at or above --fail-on (default
+serious) is found. --clean-list writes the pages with no violations in the
+form run-axe-playwright.js --pages expects, so only those go to the browser.
+Styles and scripts are not evaluated: hidden content is only recognised by
+aria-hidden/hidden on the element itself.
+"""
+import argparse, datetime, json, os, sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+from pathlib import Path
+
+import metrics
+from file_sync import write_if_changed
+
+repo = Path(__file__).resolve().parents[1]
+DEFAULT_DIRS = [repo / 'work' / 'web', repo / 'docs']
+DEFAULT_OUT = repo / 'work' / 'output' / 'axe-prescan'
+ENGINE = {'name': 'azaccess-prescan', 'version': '1.0.0'}
+AXE_VERSION = '4.11'
+IMPACTS = ['minor', 'moderate', 'serious', 'critical']
+# below this many pages a process pool costs more than it saves
+PARALLEL_MIN = 16
+VOID = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source', 'track', 'wbr'}
+UNLABELLED_INPUTS = {'hidden', 'submit', 'button', 'reset', 'image'}
+HTML_SNIPPET = 250
+
+# id -> (impact, tags, description, help), as in axe-core 4.11
+RULES = {
+    'image-alt': ('critical', ['cat.text-alternatives', 'wcag2a', 'wcag111', 'section508', 'section508.22.a', 'TTv5', 'TT7.a', 'TT7.b', 'EN-301-549', 'EN-9.1.1.1', 'ACT', 'RGAAv4', 'RGAA-1.1.1'],
+                  'Ensure <img> elements have alternative text or a role of none or presentation', 'Images must have alternative text'),
+    'input-image-alt': ('critical', ['cat.text-alternatives', 'wcag2a', 'wcag111', 'wcag412', 'section508', 'section508.22.a', 'TTv5', 'TT7.a', 'EN-301-549', 'EN-9.1.1.1', 'EN-9.4.1.2', 'ACT', 'RGAAv4', 'RGAA-1.1.3'],
+                        'Ensure <input type="image"> elements have alternative text', 'Image buttons must have alternative text'),
+    'label': ('critical', ['cat.forms', 'wcag2a', 'wcag412', 'section508', 'section508.22.n', 'TTv5', 'TT5.c', 'EN-301-549', 'EN-9.4.1.2', 'ACT', 'RGAAv4', 'RGAA-11.1.1'],
+              'Ensure every form element has a label', 'Form elements must have labels'),
+    'select-name': ('critical', ['cat.forms', 'wcag2a', 'wcag412', 'section508', 'section508.22.n', 'TTv5', 'TT5.c', 'EN-301-549', 'EN-9.4.1.2', 'ACT', 'RGAAv4', 'RGAA-11.1.1'],
+                    'Ensure select element has an accessible name', 'Select element must have an accessible name'),
+    'duplicate-id-aria': ('critical', ['cat.parsing', 'wcag2a', 'wcag412', 'EN-301-549', 'EN-9.4.1.2', 'RGAAv4', 'RGAA-8.2.1'],
+                          'Ensure every id attribute value used in ARIA and in labels is unique', 'IDs used in ARIA and labels must be unique'),
+    'duplicate-id': ('minor', ['cat.parsing', 'wcag2a-obsolete', 'wcag411', 'deprecated'],
+                     'Ensure every id attribute value is unique', 'id attribute value must be unique'),
+    'heading-order': ('moderate', ['cat.semantics', 'best-practice'],
+                      'Ensure the order of headings is semantically correct', 'Heading levels should only increase by one'),
+    'html-has-lang': ('serious', ['cat.language', 'wcag2a', 'wcag311', 'TTv5', 'TT11.a', 'EN-301-549', 'EN-9.3.1.1', 'ACT', 'RGAAv4', 'RGAA-8.3.1'],
+                      'Ensure every HTML document has a lang attribute', '<html> element must have a lang attribute'),
+    'document-title': ('serious', ['cat.text-alternatives', 'wcag2a', 'wcag242', 'TTv5', 'TT12.a', 'EN-301-549', 'EN-9.2.4.2', 'ACT', 'RGAAv4', 'RGAA-8.5.1'],
+                       'Ensure each HTML document contains a non-empty <title> element', 'Documents must have <title> element to aid in navigation'),
+    'landmark-one-main': ('moderate', ['cat.semantics', 'best-practice'],
+                          'Ensure the document has a main landmark', 'Document should have one main landmark'),
+    'bypass': ('serious', ['cat.keyboard', 'wcag2a', 'wcag241', 'section508', 'section508.22.o', 'TTv5', 'TT9.a', 'EN-301-549', 'EN-9.2.4.1', 'RGAAv4', 'RGAA-12.7.1'],
+               'Ensure each page has at least one mechanism for a user to bypass navigation and jump straight to the content', 'Page must have means to bypass repeated blocks'),
+    'skip-link': ('moderate', ['cat.keyboard', 'best-practice', 'RGAAv4', 'RGAA-12.7.1'],
+                  'Ensure all skip links have a focusable target', 'The skip-link target should exist and be focusable'),
+}
+
+def help_url(rule_id):
+    return 'https://dequeuniversity.com/rules/axe/{}/{}?application=axeAPI'.format(AXE_VERSION, rule_id)
+
+def css_escape(value):
+    return ''.join(c if c.isalnum() or c in '-_' else '\\' + c for c in value)
+
+class PageScanner(HTMLParser):
+    """Collects what the rules need in one pass: elements of interest with their
+    selector, line and start tag, plus ids, labels and headings."""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []              # (tag, attrs, child counts, selector piece)
+        self.top_counts = Counter()
+        self.html_attrs = None
+        self.title = None
+        self.in_title = False
+        self.ids = {}                # id -> [nodes]
+        self.referenced = set()      # ids used by aria-* / label for
+        self.label_for = set()
+        self.images, self.image_inputs, self.controls, self.selects = [], [], [], []
+        self.headings = []           # (level, node)
+        self.main = False
+        self.links = []              # [node, href, text parts]
+        self.open_links = []
+
+    def node(self, tag, attrs):
+        pieces = []
+        for t, a, _, piece in reversed(self.stack):
+            if a.get('id'):
+                pieces.append('#' + css_escape(a['id']))
+                break
+            pieces.append(piece)
+        pieces.reverse()
+        if attrs.get('id'):
+            target = '#' + css_escape(attrs['id'])
+        elif tag in ('html', 'head', 'body'):
+            target = tag
+        else:
+            counts = self.stack[-1][2] if self.stack else self.top_counts
+            target = ' > '.join(pieces + ['{}:nth-of-type({})'.format(tag, counts[tag])])
+        raw = self.get_starttag_text() or '<{}>'.format(tag)
+        return {'target': [target], 'html': raw if len(raw) <= HTML_SNIPPET else raw[:HTML_SNIPPET] + '...',
+                'line': self.getpos()[0], 'attrs': attrs}
+
+    def handle_starttag(self, tag, attrs):
+        a = {}
+        for k, v in attrs:
+            a.setdefault(k, '' if v is None else v)
+        parent = self.stack[-1][2] if self.stack else self.top_counts
+        parent[tag] += 1
+        node = None
+        if a.get('id'):
+            node = self.node(tag, a)
+            self.ids.setdefault(a['id'], []).append(node)
+        for k in ('aria-labelledby', 'aria-describedby', 'aria-controls', 'aria-owns', 'aria-activedescendant'):
+            self.referenced.update(a.get(k, '').split())
+        hidden = a.get('aria-hidden') == 'true' or 'hidden' in a
+        role = a.get('role', '').strip().lower()
+        if tag == 'html':
+            self.html_attrs = a
+        elif tag == 'title' and self.title is None:
+            self.in_title = True
+            self.title = ''
+        elif tag == 'main' or role == 'main':
+            self.main = True
+        if tag == 'label':
+            if a.get('for'):
+                self.label_for.add(a['for'])
+                self.referenced.add(a['for'])
+        elif tag == 'img' and not hidden:
+            self.images.append(node or self.node(tag, a))
+        elif tag == 'input' and not hidden:
+            kind = a.get('type', 'text').lower()
+            if kind == 'image':
+                self.image_inputs.append(node or self.node(tag, a))
+            elif kind not in UNLABELLED_INPUTS:
+                self.controls.append((node or self.node(tag, a), self.inside('label')))
+        elif tag == 'textarea' and not hidden:
+            self.controls.append((node or self.node(tag, a), self.inside('label')))
+        elif tag == 'select' and not hidden:
+            self.selects.append((node or self.node(tag, a), self.inside('label')))
+        if len(tag) == 2 and tag[0] == 'h' and tag[1] in '123456' and role in ('', 'heading'):
+            self.headings.append((int(tag[1]), node or self.node(tag, a)))
+        elif role == 'heading' and a.get('aria-level', '').isdigit():
+            self.headings.append((int(a['aria-level']), node or self.node(tag, a)))
+        if tag == 'a' and a.get('href', '').startswith('#'):
+            link = [node or self.node(tag, a), a['href'], []]
+            self.links.append(link)
+            self.open_links.append(link)
+        if tag not in VOID:
+            piece = tag if tag in ('html', 'head', 'body') else '{}:nth-of-type({})'.format(tag, parent[tag])
+            self.stack.append((tag, a, Counter(), piece))
+
+    def inside(self, tag):
+        return any(t == tag for t, _, _, _ in self.stack)
+
+    def handle_endtag(self, tag):
+        if tag == 'title':
+            self.in_title = False
+        elif tag == 'a' and self.open_links:
+            self.open_links.pop()
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i][0] == tag:
+                del self.stack[i:]
+                break
+
+    def handle_data(self, data):
+        if self.in_title:
+            self.title += data
+        for link in self.open_links:
+            link[2].append(data)
+
+def has_text_alternative(a):
+    return any(a.get(k, '').strip() for k in ('aria-label', 'aria-labelledby', 'title'))
+
+def check(rule_id, message, node):
+    """One axe node result for a failed check."""
+    impact = RULES[rule_id][0]
+    return {
+        'any': [{'id': rule_id, 'data': {'line': node['line']}, 'relatedNodes': [], 'impact': impact, 'message': message}],
+        'all': [], 'none': [], 'impact': impact, 'html': node['html'], 'target': node['target'],
+        'failureSummary': 'Fix any of the following:\n  ' + message,
+    }
+
+def evaluate(p):
+    """Returns rule id -> (applicable, [failed node results])."""
+    results = {}
+    root = {'target': ['html'], 'html': '<html>', 'line': 1, 'attrs': {}}
+
+    nodes = [check('image-alt', 'Element does not have an alt attribute', n) for n in p.images
+             if 'alt' not in n['attrs'] and n['attrs'].get('role') not in ('none', 'presentation') and not has_text_alternative(n['attrs'])]
+    results['image-alt'] = (bool(p.images), nodes)
+    nodes = [check('input-image-alt', 'Element has no alt attribute or the alt attribute is empty', n) for n in p.image_inputs
+             if not n['attrs'].get('alt', '').strip() and not has_text_alternative(n['attrs'])]
+    results['input-image-alt'] = (bool(p.image_inputs), nodes)
+
+    def labelled(node, wrapped):
+        a = node['attrs']
+        return wrapped or has_text_alternative(a) or a.get('placeholder', '').strip() or (a.get('id') and a['id'] in p.label_for)
+    results['label'] = (bool(p.controls), [check('label', 'Form element does not have an implicit (wrapped) <label>, an explicit <label> or an aria-label', n)
+                                           for n, wrapped in p.controls if not labelled(n, wrapped)])
+    results['select-name'] = (bool(p.selects), [check('select-name', 'Element does not have an implicit (wrapped) <label>, an explicit <label> or an aria-label', n)
+                                                for n, wrapped in p.selects if not labelled(n, wrapped)])
+
+    dupes = {i: nodes for i, nodes in p.ids.items() if len(nodes) > 1}
+    results['duplicate-id-aria'] = (bool(p.referenced & set(p.ids)), [
+        check('duplicate-id-aria', 'Document has multiple elements referenced with ARIA with the same id attribute: ' + i, n)
+        for i, nodes in dupes.items() if i in p.referenced for n in nodes[1:]])
+    results['duplicate-id'] = (bool(p.ids), [
+        check('duplicate-id', 'Document has multiple static elements with the same id attribute: ' + i, n)
+        for i, nodes in dupes.items() if i not in p.referenced for n in nodes[1:]])
+
+    nodes, previous = [], None
+    for level, n in p.headings:
+        if previous is not None and level > previous + 1:
+            nodes.append(check('heading-order', 'Heading order invalid', n))
+        previous = level
+    results['heading-order'] = (bool(p.headings), nodes)
+
+    html_node = dict(root, html=('<html' + ''.join(' {}="{}"'.format(k, v) for k, v in (p.html_attrs or {}).items()) + '>'))
+    lang = (p.html_attrs or {}).get('lang', '').strip() or (p.html_attrs or {}).get('xml:lang', '').strip()
+    results['html-has-lang'] = (True, [] if lang else [check('html-has-lang', 'The <html> element does not have a lang attribute', html_node)])
+    results['document-title'] = (True, [] if (p.title or '').strip() else [check('document-title', 'Document does not have a non-empty <title> element', html_node)])
+    results['landmark-one-main'] = (True, [] if p.main else [check('landmark-one-main', 'Document does not have a main landmark', html_node)])
+
+    def target_exists(href):
+        return href[1:] in p.ids
+    internal = any(len(href) > 1 and target_exists(href) for _, href, _ in p.links)
+    results['bypass'] = (True, [] if p.main or p.headings or internal else
+                         [check('bypass', 'No valid skip link found; page does not have a heading; page does not have a landmark region', html_node)])
+    skip_links = [(n, href) for n, href, text in p.links
+                  if len(href) > 1 and ('skip-link' in n['attrs'].get('class', '').split() or ''.join(text).strip().lower().startswith('skip'))]
+    results['skip-link'] = (bool(skip_links), [check('skip-link', 'No skip link target', n) for n, href in skip_links if not target_exists(href)])
+    return results
+
+def scan_page(path):
+    """Parse and check one HTML file; returns (path, size, {rule id: (applicable, nodes)})."""
+    data = Path(path).read_bytes()
+    p = PageScanner()
+    p.feed(data.decode('utf-8', errors='ignore'))
+    p.close()
+    return str(path), len(data), evaluate(p)
+
+def rule_result(rule_id, nodes):
+    impact, tags, description, help_text = RULES[rule_id]
+    return {'id': rule_id, 'impact': impact if nodes else None, 'tags': tags, 'description': description,
+            'help': help_text, 'helpUrl': help_url(rule_id), 'nodes': nodes}
+
+def axe_report(path, results, timestamp):
+    report = {'testEngine': ENGINE, 'testRunner': {'name': 'a11y_prescan.py'}, 'testEnvironment': {},
+              'timestamp': timestamp, 'url': relpath(path), 'toolOptions': {'reporter': 'v1'},
+              'inapplicable': [], 'passes': [], 'incomplete': [], 'violations': []}
+    for rule_id in RULES:
+        applicable, nodes = results[rule_id]
+        key = 'violations' if nodes else 'passes' if applicable else 'inapplicable'
+        report[key].append(rule_result(rule_id, nodes))
+    return report
+
+def relpath(path):
+    try:
+        return Path(path).resolve().relative_to(repo).as_posix()
+    except ValueError:
+        return str(path)
+
+def report_name(path):
+    # like run-axe-playwright.js (/home.html -> _home.html.json) but after the repo
+    # path, as work/web and docs share page names: work/web/home.html -> _work_web_home.html.json
+    return '_' + relpath(path).replace('/', '_') + '.json'
+
+def keep_timestamp(path, data):
+    """Reuse the timestamp already in path if nothing else in data changed."""
+    try:
+        with open(path, encoding='utf-8') as fh:
+            old = json.load(fh)
+    except (OSError, ValueError):
+        return data
+    if isinstance(old, dict) and 'timestamp' in old and dict(old, timestamp=data['timestamp']) == data:
+        data['timestamp'] = old['timestamp']
+    return data
+
+def find_pages(targets):
+    files = []
+    for t in targets:
+        t = Path(t)
+        if t.is_dir():
+            files += sorted(t.glob('*.html'))
+        elif t.is_file():
+            files.append(t)
+    return [str(f) for f in files]
+
+def scan(files, jobs=None):
+    if jobs == 1 or len(files) < PARALLEL_MIN:
+        return [scan_page(f) for f in files]
+    with ProcessPoolExecutor(max_workers=jobs) as ex:
+        return list(ex.map(scan_page, files, chunksize=max(1, len(files) // ((jobs or os.cpu_count() or 1) * 4))))
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Static accessibility pre-scan writing axe-compatible JSON reports.')
+    ap.add_argument('paths', nargs='*', default=[str(d) for d in DEFAULT_DIRS], help='HTML files or directories (default: work/web and docs)')
+    ap.add_argument('--jobs', type=int, default=None, help='worker processes (default: all cores)')
+    ap.add_argument('--out', default=str(DEFAULT_OUT), help='directory for the per-page reports and summary.json')
+    ap.add_argument('--fail-on', choices=IMPACTS + ['none'], default='serious',
+                    help='exit with status 2 if a violation of at least this impact is found (default serious)')
+    ap.add_argument('--clean-list', metavar='FILE', help='write the pages without violations, one URL path per line, for run-axe-playwright.js --pages')
+    metrics.add_arguments(ap)
+    args = ap.parse_args(argv)
+    stats = metrics.from_args('a11y_prescan', args)
+
+    with stats.stage('discover'):
+        files = find_pages(args.paths)
+    print('Scanning', len(files), 'HTML files')
+    # workers read, parse and check the pages
+    with stats.stage('parse'):
+        scanned = scan(files, args.jobs)
+
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+    by_rule, failing, clean = Counter(), {}, []
+    threshold = IMPACTS.index(args.fail_on) if args.fail_on != 'none' else len(IMPACTS)
+    worst = -1
+    with stats.stage('write'):
+        written = set()
+        for path, size, results in scanned:
+            stats.count('bytes', size)
+            report = axe_report(path, results, timestamp)
+            name = report_name(path)
+            # same layout as run-axe-playwright.js writes (JSON.stringify(results, null, 2))
+            if write_if_changed(out / name, json.dumps(keep_timestamp(out / name, report), indent=2, ensure_ascii=False)):
+                stats.count('files_written')
+            written.add(name)
+            if report['violations']:
+                failing[relpath(path)] = {v['id']: len(v['nodes']) for v in report['violations']}
+                for v in report['violations']:
+                    by_rule[v['id']] += len(v['nodes'])
+                    worst = max(worst, IMPACTS.index(v['impact']))
+            else:
+                clean.append(path)
+        for stale in out.glob('_*.json'):
+            if stale.name not in written:
+                stale.unlink()
+        summary = {'timestamp': timestamp, 'pages': len(scanned), 'clean': len(clean), 'violations': dict(by_rule.most_common()),
+                   'pages_with_violations': dict(sorted(failing.items()))}
+        write_if_changed(out / 'summary.json', json.dumps(keep_timestamp(out / 'summary.json', summary), indent=2, ensure_ascii=False) + '\n')
+        if args.clean_list:
+            # the browser scan serves work/web and docs from one root, so a name is only
+            # clean when every page with that name is
+            dirty = {Path(p).name for p in failing}
+            names = sorted({Path(p).name for p in clean} - dirty)
+            write_if_changed(args.clean_list, ''.join('/' + name + '\n' for name in names))
+    stats.count('files', len(scanned))
+    stats.count('violations', sum(by_rule.values()))
+
+    print('Pages with violations: {} of {} (reports in {})'.format(len(failing), len(scanned), relpath(out)))
+    for rule_id, count in by_rule.most_common():
+        print('- {} ({}): {} node(s)'.format(rule_id, RULES[rule_id][0], count))
+    if args.clean_list:
+        print('Clean pages listed in', args.clean_list)
+    stats.finish()
+    return 2 if worst >= threshold else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
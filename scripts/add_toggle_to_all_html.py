@@ -3,29 +3,28 @@
 Add a nav toggle button and include header.js to all HTML files under work/web.
 Conservative: only modifies files that contain a .site-header-brand and a link to styles.css
 """
-import os,sys
-from pathlib import Path
-repo = Path(__file__).resolve().parents[1]
-root = repo / 'work' / 'web'
-files = list(root.glob('*.html'))
-print('Found', len(files), 'HTML files')
+import sys
+
+from fix_engine import WORK_WEB, html_files, main, references_asset, rule, under
+
+RULES = []
 button_html = '      <button class="nav-toggle" aria-expanded="false" aria-controls="primary-nav">☰ Menu</button>\n'
 script_tag = '  <script src="header.js" defer></script>\n'
-modified = []
-for p in files:
-    txt = p.read_text(encoding='utf-8')
-    if 'site-header-brand' not in txt or 'styles.css' not in txt:
-        continue
+
+def add_nav_toggle(txt, path):
+    # fingerprinted copies (see fingerprint_assets.py) count as the same files
+    if 'site-header-brand' not in txt or not references_asset(txt, 'styles.css'):
+        return txt
     new = txt
     # add script tag before </head> if not present
-    if 'header.js' not in new:
+    if not references_asset(new, 'header.js'):
         new = new.replace('</head>', script_tag + '</head>')
     # insert button after site-header-brand div if not present
     if 'nav-toggle' not in new:
         new = new.replace('<div class="site-header-brand">', '<div class="site-header-brand">\n' + button_html)
-    if new != txt:
-        p.write_text(new, encoding='utf-8')
-        modified.append(str(p))
-print('Modified', len(modified), 'files')
-for m in modified:
-    print('-', m)
+    return new
+
+rule(RULES, 'nav_toggle_web', applies=under(WORK_WEB))(add_nav_toggle)
+
+if __name__ == '__main__':
+    sys.exit(main(RULES, html_files(WORK_WEB), description='Add the nav toggle and header.js to work/web pages.'))
@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""
+Run every HTML fixer in one pass over work/web and docs:
+add_toggle_to_all_html, add_toggle_to_docs_html, update_header_refs,
+apply_safe_fixes and apply_more_safe_fixes.
+
+Each file is read once and written at most once (see fix_engine.py) instead
+of once per script.
+Usage: python3 scripts/apply_all_fixes.py [--jobs N] [--dry-run | --check] [--manifest FILE]
+"""
+import sys
+
+import add_toggle_to_all_html, add_toggle_to_docs_html, apply_more_safe_fixes, apply_safe_fixes, update_header_refs
+from fix_engine import DOCS, WORK_WEB, finish, html_files, parse_args, run
+
+# order matters: the toggle rules add header.js, which update_header_refs then points at scripts/
+RULES = (add_toggle_to_all_html.RULES + add_toggle_to_docs_html.RULES + update_header_refs.RULES
+         + apply_safe_fixes.RULES + apply_more_safe_fixes.RULES)
+
+if __name__ == '__main__':
+    args = parse_args('Apply all HTML fixers in a single pass.')
+    results = run(RULES, html_files(WORK_WEB, DOCS), args.jobs, write=args.write, diff=args.dry_run, stats=args.stats)
+    results += update_header_refs.remove_local_copies(args.write, args.dry_run)
+    sys.exit(finish(results, args))
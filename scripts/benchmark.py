@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Benchmark the site scripts on a synthetic site of configurable size.
+Usage: python3 scripts/benchmark.py [--pages N] [--links N] [--md N] [--repeat N]
+       python3 scripts/benchmark.py --pages 10000 --tools sync,convert-cold,link-check-files
+       python3 scripts/benchmark.py --list
+
+Generates a throwaway tree shaped like this repository (work/web, docs,
+work/shared, plus a copy of scripts/) from a fixed seed, so the same options
+always give the same site (up to the stand-in's port). The tools then run against it in pipeline order,
+each in its own process. External links point at a second local stand-in
+server (link_fetch.serve_directory), so nothing leaves the machine.
+
+Every run is appended to work/output/benchmarks.json with the commit,
+machine and options, including the per-stage metrics each tool writes with
+--metrics (see metrics.py). The wall time, CPU time and peak memory of each
+tool are printed next to the previous run with the same options, so a
+regression shows up as soon as it is committed.
+"""
+import argparse, datetime, json, os, platform, random, shutil, statistics, subprocess, sys, tempfile, time
+from pathlib import Path
+
+from link_fetch import serve_directory
+
+repo = Path(__file__).resolve().parents[1]
+DEFAULT_OUTPUT = repo / 'work' / 'output' / 'benchmarks.json'
+RESULTS_VERSION = 1
+
+# (name, script, arguments) in pipeline order; the fixers run with --check so
+# every repeat sees the same tree
+TOOLS = [
+    ('sync', 'sync_shared_md_to_web.py', []),
+    ('sync-noop', 'sync_shared_md_to_web.py', []),
+    ('convert-cold', 'convert_md_to_static_html.py', ['--force']),
+    ('convert-noop', 'convert_md_to_static_html.py', []),
+    ('apply-all-fixes', 'apply_all_fixes.py', ['--check']),
+    ('apply-safe-fixes', 'apply_safe_fixes.py', ['--check']),
+    ('apply-more-safe-fixes', 'apply_more_safe_fixes.py', ['--check']),
+    ('link-check-files', 'link_check_files.py', []),
+    ('link-check-internal', 'link_check_internal.py', ['--serve']),
+    ('link-check', 'link_check.py', ['--serve', '--no-cache']),
+    ('search-index', 'build_search_index.py', []),
+]
+TOOL_NAMES = [t[0] for t in TOOLS]
+
+WORDS = '''accessible access alt text caption contrast keyboard focus screen reader heading landmark
+label form error motion color document slide table list link button menu dialog video audio
+transcript course student faculty staff policy review testing remediation design content campus
+procurement vendor standard guideline criteria success barrier inclusive support request'''.split()
+
+PAGE = '''<!DOCTYPE html>
+<html lang="en">
+<head>
+  <meta charset="utf-8" />
+  <meta name="viewport" content="width=device-width, initial-scale=1" />
+  <title>{title} | Accessibility at Arizona</title>
+  <link rel="stylesheet" href="styles.css" />
+  <script src="../../scripts/header.js" defer></script>
+</head>
+<body>
+  <a class="skip-link" href="{skip}">Skip to main content</a>
+  <header>
+    <div class="site-header">
+      <div class="site-header-brand">University of Arizona · Digital Accessibility</div>
+      <button{button} class="nav-toggle" aria-expanded="false" aria-controls="primary-nav">☰ Menu</button>
+      <nav class="site-header-nav"{nav}>
+{nav_links}
+      </nav>
+    </div>
+  </header>
+  <main{main}>
+    <h1>{title}</h1>
+{sections}
+  </main>
+  <footer{footer}>
+    <p>&copy; University of Arizona Digital Accessibility. <a href="{home}">Home</a></p>
+  </footer>
+</body>
+</html>
+'''
+
+class SiteGenerator:
+    """Writes a synthetic work/web, docs and work/shared tree under root."""
+    def __init__(self, root, pages, docs, md, links, external, md_paragraphs, broken, external_root, seed):
+        self.root = Path(root)
+        self.rng = random.Random(seed)
+        self.pages = ['page-{:05d}.html'.format(i) for i in range(pages)]
+        self.docs = self.pages[:docs]
+        self.md = ['topic-{:05d}.md'.format(i) for i in range(md)]
+        self.links, self.external, self.md_paragraphs, self.broken = links, external, md_paragraphs, broken
+        self.external_root = external_root
+        self.external_pages = ['ext-{:03d}.html'.format(i) for i in range(50)]
+
+    def words(self, n):
+        return ' '.join(self.rng.choice(WORDS) for _ in range(n))
+
+    def title(self):
+        return self.words(self.rng.randint(2, 5)).title()
+
+    def link(self, in_docs):
+        """One href for a page: internal, shared markdown, external or (rarely) broken."""
+        r = self.rng.random()
+        if r < self.broken:
+            return 'missing-{:05d}.html'.format(self.rng.randrange(10 ** 5))
+        if r < self.broken + 0.1 and self.md:
+            return '../shared/' + self.rng.choice(self.md)
+        target = self.rng.choice(self.pages)
+        if in_docs and target not in self.docs:
+            return '../work/web/' + target
+        return target + ('#s{}'.format(self.rng.randrange(4)) if self.rng.random() < 0.1 else '')
+
+    def page(self, index, in_docs):
+        count = min(len(self.pages) - 1, self.links)
+        hrefs = [self.link(in_docs) for _ in range(count)]
+        # a chain through every page so a crawl from index.html reaches them all
+        hrefs.append(self.pages[(index + 1) % len(self.pages)] if not in_docs else self.docs[(index + 1) % len(self.docs)])
+        hrefs += [self.external_root + self.rng.choice(self.external_pages) for _ in range(self.external)]
+        self.rng.shuffle(hrefs)
+        sections, per = [], max(1, len(hrefs) // 4)
+        for s in range(4):
+            chunk = hrefs[s * per:(s + 1) * per] if s < 3 else hrefs[3 * per:]
+            links = ' '.join('<a href="{}">{}</a> {}.'.format(h, self.words(3), self.words(12)) for h in chunk)
+            sections.append('    <section id="s{}">\n      <h2>{}</h2>\n      <p>{} {}</p>\n    </section>'.format(
+                s, self.title(), self.words(60), links))
+        # leave some fixes undone so the fixers have work
+        nav_links = '\n'.join('        <a href="{}">{}</a>'.format(p, self.title()) for p in self.pages[:8])
+        return PAGE.format(
+            title=self.title(), skip='#maincontent' if self.rng.random() < 0.8 else '#content',
+            button=' type="button"' if self.rng.random() < 0.7 else '',
+            nav=' aria-label="Primary" role="navigation"' if self.rng.random() < 0.7 else '',
+            nav_links=nav_links, main=' id="maincontent"' if self.rng.random() < 0.8 else '',
+            footer=' role="contentinfo"' if self.rng.random() < 0.8 else '',
+            sections='\n'.join(sections), home=self.pages[0] if not in_docs else 'index.html')
+
+    def markdown(self):
+        lines = ['---', 'title: "{}"'.format(self.title()), 'tags: [{}]'.format(', '.join(self.rng.sample(WORDS, 3))), '---', '',
+                 '# ' + self.title(), '']
+        for p in range(self.md_paragraphs):
+            if p % 5 == 0:
+                lines += ['## ' + self.title(), '']
+            kind = self.rng.random()
+            if kind < 0.15:
+                lines += ['- ' + self.words(8) for _ in range(4)] + ['']
+            elif kind < 0.2:
+                lines += ['| Item | Status |', '| --- | --- |'] + ['| {} | {} |'.format(self.words(2), self.words(1)) for _ in range(3)] + ['']
+            else:
+                other = self.rng.choice(self.md)
+                lines += ['{} [{}]({}) {}'.format(self.words(30), self.words(2), other, self.words(20)), '']
+        return '\n'.join(lines)
+
+    def write(self):
+        web, docs, shared = self.root / 'work' / 'web', self.root / 'docs', self.root / 'work' / 'shared'
+        for d in (web, docs, shared, self.root / 'work' / 'output', self.root / 'external'):
+            d.mkdir(parents=True, exist_ok=True)
+        shutil.copytree(repo / 'scripts', self.root / 'scripts',
+                        ignore=shutil.ignore_patterns('__pycache__', 'axe-reports', 'node_modules'))
+        for src, dst in ((repo / 'work' / 'web' / 'styles.css', web), (repo / 'docs' / 'styles.css', docs)):
+            if src.exists():
+                shutil.copy2(src, dst / 'styles.css')
+        for i, name in enumerate(self.pages):
+            (web / name).write_text(self.page(i, False), encoding='utf-8')
+        for i, name in enumerate(self.docs):
+            (docs / name).write_text(self.page(i, True), encoding='utf-8')
+        index = '<!DOCTYPE html>\n<html lang="en"><head><title>Index</title></head><body><main>\n{}\n</main></body></html>\n'
+        (web / 'index.html').write_text(index.format('\n'.join('<a href="{}">{}</a>'.format(p, p) for p in self.pages[:20])), encoding='utf-8')
+        (docs / 'index.html').write_text(index.format('\n'.join('<a href="{}">{}</a>'.format(p, p) for p in self.docs[:20])), encoding='utf-8')
+        for name in self.md:
+            (shared / name).write_text(self.markdown(), encoding='utf-8')
+        for name in self.external_pages:
+            (self.root / 'external' / name).write_text('<!DOCTYPE html><html><body><p>{}</p></body></html>\n'.format(self.words(40)), encoding='utf-8')
+
+def tree_size(root):
+    files = size = 0
+    for d in ('work', 'docs'):
+        for p in (Path(root) / d).rglob('*'):
+            if p.is_file():
+                files += 1
+                size += p.stat().st_size
+    return files, size
+
+def run_tool(root, script, args, log, metrics_path):
+    """Run one tool in root; returns dict with wall and cpu seconds, peak RSS (KB), exit code
+    and the tool's own stage metrics."""
+    cmd = [sys.executable, str(Path(root) / 'scripts' / script)] + args + ['--metrics', str(metrics_path)]
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=str(root), stdout=log, stderr=subprocess.STDOUT)
+    if hasattr(os, 'wait4'):
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        cpu, rss = usage.ru_utime + usage.ru_stime, usage.ru_maxrss
+        if sys.platform == 'darwin':
+            rss //= 1024
+    else:
+        proc.wait()
+        cpu = rss = None
+    wall = time.perf_counter() - start
+    try:
+        with open(metrics_path, encoding='utf-8') as fh:
+            data = json.load(fh)
+        stages, counters = data['stages'], data['counters']
+    except (OSError, ValueError, KeyError):
+        stages = counters = None
+    return {'wall': round(wall, 4), 'cpu': None if cpu is None else round(cpu, 4),
+            'max_rss_kb': rss, 'exit': proc.returncode, 'stages': stages, 'counters': counters}
+
+def git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=str(repo), capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=str(repo), capture_output=True, text=True).stdout.strip()
+        return out + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def summarize(runs):
+    walls = [r['wall'] for r in runs]
+    cpus = [r['cpu'] for r in runs if r['cpu'] is not None]
+    rss = [r['max_rss_kb'] for r in runs if r['max_rss_kb'] is not None]
+    return {'median': round(statistics.median(walls), 4), 'min': min(walls),
+            'cpu': round(statistics.median(cpus), 4) if cpus else None,
+            'max_rss_kb': max(rss) if rss else None, 'exit': runs[-1]['exit'], 'runs': walls,
+            'stages': runs[-1]['stages'], 'counters': runs[-1]['counters']}
+
+def load_results(path):
+    try:
+        with open(path, encoding='utf-8') as fh:
+            data = json.load(fh)
+    except (OSError, ValueError):
+        return []
+    return data.get('runs', []) if isinstance(data, dict) else []
+
+def save_results(path, runs):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    tmp = str(path) + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as fh:
+        json.dump({'version': RESULTS_VERSION, 'runs': runs}, fh, indent=1)
+        fh.write('\n')
+    os.replace(tmp, path)
+
+def report(record, previous):
+    prev = previous['results'] if previous else {}
+    print('\n{:<24} {:>9} {:>9} {:>9} {:>5}  {}'.format('tool', 'wall s', 'cpu s', 'rss MB', 'exit',
+                                                     'vs ' + (previous['commit'] or '?')[:12] if previous else ''))
+    for name, r in record['results'].items():
+        cpu = '-' if r['cpu'] is None else '{:.3f}'.format(r['cpu'])
+        rss = '-' if r['max_rss_kb'] is None else '{:.1f}'.format(r['max_rss_kb'] / 1024)
+        delta = ''
+        if name in prev and prev[name]['median']:
+            delta = '{:+.1f}%'.format(100 * (r['median'] - prev[name]['median']) / prev[name]['median'])
+        print('{:<24} {:>9.3f} {:>9} {:>9} {:>5}  {}'.format(name, r['median'], cpu, rss, r['exit'], delta))
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Benchmark the site scripts on a generated synthetic site.')
+    ap.add_argument('--pages', type=int, default=1000, help='work/web pages (default 1000)')
+    ap.add_argument('--docs', type=int, default=None, help='docs pages (default a quarter of --pages)')
+    ap.add_argument('--md', type=int, default=None, help='work/shared markdown files (default a third of --pages)')
+    ap.add_argument('--md-paragraphs', type=int, default=20, help='blocks per markdown file (default 20)')
+    ap.add_argument('--links', type=int, default=40, help='internal links per page (default 40)')
+    ap.add_argument('--external', type=int, default=2, help='external links per page (default 2)')
+    ap.add_argument('--broken', type=float, default=0.01, help='fraction of internal links that are broken (default 0.01)')
+    ap.add_argument('--seed', type=int, default=1)
+    ap.add_argument('--repeat', type=int, default=1, help='regenerate and run everything N times; the median is reported')
+    ap.add_argument('--tools', help='comma-separated subset of tools to run (see --list)')
+    ap.add_argument('--list', action='store_true', help='list the tools and exit')
+    ap.add_argument('--output', default=str(DEFAULT_OUTPUT), help='results file to append to')
+    ap.add_argument('--keep', metavar='DIR', help='generate the site in DIR and keep it (default: a temporary directory)')
+    args = ap.parse_args(argv)
+    if args.list:
+        for name, script, tool_args in TOOLS:
+            print('{:<24} {} {}'.format(name, script, ' '.join(tool_args)))
+        return 0
+    selected = TOOL_NAMES if not args.tools else [t.strip() for t in args.tools.split(',') if t.strip()]
+    unknown = [t for t in selected if t not in TOOL_NAMES]
+    if unknown:
+        ap.error('unknown tools: {} (see --list)'.format(', '.join(unknown)))
+    params = {'pages': args.pages, 'docs': args.pages // 4 if args.docs is None else args.docs,
+              'md': args.pages // 3 if args.md is None else args.md, 'md_paragraphs': args.md_paragraphs,
+              'links': args.links, 'external': args.external, 'broken': args.broken, 'seed': args.seed}
+    if params['pages'] < 2 or params['docs'] < 1:
+        ap.error('--pages must be at least 2 and --docs at least 1')
+
+    runs = {name: [] for name in selected}
+    ext_server = None
+    for i in range(args.repeat):
+        root = Path(args.keep) if args.keep else Path(tempfile.mkdtemp(prefix='azaccess-bench-'))
+        if args.keep and root.exists():
+            shutil.rmtree(root)
+        try:
+            root.mkdir(parents=True, exist_ok=True)
+            if ext_server:
+                ext_server.shutdown()
+            (root / 'external').mkdir(exist_ok=True)
+            ext_server, ext_root = serve_directory(root / 'external')
+            start = time.perf_counter()
+            SiteGenerator(root, external_root=ext_root, **params).write()
+            files, size = tree_size(root)
+            print('Run {}/{}: generated {} files ({:.1f} MB) in {} in {:.2f}s'.format(
+                i + 1, args.repeat, files, size / 2 ** 20, root, time.perf_counter() - start))
+            logs = root / 'bench-logs'
+            logs.mkdir(exist_ok=True)
+            for name, script, tool_args in TOOLS:
+                if name not in runs:
+                    continue
+                with open(logs / (name + '.log'), 'wb') as log:
+                    result = run_tool(root, script, tool_args, log, logs / (name + '.metrics.json'))
+                runs[name].append(result)
+                print('  {:<24} {:>8.3f}s  exit {}'.format(name, result['wall'], result['exit']))
+        finally:
+            if not args.keep:
+                shutil.rmtree(root, ignore_errors=True)
+    if ext_server:
+        ext_server.shutdown()
+
+    record = {
+        'commit': git_commit(),
+        'date': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count(),
+        'params': params, 'repeat': args.repeat, 'site_files': files, 'site_bytes': size,
+        'results': {name: summarize(r) for name, r in runs.items()},
+    }
+    history = load_results(args.output)
+    previous = next((r for r in reversed(history) if r.get('params') == params and r.get('cpus') == record['cpus']), None)
+    report(record, previous)
+    history.append(record)
+    save_results(args.output, history)
+    print('\nResults appended to', args.output)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Build the static full-text search index for work/web (run after
+convert_md_to_static_html.py and the other page builds).
+Usage: python3 scripts/build_search_index.py
+
+Reads the <main> text, headings and title of every page, tokenizes them and
+writes an inverted index to work/web/search-index/:
+    manifest.json   version, BM25 parameters and the list of shards
+    docs.json       [url, title, excerpt] per document id
+    terms/<xx>.json term -> [doc id, score, doc id, score, ...] for terms
+                    starting with <xx>
+Scores are BM25 weights computed at build time (title and heading terms
+count extra), so a query only sums the scores in the shards it needs.
+Files are written only when their content changes. search.html loads it.
+"""
+import argparse, contextlib, json, math, re, sys, time
+from collections import Counter
+from html.parser import HTMLParser
+from pathlib import Path
+
+import metrics
+from file_sync import write_if_changed
+
+repo = Path(__file__).resolve().parents[1]
+WEB = repo / 'work' / 'web'
+OUT_DIR = WEB / 'search-index'
+INDEX_VERSION = 1
+K1, B = 1.2, 0.75
+# term frequency multipliers per field
+FIELD_WEIGHTS = {'title': 3, 'heading': 2, 'body': 1}
+PREFIX_LEN = 2
+EXCERPT_LEN = 180
+SKIP_PAGES = {'search.html'}
+# must match tokenize() in search.html
+token_re = re.compile(r'[a-z0-9]+')
+STOPWORDS = frozenset('''a an and are as at be but by for from has have if in into is it its of on or
+so that the their then there these this to was were will with you your'''.split())
+# only text inside <main> is indexed, so the site header is already left out;
+# <header> blocks of articles inside main (with their headings) are kept
+SKIP_TAGS = {'script', 'style', 'nav', 'footer', 'noscript', 'template'}
+HEADING_TAGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+
+def tokenize(text):
+    return [t for t in token_re.findall(text.lower()) if len(t) >= PREFIX_LEN and t not in STOPWORDS]
+
+class TextExtractor(HTMLParser):
+    """Collects the title, headings and body text inside <main>."""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title, self.headings, self.body = [], [], []
+        self.stack = []
+        self.in_title = False
+        self.main_depth = 0
+        self.skip_depth = 0
+        self.heading_depth = 0
+    def handle_starttag(self, tag, attrs):
+        if tag == 'title':
+            self.in_title = True
+        elif tag == 'main':
+            self.main_depth += 1
+        elif tag in SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag in HEADING_TAGS:
+            self.heading_depth += 1
+    def handle_endtag(self, tag):
+        if tag == 'title':
+            self.in_title = False
+        elif tag == 'main':
+            self.main_depth = max(0, self.main_depth - 1)
+        elif tag in SKIP_TAGS:
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif tag in HEADING_TAGS:
+            self.heading_depth = max(0, self.heading_depth - 1)
+    def handle_data(self, data):
+        if self.in_title:
+            self.title.append(data)
+        elif self.main_depth and not self.skip_depth:
+            (self.headings if self.heading_depth else self.body).append(data)
+
+def read_page(path):
+    """Returns (title, {field: text}, excerpt) for one HTML page."""
+    p = TextExtractor()
+    p.feed(Path(path).read_text(encoding='utf-8', errors='ignore'))
+    p.close()
+    title = ' '.join(''.join(p.title).split()).split(' | ')[0] or Path(path).stem
+    body = ' '.join(' '.join(p.body).split())
+    excerpt = body[:EXCERPT_LEN].rsplit(' ', 1)[0] + '…' if len(body) > EXCERPT_LEN else body
+    return title, {'title': title, 'heading': ' '.join(p.headings), 'body': body}, excerpt
+
+def pages():
+    return [p for p in sorted(WEB.glob('*.html')) if p.name not in SKIP_PAGES and not p.name.endswith('.old.html')]
+
+def build_index(paths, stats=None):
+    """Returns (docs, postings) where postings maps term -> [(doc id, score)]."""
+    stage = stats.stage if stats else lambda name: contextlib.nullcontext()
+    docs, freqs, lengths = [], [], []
+    # parse: extract and tokenize each page; transform: BM25 scoring
+    for path in paths:
+        with stage('parse'):
+            title, fields, excerpt = read_page(path)
+            tf = Counter()
+            for field, text in fields.items():
+                for term in tokenize(text):
+                    tf[term] += FIELD_WEIGHTS[field]
+        docs.append([path.name, title, excerpt])
+        freqs.append(tf)
+        lengths.append(sum(tf.values()))
+    if stats:
+        stats.count('files', len(docs))
+    with stage('transform'):
+        n = len(docs)
+        avgdl = sum(lengths) / n if n else 0
+        df = Counter(term for tf in freqs for term in tf)
+        postings = {}
+        for doc_id, tf in enumerate(freqs):
+            norm = K1 * (1 - B + B * lengths[doc_id] / avgdl) if avgdl else K1
+            for term, f in tf.items():
+                idf = math.log(1 + (n - df[term] + 0.5) / (df[term] + 0.5))
+                postings.setdefault(term, []).append((doc_id, round(idf * f * (K1 + 1) / (f + norm), 3)))
+        for plist in postings.values():
+            plist.sort(key=lambda p: -p[1])
+    return docs, postings
+
+def dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'), sort_keys=True) + '\n'
+
+def write_index(docs, postings, out_dir=OUT_DIR):
+    """Write manifest, docs and shards; returns (files written, shard count)."""
+    shards = {}
+    for term, plist in postings.items():
+        shards.setdefault(term[:PREFIX_LEN], {})[term] = [x for pair in plist for x in pair]
+    terms_dir = out_dir / 'terms'
+    terms_dir.mkdir(parents=True, exist_ok=True)
+    written = 0
+    for prefix, terms in shards.items():
+        written += write_if_changed(terms_dir / (prefix + '.json'), dumps(terms))
+    for stale in terms_dir.glob('*.json'):
+        if stale.stem not in shards:
+            stale.unlink()
+            written += 1
+    manifest = {'version': INDEX_VERSION, 'k1': K1, 'b': B, 'prefix_len': PREFIX_LEN,
+                'docs': len(docs), 'shards': sorted(shards)}
+    written += write_if_changed(out_dir / 'docs.json', dumps(docs))
+    written += write_if_changed(out_dir / 'manifest.json', dumps(manifest))
+    return written, len(shards)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Build the sharded static search index for work/web.')
+    metrics.add_arguments(ap)
+    args = ap.parse_args(argv)
+    stats = metrics.from_args('build_search_index', args)
+    start = time.perf_counter()
+    with stats.stage('discover'):
+        paths = pages()
+    docs, postings = build_index(paths, stats)
+    with stats.stage('write'):
+        written, shards = write_index(docs, postings)
+    size = sum(f.stat().st_size for f in OUT_DIR.rglob('*.json'))
+    stats.count('terms', len(postings))
+    stats.count('files_written', written)
+    stats.count('bytes', size)
+    print('Indexed {} pages, {} terms in {} shards ({} KB, {} files written) in {:.2f}s'.format(
+        len(docs), len(postings), shards, size // 1024, written, time.perf_counter() - start))
+    stats.finish()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
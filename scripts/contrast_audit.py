@@ -3,10 +3,20 @@
 Simple contrast audit for key color pairs used by the site.
 Reads the variables from `work/web/styles.css` and computes contrast
 for a few important combinations.
+
+With --matrix it instead computes the full N x N foreground/background
+contrast matrix of every --ua-* color variable in one NumPy-vectorized pass
+and writes it, with AA/AAA pass masks for normal and large text, as CSV or JSON:
+    python3 scripts/contrast_audit.py --matrix --format json --output contrast-matrix.json
+Translucent colors (e.g. --ua-code-bg: #0c234b0d) are composited first: a
+background over --ua-background (white if undefined), a foreground over the
+background it is paired with.
 """
-import re
+import argparse, csv, json, re, sys
 import os
 
+import metrics
+
 STYLE = os.path.join(os.path.dirname(__file__), '..', 'work', 'web', 'styles.css')
 
 hex_re = re.compile(r'--(?P<name>[-\w]+):\s*(?P<hex>#[0-9a-fA-F]{3,8})')
@@ -46,6 +56,14 @@ def luminance_rgb(rgb):
         return c/12.92 if c <= 0.03928 else ((c+0.055)/1.055)**2.4
     return 0.2126*f(rs)+0.7152*f(gs)+0.0722*f(bs)
 
+def composite(top, bottom):
+    """top (r, g, b, a) painted over an opaque bottom color; returns an opaque color."""
+    a = top[3]
+    if a >= 1:
+        return top
+    return (round(top[0] * a + bottom[0] * (1 - a)), round(top[1] * a + bottom[1] * (1 - a)),
+            round(top[2] * a + bottom[2] * (1 - a)), 1)
+
 def contrast_ratio(a,b):
     la = luminance_rgb(a)
     lb = luminance_rgb(b)
@@ -53,8 +71,94 @@ def contrast_ratio(a,b):
     L2 = min(la,lb)
     return (L1+0.05)/(L2+0.05)
 
+# WCAG 2.x minimum ratios
+THRESHOLDS = {
+    'aa_normal': 4.5,
+    'aa_large': 3.0,
+    'aaa_normal': 7.0,
+    'aaa_large': 4.5,
+}
+
+def contrast_matrix(colors, backdrop=(255, 255, 255, 1)):
+    """colors maps name -> hex; returns (names, ratio matrix, {threshold name: bool mask}).
+
+    ratio[i][j] is the contrast of color i as foreground on color j as background,
+    with translucent colors composited as composite() does: background j over
+    backdrop, then foreground i over that.
+    """
+    try:
+        import numpy as np
+    except Exception:
+        print('Missing python package "numpy". Install with: pip install numpy')
+        raise
+    names = sorted(colors)
+    rgba = np.array([hex_to_rgb(colors[n]) for n in names], dtype=float).reshape(-1, 4)
+    alpha = rgba[:, 3:]
+    bg = np.round(rgba[:, :3] * alpha + np.array(backdrop[:3], dtype=float) * (1 - alpha))
+    fg = np.round(rgba[:, None, :3] * alpha[:, None] + bg[None, :, :] * (1 - alpha[:, None]))
+    def luminance(rgb):
+        rgb = rgb / 255.0
+        linear = np.where(rgb <= 0.03928, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+        return linear @ np.array([0.2126, 0.7152, 0.0722])
+    lum_fg, lum_bg = luminance(fg), luminance(bg)[None, :]
+    hi = np.maximum(lum_fg, lum_bg)
+    lo = np.minimum(lum_fg, lum_bg)
+    ratio = (hi + 0.05) / (lo + 0.05)
+    masks = {k: ratio >= v for k, v in THRESHOLDS.items()}
+    return names, ratio, masks
+
+def write_matrix(colors, names, ratio, masks, fmt, out):
+    if fmt == 'json':
+        json.dump({
+            'colors': {n: colors[n] for n in names},
+            'order': names,
+            'thresholds': THRESHOLDS,
+            'ratio': ratio.round(2).tolist(),
+            'pass': {k: m.tolist() for k, m in masks.items()},
+        }, out, indent=1)
+        out.write('\n')
+        return
+    w = csv.writer(out, lineterminator='\n')
+    w.writerow(['foreground', 'background', 'fg_hex', 'bg_hex', 'ratio'] + list(THRESHOLDS))
+    for i, fg in enumerate(names):
+        for j, bg in enumerate(names):
+            if i == j:
+                continue
+            w.writerow([fg, bg, colors[fg], colors[bg], '%.2f' % ratio[i, j]] +
+                       [int(masks[k][i, j]) for k in THRESHOLDS])
+
+def run_matrix(args, stats):
+    with stats.stage('read'):
+        colors = {n: h for n, h in load_vars().items() if n.startswith('ua-')}
+    backdrop = composite(hex_to_rgb(colors['ua-background']), (255, 255, 255, 1)) if 'ua-background' in colors else (255, 255, 255, 1)
+    with stats.stage('transform'):
+        names, ratio, masks = contrast_matrix(colors, backdrop)
+    with stats.stage('write'):
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8', newline='') as out:
+                write_matrix(colors, names, ratio, masks, args.format, out)
+        else:
+            write_matrix(colors, names, ratio, masks, args.format, sys.stdout)
+    stats.count('colors', len(names))
+    pairs = len(names) * (len(names) - 1)
+    summary = ', '.join('{} {}'.format(int(m.sum() - m.diagonal().sum()), k) for k, m in masks.items())
+    print('{} colors, {} ordered pairs: {}'.format(len(names), pairs, summary), file=sys.stderr)
+
 if __name__ == '__main__':
-    vars = load_vars()
+    ap = argparse.ArgumentParser(description='Contrast audit for the --ua-* color variables in styles.css.')
+    ap.add_argument('--matrix', action='store_true', help='compute the full foreground/background contrast matrix')
+    ap.add_argument('--format', choices=('csv', 'json'), default='csv', help='matrix output format (default csv)')
+    ap.add_argument('--output', help='matrix output file (default stdout)')
+    metrics.add_arguments(ap)
+    args = ap.parse_args()
+    stats = metrics.from_args('contrast_audit', args)
+    if args.matrix:
+        run_matrix(args, stats)
+        # the matrix may be on stdout
+        stats.finish(sys.stderr)
+        sys.exit(0)
+    with stats.stage('read'):
+        vars = load_vars()
     pairs = [
         ('ua-text','ua-background','body text on background'),
         ('ua-white','ua-text','header text on header bg (white on text)'),
@@ -67,21 +171,23 @@ if __name__ == '__main__':
         print('-', k, vars[k])
     print('\nContrast results:')
     failing = []
-    for a,b,label in pairs:
-        if a not in vars:
-            print('Missing var:', a)
-            continue
-        if b not in vars:
-            print('Missing var:', b)
-            continue
-        ra = hex_to_rgb(vars[a])
-        rb = hex_to_rgb(vars[b])
-        cr = contrast_ratio(ra,rb)
-        ok = cr >= 4.5
-        status = 'PASS' if ok else 'FAIL'
-        print(f'- {label}: ratio={cr:.2f} -> {status}')
-        if not ok:
-            failing.append((label, vars[a], vars[b], cr))
+    with stats.stage('transform'):
+        for a,b,label in pairs:
+            if a not in vars:
+                print('Missing var:', a)
+                continue
+            if b not in vars:
+                print('Missing var:', b)
+                continue
+            ra = hex_to_rgb(vars[a])
+            rb = hex_to_rgb(vars[b])
+            cr = contrast_ratio(ra,rb)
+            ok = cr >= 4.5
+            status = 'PASS' if ok else 'FAIL'
+            print(f'- {label}: ratio={cr:.2f} -> {status}')
+            if not ok:
+                failing.append((label, vars[a], vars[b], cr))
+    stats.count('pairs', len(pairs))
 
     if failing:
         print('\nFailing color pairs:')
@@ -90,3 +196,4 @@ if __name__ == '__main__':
         print('\nRecommendation: adjust the background or foreground color to increase contrast (darken foreground or lighten background).')
     else:
         print('\nAll checked pairs meet WCAG AA (4.5:1) contrast for normal text.')
+    stats.finish()
@@ -4,8 +4,24 @@ Convert markdown files from work/shared (and work/web/shared) to static HTML fil
 - Uses `markdown` and `yaml` (PyYAML) to parse front-matter and convert to HTML.
 - Writes `work/web/<name>.html` for every .md found.
 - Does not delete original markdown files.
+
+Builds are incremental: work/output/md-build-state.json records the source
+mtime/size/hash of every output plus a hash of the template and markdown
+configuration, and outputs that are up to date are skipped (--force rebuilds
+everything). Stale files are converted across a process pool, each worker
+reusing one `markdown.Markdown` instance via reset().
+
+--watch keeps running and rebuilds on save: changes in work/shared are
+debounced, mirrored into work/web/shared and only the edited page plus the
+pages linking to it are rebuilt (inotify on Linux, polling elsewhere; see
+fs_watch.py). Deleting a markdown file removes its page and build-state entry.
 """
-import os, re, sys
+import argparse, contextlib, hashlib, json, os, re, shutil, sys, time
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+from fs_watch import watch
+
 try:
     import markdown
 except Exception:
@@ -21,15 +37,19 @@ repo = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 work_shared = os.path.join(repo, 'work', 'shared')
 web_shared = os.path.join(repo, 'work', 'web', 'shared')
 web_root = os.path.join(repo, 'work', 'web')
+STATE_PATH = os.path.join(repo, 'work', 'output', 'md-build-state.json')
+EXTENSIONS = ['fenced_code', 'tables', 'attr_list']
+# below this many stale files a process pool costs more than it saves
+PARALLEL_MIN = 8
 
-md_paths = []
-for d in (work_shared, web_shared):
-    if os.path.isdir(d):
-        for name in os.listdir(d):
-            if name.lower().endswith('.md'):
-                md_paths.append(os.path.join(d, name))
-
-print(f'Found {len(md_paths)} markdown files to convert')
+def find_md_paths():
+    md_paths = []
+    for d in (work_shared, web_shared):
+        if os.path.isdir(d):
+            for name in sorted(os.listdir(d)):
+                if name.lower().endswith('.md'):
+                    md_paths.append(os.path.join(d, name))
+    return md_paths
 
 def read_md(path):
     with open(path, 'r', encoding='utf-8') as fh:
@@ -64,17 +84,217 @@ html_template = '''<!doctype html>
 </html>
 '''
 
-for md in md_paths:
-    print('Converting', md)
+def config_hash():
+    """Changes whenever the template or markdown configuration changes."""
+    config = json.dumps([html_template, EXTENSIONS, markdown.__version__])
+    return hashlib.sha1(config.encode('utf-8')).hexdigest()
+
+def out_path_for(md):
+    # write to work/web/<name>.html
+    return os.path.join(web_root, os.path.splitext(os.path.basename(md))[0] + '.html')
+
+def file_hash(path):
+    with open(path, 'rb') as fh:
+        return hashlib.sha1(fh.read()).hexdigest()
+
+_md = None
+
+def render_parts(md):
+    """Returns (front matter, title, body HTML) of one markdown file, reusing this process's Markdown instance."""
+    global _md
+    if _md is None:
+        _md = markdown.Markdown(extensions=EXTENSIONS)
+    else:
+        _md.reset()
     fm, body = read_md(md)
     title = fm.get('title') or os.path.splitext(os.path.basename(md))[0]
     # convert markdown to html
-    html_body = markdown.markdown(body, extensions=['fenced_code','tables','attr_list'])
-    # write to work/web/<name>.html
-    out_name = os.path.splitext(os.path.basename(md))[0] + '.html'
-    out_path = os.path.join(web_root, out_name)
+    return fm, title, _md.convert(body)
+
+def render(md):
+    """Convert one markdown file to the page HTML."""
+    _, title, html_body = render_parts(md)
+    return html_template.format(title=title + ' | Accessibility', content=html_body)
+
+def convert(md):
+    """Render md and write its output only if the content changed; returns (md, out_path, written)."""
+    out_path = out_path_for(md)
+    html = render(md)
+    if os.path.exists(out_path):
+        with open(out_path, 'r', encoding='utf-8') as fh:
+            if fh.read() == html:
+                return md, out_path, False
     with open(out_path, 'w', encoding='utf-8') as fh:
-        fh.write(html_template.format(title=title + ' | Accessibility', content=html_body))
-    print('Wrote', out_path)
+        fh.write(html)
+    return md, out_path, True
+
+def load_state():
+    try:
+        with open(STATE_PATH, 'r', encoding='utf-8') as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+def save_state(state):
+    os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+    with open(STATE_PATH, 'w', encoding='utf-8') as fh:
+        json.dump(state, fh, indent=1, sort_keys=True)
+
+def source_record(md):
+    st = os.stat(md)
+    return {'src': os.path.relpath(md, repo), 'mtime': st.st_mtime_ns, 'size': st.st_size, 'hash': file_hash(md)}
+
+def is_up_to_date(md, out_path, entry):
+    if not entry or entry['src'] != os.path.relpath(md, repo) or not os.path.exists(out_path):
+        return False
+    st = os.stat(md)
+    if entry['mtime'] == st.st_mtime_ns and entry['size'] == st.st_size:
+        return True
+    return entry['hash'] == file_hash(md)
+
+def plan(md_paths, state, force=False):
+    """Returns the sources whose outputs need rebuilding (the last source wins per output)."""
+    by_output = {}
+    for md in md_paths:
+        by_output[out_path_for(md)] = md
+    outputs = state.get('outputs', {}) if state.get('config') == config_hash() and not force else {}
+    stale = []
+    for out_path, md in sorted(by_output.items()):
+        if not is_up_to_date(md, out_path, outputs.get(os.path.relpath(out_path, repo))):
+            stale.append(md)
+    return stale, by_output
+
+def build(md_paths, force=False, jobs=None, stats=None):
+    """Incrementally convert md_paths; returns (stale sources, written outputs, output count)."""
+    stage = stats.stage if stats else lambda name: contextlib.nullcontext()
+    with stage('discover'):
+        state = load_state()
+        stale, by_output = plan(md_paths, state, force)
+    # workers read, render and write each page
+    with stage('transform'):
+        if jobs == 1 or len(stale) < PARALLEL_MIN:
+            results = [convert(md) for md in stale]
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as ex:
+                results = list(ex.map(convert, stale))
+    with stage('write'):
+        outputs = state.get('outputs', {}) if state.get('config') == config_hash() else {}
+        for md in stale:
+            outputs[os.path.relpath(out_path_for(md), repo)] = source_record(md)
+        save_state({'config': config_hash(), 'outputs': outputs})
+    written = [out for _, out, changed in results if changed]
+    if stats:
+        stats.count('files', len(md_paths))
+        stats.count('files_converted', len(stale))
+        stats.count('files_written', len(written))
+        stats.count('bytes', sum(os.path.getsize(md) for md in stale))
+    return stale, written, len(by_output)
+
+link_re = re.compile(r'\]\(\s*<?([^)\s>]+)|href\s*=\s*["\']([^"\']+)')
+
+def page_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+def linked_names(md):
+    """Names of the pages md links to through .md or .html links."""
+    try:
+        with open(md, 'r', encoding='utf-8') as fh:
+            text = fh.read()
+    except OSError:
+        return set()
+    names = set()
+    for m in link_re.finditer(text):
+        target = (m.group(1) or m.group(2)).split('#')[0].split('?')[0]
+        if os.path.splitext(target)[1].lower() in ('.md', '.html'):
+            names.add(page_name(target))
+    return names
+
+def remove_outputs(out_paths):
+    """Delete outputs whose sources are gone, with their build-state entries; returns the files removed."""
+    state = load_state()
+    outputs = state.get('outputs', {})
+    removed = []
+    for out_path in sorted(out_paths):
+        outputs.pop(os.path.relpath(out_path, repo), None)
+        if os.path.exists(out_path):
+            os.remove(out_path)
+            removed.append(out_path)
+    if state:
+        save_state(state)
+    return removed
+
+def mirror_to_web_shared(path, digest=None):
+    # keep work/web/shared in step with work/shared, as sync_shared_md_to_web.py does;
+    # a deleted source takes its copy along unless the copy was edited (digest: the
+    # source's last known hash)
+    dst = os.path.join(web_shared, os.path.basename(path))
+    if not os.path.isdir(web_shared):
+        return
+    if not os.path.isfile(path):
+        if digest and os.path.isfile(dst) and file_hash(dst) == digest:
+            os.remove(dst)
+        return
+    if os.path.exists(dst) and file_hash(dst) == file_hash(path):
+        return
+    shutil.copyfile(path, dst)
+
+def watch_and_rebuild(debounce=0.05, polling=False):
+    links = {md: linked_names(md) for md in find_md_paths()}
+    digests = {md: file_hash(md) for md in links if os.path.dirname(md) == work_shared}
+
+    def on_change(paths):
+        start = time.perf_counter()
+        names = {page_name(p) for p in paths}
+        for path in paths:
+            mirror_to_web_shared(path, digests.get(path))
+            if os.path.isfile(path):
+                digests[path] = file_hash(path)
+            else:
+                digests.pop(path, None)
+        sources = find_md_paths()
+        for md in set(links) - set(sources):
+            del links[md]
+        for md in sources:
+            if page_name(md) in names or md not in links:
+                links[md] = linked_names(md)
+        # rebuild the edited pages plus every page linking to them, using the
+        # same source precedence as a full build
+        winners = {out_path_for(md): md for md in sources}
+        affected = {out_path_for(md) for md in sources if page_name(md) in names or links.get(md, set()) & names}
+        stale, written, _ = build([winners[out] for out in sorted(affected)], force=True, jobs=1)
+        for out_path in written:
+            print('Wrote', out_path)
+        for out_path in remove_outputs({out_path_for(p) for p in paths} - set(winners)):
+            print('Removed', out_path)
+        print('Rebuilt {} page(s) for {} in {:.0f} ms'.format(
+            len(stale), ', '.join(sorted(names)), (time.perf_counter() - start) * 1000))
+
+    watch([work_shared], on_change, debounce=debounce, suffixes=('.md',), polling=polling)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Convert shared markdown into static HTML pages in work/web.')
+    ap.add_argument('--force', action='store_true', help='rebuild every page, ignoring the build state')
+    ap.add_argument('--jobs', type=int, default=None, help='worker processes (default: all cores)')
+    ap.add_argument('--watch', action='store_true', help='after building, keep rebuilding pages as work/shared changes')
+    ap.add_argument('--debounce', type=float, default=0.05, help='seconds of quiet before a watch rebuild (default 0.05)')
+    ap.add_argument('--poll', action='store_true', help='watch by polling instead of inotify')
+    metrics.add_arguments(ap)
+    args = ap.parse_args(argv)
+    stats = metrics.from_args('convert_md_to_static_html', args)
+
+    start = time.perf_counter()
+    with stats.stage('discover'):
+        md_paths = find_md_paths()
+    print(f'Found {len(md_paths)} markdown files to convert')
+    stale, written, outputs = build(md_paths, args.force, args.jobs, stats)
+    for out_path in written:
+        print('Wrote', out_path)
+    print('Done: converted {} files ({} written, {} of {} pages up to date) in {:.3f}s'.format(
+        len(stale), len(written), outputs - len(stale), outputs, time.perf_counter() - start))
+    stats.finish()
+    if args.watch:
+        watch_and_rebuild(args.debounce, args.poll)
+    return 0
 
-print('Done: converted', len(md_paths), 'files')
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,531 @@
+#!/usr/bin/env python3
+"""
+Contrast audit of the colors the site actually uses: every CSS rule that
+sets both a text color and a background, in the stylesheets, page <style>
+blocks and inline style="" attributes of work/web and docs.
+Usage: python3 scripts/css_contrast_audit.py
+       python3 scripts/css_contrast_audit.py --format json --output contrast-rules.json
+       python3 scripts/css_contrast_audit.py --check docs/home.html
+
+Custom properties are resolved through var() chains and fallbacks, per
+cascade scope: :root/html definitions in source order (!important first),
+overridden by a page's own <style> and by the rule's own definitions.
+Stylesheets that redefine :root inside an @media block (dark mode,
+prefers-contrast) are audited once per such theme, and a rule is reported
+for a theme only when its colors differ there. Semi-transparent colors are
+composited over the page background, gradients are checked at every color
+stop (worst ratio wins) and rules setting a large font size are held to the
+large-text threshold.
+
+Values that need the DOM (inherit, currentColor, images) are counted as
+unresolved. Stylesheets are parsed once and shared by every page linking
+them; resolved values and luminance are cached per color.
+--check exits with status 1 when any pair fails AA.
+"""
+import argparse, bisect, colorsys, csv, functools, json, math, re, sys
+from pathlib import Path
+
+import metrics
+from contrast_audit import THRESHOLDS, composite, hex_to_rgb, luminance_rgb
+from html_rewriter import parse_attrs, start_tags
+
+repo = Path(__file__).resolve().parents[1]
+DEFAULT_DIRS = [repo / 'work' / 'web', repo / 'docs']
+DEFAULT_BACKDROP = (255, 255, 255, 1)
+FONT_BASE_PX = 16
+# WCAG large text: 18pt, or 14pt bold
+LARGE_PX, LARGE_BOLD_PX = 24, 18.66
+
+NAMED = {
+    'black': '#000000', 'white': '#ffffff', 'red': '#ff0000', 'green': '#008000', 'blue': '#0000ff',
+    'yellow': '#ffff00', 'orange': '#ffa500', 'purple': '#800080', 'gray': '#808080', 'grey': '#808080',
+    'silver': '#c0c0c0', 'maroon': '#800000', 'navy': '#000080', 'teal': '#008080', 'olive': '#808000',
+    'lime': '#00ff00', 'aqua': '#00ffff', 'fuchsia': '#ff00ff', 'darkred': '#8b0000', 'darkblue': '#00008b',
+    'darkgreen': '#006400', 'darkgray': '#a9a9a9', 'darkgrey': '#a9a9a9', 'lightgray': '#d3d3d3',
+    'lightgrey': '#d3d3d3', 'whitesmoke': '#f5f5f5', 'gainsboro': '#dcdcdc', 'dimgray': '#696969',
+    'dimgrey': '#696969', 'crimson': '#dc143c', 'firebrick': '#b22222', 'gold': '#ffd700',
+    'ivory': '#fffff0', 'beige': '#f5f5dc', 'linen': '#faf0e6', 'snow': '#fffafa', 'transparent': '#00000000',
+}
+comment_re = re.compile(r'/\*.*?\*/', re.S)
+var_re = re.compile(r'var\(\s*(--[-\w]+)\s*(?:,\s*)?', re.I)
+color_token_re = re.compile(r'#[0-9a-fA-F]{3,8}\b|(?:rgba?|hsla?)\([^()]*\)|\b[a-zA-Z]+\b')
+number_re = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:e[-+]?\d+)?%?', re.I)
+style_block_re = re.compile(r'<style\b[^>]*>(.*?)</style\s*>', re.I | re.S)
+url_re = re.compile(r'url\((?:"[^"]*"|\'[^\']*\'|[^)]*)\)', re.I)
+
+class Rule:
+    __slots__ = ('selector', 'decls', 'context', 'line')
+    def __init__(self, selector, decls, context, line):
+        self.selector, self.decls, self.context, self.line = selector, decls, context, line
+
+# --- CSS parsing ---
+
+def split_top(text, sep):
+    """Split text on sep outside quotes and parentheses."""
+    parts, depth, quote, start = [], 0, None, 0
+    for i, c in enumerate(text):
+        if quote:
+            if c == quote:
+                quote = None
+        elif c in '"\'':
+            quote = c
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            depth = max(0, depth - 1)
+        elif c == sep and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+def parse_decls(text):
+    """'a: b; c: d !important' -> {name: (value, important)}; later declarations win unless an earlier one is !important."""
+    decls = {}
+    for part in split_top(text, ';'):
+        name, sep, value = part.partition(':')
+        name = name.strip()
+        if not sep or not name:
+            continue
+        if not name.startswith('--'):
+            name = name.lower()
+        value = value.strip()
+        important = value.lower().endswith('!important')
+        if important:
+            value = value[:-len('!important')].rstrip()
+        if name in decls and decls[name][1] and not important:
+            continue
+        decls[name] = (value, important)
+    return decls
+
+def parse_css(text, line_offset=0):
+    """Parse a stylesheet into (rules, warnings); tolerant of stray or missing braces.
+
+    Nested blocks are flattened: a block's selector is the text since the
+    previous ';', '{' or '}', and at-rule preludes (@media ...) become its context.
+    """
+    text = comment_re.sub(lambda m: '\n' * m.group(0).count('\n'), text)
+    newlines = [i for i, c in enumerate(text) if c == '\n']
+    def line_at(pos):
+        return bisect.bisect_right(newlines, pos) + 1 + line_offset
+    rules, warnings = [], []
+    # frame: [prelude, start, direct text parts, boundary, context]
+    stack = [[None, 0, [], 0, ()]]
+    quote, depth, seg = None, 0, 0
+    for i, c in enumerate(text):
+        if quote:
+            if c == quote:
+                quote = None
+            continue
+        if c in '"\'':
+            quote = c
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            depth = max(0, depth - 1)
+        elif depth:
+            continue
+        elif c in '{};':
+            frame = stack[-1]
+            frame[2].append(text[seg:i])
+            seg = i + 1
+            if c == ';':
+                frame[2].append(';')
+                frame[3] = len(frame[2])
+            elif c == '{':
+                prelude = ''.join(frame[2][frame[3]:]).strip()
+                del frame[2][frame[3]:]
+                if prelude and not prelude.startswith('@') and re.match(r'[-\w]+\s*:\s', prelude):
+                    warnings.append('{}: "{}" looks like a declaration fused with a selector (missing ";" or "}}"?)'.format(line_at(i), prelude[:60]))
+                context = frame[4] + ((prelude,) if prelude.startswith('@') else ())
+                stack.append([prelude, i, [], 0, context])
+            elif len(stack) == 1:
+                warnings.append('{}: unmatched "}}"'.format(line_at(i)))
+            else:
+                close(stack.pop(), rules, line_at)
+                stack[-1][3] = len(stack[-1][2])
+    stack[-1][2].append(text[seg:])
+    while len(stack) > 1:
+        frame = stack.pop()
+        warnings.append('{}: block "{}" is never closed'.format(line_at(frame[1]), (frame[0] or '')[:60]))
+        close(frame, rules, line_at)
+    return rules, warnings
+
+def close(frame, rules, line_at):
+    prelude, start, parts, _, context = frame
+    if not prelude or prelude.startswith('@'):
+        return
+    decls = parse_decls(''.join(parts))
+    if decls:
+        rules.append(Rule(' '.join(prelude.split()), decls, context, line_at(start)))
+
+def is_root(selector):
+    # tolerant of a selector fused with a declaration (e.g. "box-sizing: border-b:root")
+    return any(s.strip() in (':root', 'html') or s.strip().endswith(':root') for s in selector.split(','))
+
+class Sheet:
+    """A parsed stylesheet: its rules, root custom properties per theme, warnings."""
+    def __init__(self, source, text, line_offset=0):
+        self.source = source
+        self.rules, self.warnings = parse_css(text, line_offset)
+        self.root = {}         # theme (None = default) -> {name: (value, important)}
+        for r in self.rules:
+            if not is_root(r.selector):
+                continue
+            theme = next((c for c in r.context if c.startswith('@media')), None)
+            if theme and not any(n.startswith('--') for n in r.decls):
+                continue
+            scope = self.root.setdefault(theme, {})
+            for name, (value, important) in r.decls.items():
+                if name.startswith('--') and not (name in scope and scope[name][1] and not important):
+                    scope[name] = (value, important)
+
+    def themes(self):
+        return [t for t in self.root if t is not None]
+
+@functools.lru_cache(maxsize=None)
+def load_sheet(path):
+    try:
+        text = Path(path).read_text(encoding='utf-8', errors='ignore')
+    except OSError:
+        return None
+    return Sheet(relpath(path), text)
+
+# --- values ---
+
+class Scope:
+    """Custom properties visible to a rule, with a memo of resolved names."""
+    def __init__(self, props, parent=None):
+        self.props = props
+        self.parent = parent
+        self.memo = {}
+
+    def lookup(self, name):
+        scope = self
+        while scope is not None:
+            if name in scope.props:
+                return scope.props[name][0], scope
+            scope = scope.parent
+        return None, None
+
+    def resolve_name(self, name, seen=frozenset()):
+        if name in self.memo:
+            return self.memo[name]
+        value, owner = self.lookup(name)
+        if value is None or name in seen:
+            result = None
+        else:
+            # a definition is resolved in the scope it comes from
+            result = owner.resolve(value, seen | {name})
+        # a cycle only makes a name unresolvable when it is looked up from the top
+        if result is not None or not seen:
+            self.memo[name] = result
+        return result
+
+    def resolve(self, value, seen=frozenset()):
+        """Substitute var() references; None if one cannot be resolved."""
+        out, pos = [], 0
+        while True:
+            m = var_re.search(value, pos)
+            if not m:
+                out.append(value[pos:])
+                return ''.join(out)
+            out.append(value[pos:m.start()])
+            depth, j = 1, m.end()
+            while j < len(value) and depth:
+                depth += {'(': 1, ')': -1}.get(value[j], 0)
+                j += 1
+            fallback = value[m.end():j - 1].strip() if depth == 0 else ''
+            resolved = self.resolve_name(m.group(1), seen)
+            if resolved is None and fallback:
+                resolved = self.resolve(fallback, seen)
+            if resolved is None:
+                return None
+            out.append(resolved)
+            pos = j
+
+def _channel(token, scale):
+    if token.endswith('%'):
+        return float(token[:-1]) * scale / 100
+    return float(token)
+
+@functools.lru_cache(maxsize=None)
+def parse_color(token):
+    """CSS color -> (r, g, b, a) or None for anything that needs the DOM."""
+    t = token.strip().lower()
+    if t in NAMED:
+        t = NAMED[t]
+    if t.startswith('#'):
+        try:
+            return hex_to_rgb(t)
+        except ValueError:
+            return None
+    m = re.match(r'(rgba?|hsla?)\((.*)\)$', t)
+    if not m:
+        return None
+    nums = number_re.findall(m.group(2))
+    if len(nums) < 3:
+        return None
+    alpha = _channel(nums[3], 1) if len(nums) > 3 else 1
+    if m.group(1).startswith('rgb'):
+        r, g, b = (max(0, min(255, round(_channel(n, 255)))) for n in nums[:3])
+    else:
+        h = float(nums[0].rstrip('%')) / 360 % 1
+        s, l = float(nums[1].rstrip('%')) / 100, float(nums[2].rstrip('%')) / 100
+        r, g, b = (round(c * 255) for c in colorsys.hls_to_rgb(h, l, s))
+    return (r, g, b, max(0.0, min(1.0, alpha)))
+
+def background_colors(value):
+    """Colors in a background value: one for a plain color, every stop of a gradient."""
+    value = url_re.sub(' ', value)
+    colors = []
+    for tok in color_token_re.findall(value):
+        c = parse_color(tok)
+        if c is not None:
+            colors.append(c)
+    return colors
+
+@functools.lru_cache(maxsize=None)
+def luminance(rgb):
+    return luminance_rgb(rgb)
+
+def ratio(fg, bg):
+    la, lb = luminance(fg[:3] + (1,)), luminance(bg[:3] + (1,))
+    return (max(la, lb) + 0.05) / (min(la, lb) + 0.05)
+
+def floor2(r):
+    # the thresholds have two decimals, so a truncated ratio passes exactly when
+    # the exact one does (rounding would print a failing 4.497 as 4.50)
+    return math.floor(round(r * 100, 6)) / 100
+
+def to_hex(c):
+    return '#{:02x}{:02x}{:02x}'.format(*c[:3])
+
+def font_px(value):
+    m = re.match(r'([\d.]+)(px|pt|rem|em|%)?$', value.strip().lower())
+    if not m:
+        return None
+    n = float(m.group(1))
+    return {'px': n, None: n, 'pt': n * 4 / 3, 'rem': n * FONT_BASE_PX, 'em': n * FONT_BASE_PX, '%': n * FONT_BASE_PX / 100}[m.group(2)]
+
+def is_large(decls, scope):
+    size = decls.get('font-size')
+    px = font_px(scope.resolve(size[0]) or '') if size else None
+    if px is None:
+        return False
+    weight = (scope.resolve(decls.get('font-weight', ('',))[0]) or '').strip().lower()
+    bold = weight in ('bold', 'bolder') or (weight.isdigit() and int(weight) >= 700)
+    return px >= LARGE_PX or (bold and px >= LARGE_BOLD_PX)
+
+# --- evaluation ---
+
+def evaluate(selector, decls, scope, backdrop):
+    """Check one rule's color/background pair; returns a result dict (None if the rule sets neither)."""
+    if 'color' not in decls or not ('background' in decls or 'background-color' in decls):
+        return None
+    bg_raw = (decls.get('background-color') or decls['background'])[0]
+    fg_raw = decls['color'][0]
+    entry = {'selector': selector, 'color': fg_raw, 'background': bg_raw}
+    fg_value, bg_value = scope.resolve(fg_raw), scope.resolve(bg_raw)
+    fg = parse_color(fg_value) if fg_value is not None else None
+    bgs = background_colors(bg_value) if bg_value is not None else []
+    if fg is None or not bgs or all(bg[3] == 0 for bg in bgs):
+        if fg_value is None or bg_value is None:
+            reason = 'undefined var() in ' + ('color' if fg_value is None else 'background')
+        elif fg is None:
+            reason = 'color is not a color value'
+        else:
+            # transparent/none/images: what shows through depends on the parent
+            reason = 'background has no opaque color'
+        entry.update(status='unresolved', reason=reason)
+        return entry
+    worst = None
+    for bg in bgs:
+        solid_bg = composite(bg, backdrop)
+        r = ratio(composite(fg, solid_bg), solid_bg)
+        if worst is None or r < worst[0]:
+            worst = (r, solid_bg)
+    large = is_large(decls, scope)
+    required = THRESHOLDS['aa_large'] if large else THRESHOLDS['aa_normal']
+    entry.update(fg=to_hex(composite(fg, worst[1])), bg=to_hex(worst[1]), ratio=floor2(worst[0]), large=large,
+                 translucent=any(bg[3] < 1 for bg in bgs),
+                 required=required, aa=worst[0] >= required,
+                 aaa=worst[0] >= (THRESHOLDS['aaa_large'] if large else THRESHOLDS['aaa_normal']),
+                 status='pass' if worst[0] >= required else 'fail')
+    return entry
+
+def theme_scopes(sheets, page_root=None):
+    """theme -> Scope for a page linking sheets (in order) with page-level :root overrides."""
+    themes = [None] + sorted({t for s in sheets for t in s.themes()} | set(page_root or {}) - {None})
+    scopes = {}
+    for theme in themes:
+        props = {}
+        for layer in [s.root for s in sheets] + ([page_root] if page_root else []):
+            for t in (None, theme) if theme else (None,):
+                for name, (value, important) in layer.get(t, {}).items():
+                    if not (name in props and props[name][1] and not important):
+                        props[name] = (value, important)
+        scopes[theme] = Scope(props)
+    return scopes
+
+def backdrop_for(rules, scope):
+    """The body/html background, used under translucent colors."""
+    for r in reversed(rules):
+        if r.selector in ('body', 'html') and not r.context:
+            value = (r.decls.get('background-color') or r.decls.get('background') or (None,))[0]
+            resolved = scope.resolve(value) if value else None
+            colors = background_colors(resolved) if resolved else []
+            if colors and colors[0][3] >= 1:
+                return colors[0]
+    return DEFAULT_BACKDROP
+
+def audit_rules(rules, scopes, source, all_rules=None):
+    """Evaluate rules under every theme; themed results are kept only where they differ."""
+    entries = []
+    backdrops = {t: backdrop_for(all_rules or rules, s) for t, s in scopes.items()}
+    for r in rules:
+        rule_theme = next((c for c in r.context if c in scopes), None)
+        base = None
+        for theme, scope in scopes.items():
+            if rule_theme is not None and theme != rule_theme:
+                continue
+            own = {n: v for n, v in r.decls.items() if n.startswith('--')}
+            entry = evaluate(r.selector, r.decls, Scope(own, scope) if own else scope, backdrops[theme])
+            if entry is None:
+                break
+            key = (entry.get('fg'), entry.get('bg'), entry['status'])
+            if theme is None:
+                base = key
+            elif key == base:
+                continue
+            entry.update(source=source, line=r.line, context=' '.join(r.context), theme=theme or 'default')
+            entries.append(entry)
+    return entries
+
+# --- pages ---
+
+def relpath(path):
+    try:
+        return Path(path).resolve().relative_to(repo).as_posix()
+    except ValueError:
+        return str(path)
+
+def audit_page(path):
+    """Returns (linked sheets, entries for the page's <style> blocks and inline styles, warnings)."""
+    text = Path(path).read_text(encoding='utf-8', errors='ignore')
+    newlines = [i for i, c in enumerate(text) if c == '\n']
+    sheets, inline = [], []
+    for offset, name, raw in start_tags(text):
+        attrs = dict(parse_attrs(raw, name))
+        if name == 'link' and 'stylesheet' in (attrs.get('rel') or '').lower().split():
+            href = (attrs.get('href') or '').split('?')[0].split('#')[0]
+            if href and ':' not in href and not href.startswith('//'):
+                base = repo if href.startswith('/') else Path(path).parent
+                sheet = load_sheet(str((base / href.lstrip('/')).resolve()))
+                if sheet is not None:
+                    sheets.append(sheet)
+        if attrs.get('style'):
+            inline.append((bisect.bisect_right(newlines, offset) + 1, name, raw, attrs['style']))
+    page_rules, warnings, page_root = [], [], {}
+    for m in style_block_re.finditer(text):
+        block = Sheet(relpath(path), m.group(1), bisect.bisect_right(newlines, m.start(1)))
+        page_rules += block.rules
+        warnings += block.warnings
+        for theme, props in block.root.items():
+            page_root.setdefault(theme, {}).update(props)
+    scopes = theme_scopes(sheets, page_root)
+    all_rules = [r for s in sheets for r in s.rules] + page_rules
+    source = relpath(path)
+    entries = audit_rules(page_rules, scopes, source, all_rules)
+    inline_rules = []
+    for line, name, raw, style in inline:
+        raw = ' '.join(raw.split())
+        inline_rules.append(Rule(raw if len(raw) <= 80 else raw[:77] + '...', parse_decls(style), (), line))
+    entries += audit_rules(inline_rules, scopes, source, all_rules)
+    return sheets, entries, warnings
+
+def find_pages(targets):
+    files = []
+    for t in targets:
+        t = Path(t)
+        if t.is_dir():
+            files += sorted(t.glob('*.html'))
+        elif t.is_file():
+            files.append(t)
+    return files
+
+def write_report(report, fmt, out):
+    if fmt == 'json':
+        json.dump(report, out, indent=1, ensure_ascii=False)
+        out.write('\n')
+        return
+    fields = ['source', 'line', 'theme', 'context', 'selector', 'color', 'background', 'fg', 'bg', 'ratio', 'large', 'translucent',
+              'required', 'aa', 'aaa', 'status', 'reason']
+    w = csv.DictWriter(out, fields, extrasaction='ignore', lineterminator='\n')
+    w.writeheader()
+    for group in ('stylesheets', 'pages'):
+        for entries in report[group].values():
+            w.writerows(entries)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Contrast audit of every CSS rule and inline style that sets a color and a background.')
+    ap.add_argument('paths', nargs='*', default=[str(d) for d in DEFAULT_DIRS], help='HTML files or directories (default: work/web and docs)')
+    ap.add_argument('--format', choices=('text', 'json', 'csv'), default='text', help='report format (default text: failures only)')
+    ap.add_argument('--output', help='report file (default stdout)')
+    ap.add_argument('--check', action='store_true', help='exit with status 1 if any pair fails AA')
+    metrics.add_arguments(ap)
+    args = ap.parse_args(argv)
+    stats = metrics.from_args('css_contrast_audit', args)
+
+    with stats.stage('discover'):
+        pages = find_pages(args.paths)
+    report = {'thresholds': THRESHOLDS, 'stylesheets': {}, 'pages': {}, 'warnings': {}}
+    sheets = {}
+    with stats.stage('parse'):
+        for page in pages:
+            linked, entries, warnings = audit_page(page)
+            for s in linked:
+                sheets.setdefault(s.source, s)
+            if entries:
+                report['pages'][relpath(page)] = entries
+            if warnings:
+                report['warnings'][relpath(page)] = warnings
+    with stats.stage('transform'):
+        for source, sheet in sorted(sheets.items()):
+            report['stylesheets'][source] = audit_rules(sheet.rules, theme_scopes([sheet]), source)
+            if sheet.warnings:
+                report['warnings'][source] = sheet.warnings
+
+    entries = [e for group in ('stylesheets', 'pages') for es in report[group].values() for e in es]
+    counts = {status: sum(1 for e in entries if e['status'] == status) for status in ('pass', 'fail', 'unresolved')}
+    report['summary'] = dict(counts, pages=len(pages), stylesheets=len(sheets), pairs=len(entries))
+    stats.count('files', len(pages) + len(sheets))
+    stats.count('pairs', len(entries))
+    stats.count('colors', parse_color.cache_info().currsize)
+
+    out = sys.stdout
+    if args.format != 'text':
+        with stats.stage('write'):
+            if args.output:
+                with open(args.output, 'w', encoding='utf-8', newline='') as fh:
+                    write_report(report, args.format, fh)
+            else:
+                write_report(report, args.format, sys.stdout)
+        out = sys.stderr
+    else:
+        for e in entries:
+            if e['status'] == 'fail':
+                theme = '' if e['theme'] == 'default' else ' [{}]'.format(e['theme'])
+                print('- {}:{}: {}{}: {} on {}{} -> {:.2f} (needs {})'.format(
+                    e['source'], e['line'], e['selector'], theme, e['fg'], e['bg'],
+                    ' (translucent, over the page background)' if e['translucent'] else '', e['ratio'], e['required']), file=out)
+    for source, warnings in sorted(report['warnings'].items()):
+        for w in warnings:
+            print('warning: {}:{}'.format(source, w), file=out)
+    print('{pairs} color/background pairs in {stylesheets} stylesheets and {pages} pages: {pass} pass, {fail} fail AA, '
+          '{unresolved} unresolved'.format(**report['summary']), file=out)
+    stats.finish(out)
+    return 1 if args.check and counts['fail'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,8 +2,11 @@
 """
 Deeper contrast audit: checks multiple pairs against AA/AAA thresholds
 for normal and large text. Loads variables from work/web/styles.css.
+Supports --profile / --metrics / --pstats (see metrics.py).
 """
-import re, os
+import argparse, re, os
+
+import metrics
 
 STYLE = os.path.join(os.path.dirname(__file__), '..', 'work', 'web', 'styles.css')
 hex_re = re.compile(r'--(?P<name>[-\w]+):\s*(?P<hex>#[0-9a-fA-F]{3,8})')
@@ -45,7 +48,12 @@ def contrast_ratio(a,b):
     return (L1+0.05)/(L2+0.05)
 
 if __name__ == '__main__':
-    vars = load_vars()
+    ap = argparse.ArgumentParser(description='Check key color pairs against the AA/AAA thresholds.')
+    metrics.add_arguments(ap)
+    args = ap.parse_args()
+    stats = metrics.from_args('deeper_contrast_audit', args)
+    with stats.stage('read'):
+        vars = load_vars()
     # pairs to check: (foreground var, background var, description)
     checks = [
         ('ua-text','ua-background','body text on background'),
@@ -59,13 +67,15 @@ if __name__ == '__main__':
         ('ua-alert-text','ua-alert-bg','alert text on alert bg')
     ]
     results = []
-    for fg,bg,label in checks:
-        if fg not in vars or bg not in vars:
-            results.append((label, 'MISSING_VAR'))
-            continue
-        ra = hex_to_rgb(vars[fg]); rb = hex_to_rgb(vars[bg])
-        cr = contrast_ratio(ra,rb)
-        results.append((label, cr))
+    with stats.stage('transform'):
+        for fg,bg,label in checks:
+            if fg not in vars or bg not in vars:
+                results.append((label, 'MISSING_VAR'))
+                continue
+            ra = hex_to_rgb(vars[fg]); rb = hex_to_rgb(vars[bg])
+            cr = contrast_ratio(ra,rb)
+            results.append((label, cr))
+    stats.count('pairs', len(checks))
     # evaluate thresholds
     print('Deeper contrast audit results:')
     fail = []
@@ -92,3 +102,4 @@ if __name__ == '__main__':
             print('-', f)
     else:
         print('\nAll checked pairs pass AA(normal)')
+    stats.finish()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+File helpers shared by the sync/move scripts.
+
+Targets whose content already matches are left alone, so a no-op run keeps
+mtimes (and browser, CDN and Pages caches) intact. Real writes go to a temp
+file in the target directory and are renamed over the target, so readers
+never see a half-written file.
+"""
+import hashlib, os, shutil, tempfile
+
+CHUNK_SIZE = 1 << 16
+
+def file_digest(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(CHUNK_SIZE), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _default_mode():
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+def _replace(path, fill):
+    """Create a temp file next to path, let fill(tmp) write it, then rename it over path."""
+    path = os.fspath(path)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+    os.close(fd)
+    try:
+        fill(tmp)
+        # mkstemp creates 0600 files; keep the target's mode (or the usual default for new files)
+        if os.path.exists(path):
+            shutil.copymode(path, tmp)
+        else:
+            os.chmod(tmp, _default_mode())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+def write_atomic(path, text):
+    def fill(tmp):
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            fh.write(text)
+    _replace(path, fill)
+
+def write_if_changed(path, text):
+    """Write text to path unless it already holds exactly that; returns True if written."""
+    try:
+        with open(path, 'r', encoding='utf-8') as fh:
+            if fh.read() == text:
+                return False
+    except (OSError, UnicodeDecodeError):
+        pass
+    write_atomic(path, text)
+    return True
+
+def copy_if_changed(src, dst):
+    """Copy src to dst unless dst has the same content; returns True if copied."""
+    if os.path.isfile(dst) and os.path.getsize(dst) == os.path.getsize(src) and file_digest(dst) == file_digest(src):
+        return False
+    _replace(dst, lambda tmp: shutil.copyfile(src, tmp))
+    return True
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Minify the shared stylesheets and header script, write them under
+content-hashed names (styles.3f2a1c9d.css, header.0b7e44a1.js) next to the
+originals and point every page in work/web and docs at the new names, so the
+assets can be served with immutable cache headers.
+
+styles.css and header.js stay the files to edit; run this as the last build
+step (after sync/move and the fixers). Earlier fingerprinted copies are
+re-pointed and then removed. Pages are found through the link graph index
+(link_graph.py) and rewritten in one pass by fix_engine, so the usual
+--dry-run, --check and --manifest modes apply.
+
+Usage: python3 scripts/fingerprint_assets.py [--jobs N] [--dry-run | --check] [--manifest FILE]
+"""
+import functools, hashlib, os, re, sys
+from pathlib import Path
+
+from file_sync import write_if_changed
+from fix_engine import DOCS, WORK_WEB, Result, Rule, finish, parse_args, repo, run, unified_diff
+from link_graph import LinkGraph
+
+ASSETS = [WORK_WEB / 'styles.css', DOCS / 'styles.css', repo / 'scripts' / 'header.js']
+# fix_engine.references_asset recognises these names too
+HASH_LEN = 8
+ref_re = re.compile(r'''(?P<attr>\b(?:href|src)\s*=\s*)(?P<q>["'])(?P<url>[^"'?#]+)(?P<rest>[^"']*)(?P=q)''', re.I)
+
+def fingerprinted_re(asset):
+    return re.compile(re.escape(asset.stem) + r'\.[0-9a-f]{%d}' % HASH_LEN + re.escape(asset.suffix) + '$')
+
+def fingerprinted_copies(asset):
+    pattern = fingerprinted_re(asset)
+    return sorted(p for p in asset.parent.glob(asset.stem + '.*' + asset.suffix) if pattern.match(p.name))
+
+# --- minifiers: strip comments and layout whitespace, keep strings intact ---
+
+def _tokens(text, regex_ok=None):
+    """Split text into (kind, value): 'str', 'comment', 'regex', 'space' or 'code'."""
+    i, n = 0, len(text)
+    last = ''
+    while i < n:
+        c = text[i]
+        if c in '"\'`':
+            j = i + 1
+            while j < n and text[j] != c:
+                j += 2 if text[j] == '\\' else 1
+            yield 'str', text[i:j + 1]
+            last = c
+            i = j + 1
+        elif text.startswith('/*', i):
+            j = text.find('*/', i + 2)
+            j = n if j < 0 else j + 2
+            yield 'comment', text[i:j]
+            i = j
+        elif regex_ok is not None and text.startswith('//', i):
+            j = text.find('\n', i)
+            j = n if j < 0 else j
+            yield 'comment', text[i:j]
+            i = j
+        elif regex_ok is not None and c == '/' and regex_ok(last):
+            j, in_class = i + 1, False
+            while j < n and (in_class or text[j] != '/') and text[j] != '\n':
+                if text[j] == '\\':
+                    j += 1
+                elif text[j] == '[':
+                    in_class = True
+                elif text[j] == ']':
+                    in_class = False
+                j += 1
+            j += 1
+            while j < n and (text[j].isalnum() or text[j] == '_'):
+                j += 1
+            yield 'regex', text[i:j]
+            last = 'x'
+            i = j
+        elif c.isspace():
+            j = i
+            while j < n and text[j].isspace():
+                j += 1
+            yield 'space', text[i:j]
+            i = j
+        else:
+            j = i + 1
+            if c.isalnum() or c in '_$':
+                while j < n and (text[j].isalnum() or text[j] in '_$'):
+                    j += 1
+            yield 'code', text[i:j]
+            last = text[i:j]
+            i = j
+
+def minify_css(text):
+    out = []
+    pending = False
+    for kind, value in _tokens(text):
+        if kind == 'comment':
+            continue
+        if kind == 'space':
+            pending = True
+            continue
+        if pending and out and out[-1][-1] not in '{};,>:(' and value[0] not in '{};,>)!':
+            out.append(' ')
+        pending = False
+        if value == '}' and out and out[-1] == ';':
+            out.pop()
+        out.append(value)
+    return ''.join(out).strip() + '\n'
+
+JS_REGEX_AFTER = set('(,=:[!&|?{};+-*%<>~^') | {'', 'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete', 'void', 'throw'}
+
+def _is_word(c):
+    return c.isalnum() or c in '_$\\'
+
+def minify_js(text):
+    """Drop comments and indentation; newlines are kept (except after { ; ,) so ASI is unaffected."""
+    out = []
+    pending = ''
+    for kind, value in _tokens(text, regex_ok=lambda last: last in JS_REGEX_AFTER):
+        if kind == 'comment':
+            continue
+        if kind == 'space':
+            pending = '\n' if '\n' in value or pending == '\n' else ' '
+            continue
+        if pending and out:
+            prev = out[-1][-1]
+            if pending == '\n' and prev not in '{;,':
+                out.append('\n')
+            elif (_is_word(prev) and _is_word(value[0])) or prev + value[0] in ('++', '--', '+-', '-+'):
+                out.append(' ')
+        pending = ''
+        out.append(value)
+    return ''.join(out).strip() + '\n'
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+def build_asset(asset):
+    """Returns (fingerprinted path, minified text)."""
+    text = MINIFIERS[asset.suffix](asset.read_text(encoding='utf-8'))
+    digest = hashlib.sha1(text.encode('utf-8')).hexdigest()[:HASH_LEN]
+    return asset.with_name('{}.{}{}'.format(asset.stem, digest, asset.suffix)), text
+
+def rewrite_asset_refs(names, txt, path):
+    """Point href/src values resolving to an asset (or an old copy of it) at its new name."""
+    page_dir = Path(path).parent
+    def repl(m):
+        url = m.group('url')
+        if ':' in url or url.startswith('//'):
+            return m.group(0)
+        target = Path(os.path.normpath(os.path.join(repo if url.startswith('/') else page_dir, url.lstrip('/'))))
+        new_name = names.get(str(target))
+        if new_name is None or target.name == new_name:
+            return m.group(0)
+        head = url.rsplit('/', 1)[0] + '/' if '/' in url else ''
+        return m.group('attr') + m.group('q') + head + new_name + m.group('rest') + m.group('q')
+    return ref_re.sub(repl, txt)
+
+if __name__ == '__main__':
+    args = parse_args('Write fingerprinted, minified copies of styles.css and header.js and repoint pages at them.')
+    graph = LinkGraph()
+    with args.stats.stage('discover'):
+        graph.update()
+    results, names, pages, stale = [], {}, set(), []
+    for asset in ASSETS:
+        if not asset.exists():
+            continue
+        out, text = build_asset(asset)
+        old_copies = [p for p in fingerprinted_copies(asset) if p != out]
+        # both the source and earlier copies map to the new name
+        for src in [asset] + old_copies:
+            names[str(src)] = out.name
+            pages.update(graph.linked_from(src))
+        stale += old_copies
+        old = out.read_text(encoding='utf-8') if out.exists() else ''
+        if old != text:
+            if args.write:
+                write_if_changed(out, text)
+            results.append(Result(str(out), 'create', ['fingerprint_asset'], unified_diff(out, old, text) if args.dry_run else None))
+        print('{} -> {} ({} -> {} bytes)'.format(os.path.relpath(asset, repo), out.name, asset.stat().st_size, len(text.encode('utf-8'))))
+
+    rules = [Rule('fingerprint_refs', functools.partial(rewrite_asset_refs, names), None)]
+    results = run(rules, sorted(pages), args.jobs, write=args.write, diff=args.dry_run, stats=args.stats) + results
+    for p in stale:
+        if args.write:
+            p.unlink()
+        results.append(Result(str(p), 'delete', ['remove_stale_asset'], None))
+    if args.write:
+        graph.update()
+        graph.save()
+    sys.exit(finish(results, args))
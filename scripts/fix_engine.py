@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Shared engine for the in-place HTML fixer scripts.
+
+A fixer registers rules: functions (text, path) -> text, optionally limited to
+some files by a predicate. The engine loads each file once, applies every
+applicable rule in order in a single pass, writes the file only when the
+result changed, and spreads the files across a process pool.
+
+Rules registered with tags=(...) are tag rules instead: functions (tag, path)
+that edit the attributes of one start tag (see html_rewriter.py). Consecutive
+tag rules share a single tokenizer pass over the file.
+
+Every fixer built on it shares the same modes:
+    --dry-run         print unified diffs of what would change, write nothing
+    --check           write nothing, just report what would change
+    --manifest FILE   write a JSON manifest of changed files and rule hits
+    --profile         time the read/transform/write stages (see metrics.py)
+Both --dry-run and --check exit with status 1 when any file would change, so
+CI can verify the tree is already fixed without rewriting it.
+
+Usage from a fixer script:
+    RULES = []
+    @rule(RULES, applies=under(WORK_WEB))
+    def my_fix(txt, path):
+        return txt.replace(...)
+    if __name__ == '__main__':
+        sys.exit(main(RULES, html_files(WORK_WEB, DOCS)))
+"""
+import argparse, difflib, functools, json, os, re, sys, time
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import html_rewriter, metrics
+
+repo = Path(__file__).resolve().parents[1]
+WORK_WEB = repo / 'work' / 'web'
+DOCS = repo / 'docs'
+
+Rule = namedtuple('Rule', 'name func applies tags', defaults=(None,))
+# action is None (unchanged), 'modify', 'create' or 'delete'; diff is only computed on request;
+# times is (read, transform, write seconds, bytes read) when measured by apply_rules
+Result = namedtuple('Result', 'path action hits diff times', defaults=(None,))
+
+def rule(rules, name=None, applies=None, tags=None):
+    """Decorator appending the function to rules as a Rule (a tag rule if tags is given)."""
+    def register(func):
+        rules.append(Rule(name or func.__name__, func, applies, tuple(tags) if tags else None))
+        return func
+    return register
+
+def _is_under(directory, path):
+    return Path(path).parent == Path(directory)
+
+def under(directory):
+    """Predicate for files directly inside directory (picklable for the process pool)."""
+    return functools.partial(_is_under, Path(directory))
+
+def references_asset(txt, name):
+    """True if txt mentions name ('styles.css') or a fingerprinted copy of it ('styles.3f2a1c9d.css')."""
+    stem, ext = os.path.splitext(name)
+    return name in txt or re.search(re.escape(stem) + r'\.[0-9a-f]{8}' + re.escape(ext), txt) is not None
+
+def html_files(*dirs):
+    files = []
+    for d in dirs:
+        if d.exists():
+            files += sorted(d.glob('*.html'))
+    return files
+
+def relpath(path):
+    try:
+        return Path(path).resolve().relative_to(repo).as_posix()
+    except ValueError:
+        return str(path)
+
+def unified_diff(path, old, new):
+    rel = relpath(path)
+    return ''.join(difflib.unified_diff(old.splitlines(True), new.splitlines(True),
+                                        'a/' + rel if old else '/dev/null', 'b/' + rel if new else '/dev/null'))
+
+def apply_rules(rules, path, write=True, diff=False):
+    """Read path once, run the rules over it and write it back if it changed.
+
+    With write=False nothing is written; diff=True adds a unified diff to the result.
+    """
+    path = Path(path)
+    t0 = time.perf_counter()
+    try:
+        # newline='' keeps CRLF files byte for byte outside the rewritten spans
+        with open(path, encoding='utf-8', newline='') as fh:
+            txt = fh.read()
+    except UnicodeDecodeError:
+        return Result(str(path), None, [], None)
+    t1 = time.perf_counter()
+    orig = txt
+    hits = []
+    batch = []
+    for r in list(rules) + [None]:
+        if r is not None and r.applies is not None and not r.applies(path):
+            continue
+        if r is not None and r.tags:
+            batch.append(r)
+            continue
+        if batch:
+            txt, batch_hits = html_rewriter.rewrite(txt, batch, path)
+            hits += batch_hits
+            batch = []
+        if r is None:
+            break
+        new = r.func(txt, path)
+        if new != txt:
+            hits.append(r.name)
+            txt = new
+    t2 = time.perf_counter()
+    if txt == orig:
+        return Result(str(path), None, hits, None, (t1 - t0, t2 - t1, 0.0, len(orig)))
+    if write:
+        with open(path, 'w', encoding='utf-8', newline='') as fh:
+            fh.write(txt)
+    return Result(str(path), 'modify', hits, unified_diff(path, orig, txt) if diff else None,
+                  (t1 - t0, t2 - t1, time.perf_counter() - t2, len(orig)))
+
+def run(rules, files, jobs=None, write=True, diff=False, stats=None):
+    """Apply rules to every file; returns a list of Results.
+
+    stats (a metrics.Metrics) gets the per-file stage times summed over the workers.
+    """
+    files = [str(f) for f in files]
+    task = functools.partial(apply_rules, rules, write=write, diff=diff)
+    if jobs == 1 or len(files) < 2:
+        results = [task(f) for f in files]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as ex:
+            results = list(ex.map(task, files, chunksize=max(1, len(files) // ((jobs or os.cpu_count() or 1) * 4))))
+    if stats is not None:
+        for r in results:
+            stats.count('files')
+            if r.times:
+                stats.add('read', r.times[0])
+                stats.add('transform', r.times[1])
+                if r.action and write:
+                    stats.add('write', r.times[2])
+                stats.count('bytes', r.times[3])
+        stats.count('files_changed', sum(1 for r in results if r.action))
+    return results
+
+def parse_args(description=None, argv=None):
+    ap = argparse.ArgumentParser(description=description)
+    ap.add_argument('--jobs', type=int, default=None, help='worker processes (default: all cores)')
+    ap.add_argument('--dry-run', action='store_true', help='print unified diffs of what would change; write nothing')
+    ap.add_argument('--check', action='store_true', help='write nothing; exit 1 if any file would change')
+    ap.add_argument('--manifest', metavar='FILE', help="write a JSON manifest of changes and rule hits ('-' for stdout)")
+    metrics.add_arguments(ap)
+    args = ap.parse_args(argv)
+    args.write = not (args.dry_run or args.check)
+    args.stats = metrics.from_args(Path(sys.argv[0]).stem, args)
+    return args
+
+def manifest(results, args, tool):
+    changed = [r for r in results if r.action]
+    return {
+        'tool': tool,
+        'mode': 'dry-run' if args.dry_run else 'check' if args.check else 'write',
+        'files_scanned': len(results),
+        'files_changed': len(changed),
+        'rule_hits': dict(sorted(Counter(h for r in changed for h in r.hits).items())),
+        'files': [{'path': relpath(r.path), 'action': r.action, 'rules': r.hits} for r in changed],
+    }
+
+def finish(results, args, tool=None):
+    """Print the summary (and diffs), write the manifest; returns the exit status."""
+    tool = tool or Path(sys.argv[0]).stem
+    changed = [r for r in results if r.action]
+    # keep stdout machine-readable when the manifest goes there
+    out = sys.stderr if args.manifest == '-' else sys.stdout
+    if args.dry_run:
+        for r in changed:
+            if r.diff:
+                out.write(r.diff)
+    print('Files processed:', len(results), file=out)
+    print('Files changed:' if args.write else 'Files that would change:', len(changed), file=out)
+    for r in changed:
+        line = '- ' + r.path
+        if r.hits:
+            line += ' (' + ', '.join(r.hits) + ')'
+        if r.action != 'modify':
+            line += ' [' + r.action + ']'
+        print(line, file=out)
+    if args.manifest:
+        data = json.dumps(manifest(results, args, tool), indent=2)
+        if args.manifest == '-':
+            print(data)
+        else:
+            Path(args.manifest).write_text(data + '\n', encoding='utf-8')
+    args.stats.finish(out)
+    return 1 if changed and not args.write else 0
+
+def main(rules, files, description=None, argv=None):
+    args = parse_args(description, argv)
+    results = run(rules, files, args.jobs, write=args.write, diff=args.dry_run, stats=args.stats)
+    return finish(results, args)
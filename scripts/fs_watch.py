@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Minimal directory watcher used by the --watch build modes.
+
+On Linux it uses inotify through ctypes (no extra packages); elsewhere, or if
+inotify is unavailable, it falls back to polling file mtimes. watch() groups
+bursts of events (editors often write, rename and touch a file per save)
+and calls back once per burst with the set of changed paths.
+"""
+import ctypes, ctypes.util, os, select, struct, sys, time
+
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_MODIFY
+EVENT_HEADER = struct.Struct('iIII')
+
+class InotifyWatcher:
+    def __init__(self, directories):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | getattr(os, 'O_CLOEXEC', 0))
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.dirs = {}
+        for d in directories:
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(d), WATCH_MASK)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), 'inotify_add_watch failed for ' + str(d))
+            self.dirs[wd] = str(d)
+
+    def wait(self, timeout=None):
+        """Block up to timeout seconds (None: forever); returns the set of changed paths."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        data = os.read(self.fd, 65536)
+        changed, offset = set(), 0
+        while offset < len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if name and wd in self.dirs:
+                changed.add(os.path.join(self.dirs[wd], os.fsdecode(name)))
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+class PollingWatcher:
+    def __init__(self, directories, interval=0.1):
+        self.directories = [str(d) for d in directories]
+        self.interval = interval
+        self.snapshot = self._scan()
+
+    def _scan(self):
+        state = {}
+        for d in self.directories:
+            for entry in os.scandir(d):
+                if entry.is_file():
+                    st = entry.stat()
+                    state[entry.path] = (st.st_mtime_ns, st.st_size)
+        return state
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            current = self._scan()
+            changed = {p for p in current.keys() | self.snapshot.keys() if current.get(p) != self.snapshot.get(p)}
+            self.snapshot = current
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            time.sleep(self.interval if deadline is None else max(0, min(self.interval, deadline - time.monotonic())))
+
+    def close(self):
+        pass
+
+def make_watcher(directories, polling=False):
+    if not polling and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(directories)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(directories)
+
+def watch(directories, on_change, debounce=0.05, suffixes=None, polling=False):
+    """Call on_change(paths) once each burst of changes has been quiet for debounce seconds.
+
+    An exception from on_change (e.g. a half-saved file) is reported and the
+    watch goes on; the next save triggers another call.
+    """
+    watcher = make_watcher(directories, polling)
+    print('Watching', ', '.join(str(d) for d in directories),
+          '(inotify)' if isinstance(watcher, InotifyWatcher) else '(polling)')
+    try:
+        while True:
+            changed = watcher.wait()
+            while True:
+                more = watcher.wait(debounce)
+                if not more:
+                    break
+                changed |= more
+            if suffixes:
+                changed = {p for p in changed if p.lower().endswith(suffixes)}
+            if changed:
+                try:
+                    on_change(changed)
+                except Exception as e:
+                    print('Error handling changes to {}: {}: {}'.format(
+                        ', '.join(sorted(changed)), type(e).__name__, e), file=sys.stderr)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
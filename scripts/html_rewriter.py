@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Start-tag rewriter for the fixer rules (see fix_engine.py).
+
+The document is tokenized once, left to right; every start tag is handed to
+the tag rules registered for its name, which read and set attributes on a
+Tag. Tags no rule changed, and everything between tags, are copied through
+byte for byte; a changed tag keeps its original text apart from the edited
+attribute values and the attributes appended to it. Because nothing is
+matched with whole-document regexes, rewriting is linear in the page size
+and tags inside comments, scripts and styles are never touched.
+
+A tag rule looks like:
+    @rule(RULES, tags=('main',))
+    def main_landmark(tag, path):
+        if not tag.has('role'):
+            tag.set('role', 'main')
+"""
+import html, re, sys
+
+class Tag:
+    """One start tag: name and attrs (lower-case names) as parsed, raw as it will be written."""
+    def __init__(self, name, attrs, raw):
+        self.name = name
+        self.attrs = {}
+        for k, v in attrs:
+            self.attrs.setdefault(k, v)
+        self.raw = raw
+
+    def has(self, name):
+        return name in self.attrs
+
+    def get(self, name, default=None):
+        value = self.attrs.get(name, default)
+        return default if value is None else value
+
+    def set(self, name, value, first=False):
+        """Set an attribute: an existing value is replaced in place, a new one is appended
+        (or inserted right after the tag name with first=True)."""
+        escaped = html.escape(value, quote=True)
+        if name in self.attrs:
+            attr_re = re.compile(r'(\s' + re.escape(name) + r'\s*=\s*)("[^"]*"|\'[^\']*\'|[^\s>]+)', re.I)
+            m = attr_re.search(self.raw)
+            if m:
+                q = m.group(2)[0] if m.group(2)[0] in '"\'' else '"'
+                self.raw = self.raw[:m.start(2)] + q + escaped + q + self.raw[m.end(2):]
+            else:
+                # bare attribute (<x hidden>): give it a value
+                bare_re = re.compile(r'(\s' + re.escape(name) + r')(?=[\s/>])', re.I)
+                self.raw = bare_re.sub(lambda m: m.group(1) + '="' + escaped + '"', self.raw, count=1)
+        else:
+            attr = ' {}="{}"'.format(name, escaped)
+            if first:
+                at = 1 + len(self.name)
+            else:
+                at = len(self.raw[:-2].rstrip()) if self.raw.endswith('/>') else len(self.raw) - 1
+            self.raw = self.raw[:at] + attr + self.raw[at:]
+        self.attrs[name] = value
+
+TAG_NAME = r'[a-zA-Z][^\s/>]*'
+# rest of a start tag. As in the HTML tokenizer a quote only opens a value right
+# after '='; elsewhere (e.g. inside an unquoted value) it is an ordinary
+# character. At most one alternative fits at each position, so this cannot
+# backtrack catastrophically.
+tag_end_re = re.compile(r'''(?:[^>"'=]|=\s*"[^"]*"|=\s*'[^']*'|=(?!\s*["'])|["'])*>''')
+attr_re = re.compile(r'''([^\s"'>/=]+)(?:\s*=\s*("[^"]*"|'[^']*'|[^\s>]+))?''')
+# elements whose content is text, not markup
+RAW_TEXT = {'script', 'style', 'textarea', 'title'}
+
+def parse_attrs(raw, name):
+    attrs = []
+    for m in attr_re.finditer(raw, 1 + len(name), len(raw) - 1):
+        value = m.group(2)
+        if value is not None:
+            value = html.unescape(value[1:-1] if value[0] in '"\'' else value)
+        attrs.append((m.group(1).lower(), value))
+    return attrs
+
+def _token_re(names):
+    # '<' starting a comment, a declaration (<!doctype ...>) or a start tag; when
+    # only some names are wanted the others are not even looked at
+    tag = TAG_NAME if names is None else '(?:{})(?=[\\s/>])'.format('|'.join(re.escape(n) for n in sorted(set(names) | RAW_TEXT)))
+    return re.compile(r'<(?:(!--)|(!)|(' + tag + '))', re.I)
+
+def _warn(message):
+    print('warning:', message, file=sys.stderr)
+
+def start_tags(text, names=None, warn=_warn):
+    """Yield (offset, name, raw) for every start tag in text (only those in names, if given).
+
+    Comments, declarations and the content of script/style/textarea/title are skipped.
+    A quoted value that is never closed ends at the next '>' (reported through warn).
+    """
+    token_re = _token_re(names)
+    pos = 0
+    while True:
+        m = token_re.search(text, pos)
+        if not m:
+            return
+        start = m.start()
+        if m.group(1):
+            end = text.find('-->', m.end())
+            pos = len(text) if end < 0 else end + 3
+            continue
+        if m.group(2):
+            end = text.find('>', m.end())
+            pos = len(text) if end < 0 else end + 1
+            continue
+        name = m.group(3).lower()
+        end = tag_end_re.match(text, m.end())
+        if end:
+            pos = end.end()
+        else:
+            close = text.find('>', m.end())
+            if close < 0:
+                # a tag left open runs to the end of the document
+                return
+            warn('line {}: unterminated quote in <{}>; the tag is taken to end at the next ">"'.format(
+                text.count('\n', 0, start) + 1, name))
+            pos = close + 1
+        if names is None or name in names:
+            yield start, name, text[start:pos]
+        if name in RAW_TEXT:
+            close = re.compile(r'</' + name + r'\s*>', re.I).search(text, pos)
+            pos = len(text) if close is None else close.end()
+
+def rewrite(text, rules, path):
+    """Run tag rules (Rules with .tags) over every start tag in one pass.
+
+    Returns (text, names of the rules that changed something, in rule order).
+    """
+    by_tag = {}
+    for r in rules:
+        for name in r.tags:
+            by_tag.setdefault(name, []).append(r)
+    out, last, hit = [], 0, set()
+    for offset, name, raw in start_tags(text, by_tag, lambda message: _warn('{}: {}'.format(path, message))):
+        tag_rules = by_tag[name]
+        tag = Tag(name, parse_attrs(raw, name), raw)
+        for r in tag_rules:
+            before = tag.raw
+            r.func(tag, path)
+            if tag.raw != before:
+                hit.add(r.name)
+        if tag.raw != raw:
+            out.append(text[last:offset])
+            out.append(tag.raw)
+            last = offset + len(raw)
+    if not out:
+        return text, []
+    out.append(text[last:])
+    return ''.join(out), [r.name for r in rules if r.name in hit]
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Persistent cache of external link check results for link_check.py.
+
+Results are stored in SQLite (default work/output/link-cache.sqlite), keyed by
+normalized URL, with the HTTP status, ETag/Last-Modified validators and the
+time of the last check. Entries younger than max_age are reused as-is; stale
+entries are revalidated with a conditional request.
+"""
+import re, sqlite3, time, urllib.parse
+from pathlib import Path
+
+DEFAULT_PATH = Path(__file__).resolve().parents[1] / 'work' / 'output' / 'link-cache.sqlite'
+DEFAULT_MAX_AGE = 24 * 3600
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+def parse_age(value):
+    """'3600', '90m', '12h' or '7d' -> seconds (for argparse type=)."""
+    m = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*', str(value).lower())
+    if not m:
+        raise ValueError('bad age: ' + str(value))
+    return float(m.group(1)) * UNITS[m.group(2) or 's']
+
+def normalize_url(url):
+    """Lowercase scheme/host, drop default ports, fragments and empty paths."""
+    parts = urllib.parse.urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host += ':%d' % parts.port
+    return urllib.parse.urlunsplit((scheme, host, parts.path or '/', parts.query, ''))
+
+class LinkCache:
+    def __init__(self, path=DEFAULT_PATH, max_age=DEFAULT_MAX_AGE):
+        self.max_age = max_age
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(path))
+        self.db.execute('CREATE TABLE IF NOT EXISTS links ('
+                        'url TEXT PRIMARY KEY, status INTEGER, etag TEXT, '
+                        'last_modified TEXT, checked_at REAL)')
+
+    def get(self, url):
+        row = self.db.execute('SELECT status, etag, last_modified, checked_at FROM links WHERE url = ?',
+                              (normalize_url(url),)).fetchone()
+        if row is None:
+            return None
+        return {'status': row[0], 'etag': row[1], 'last_modified': row[2], 'checked_at': row[3]}
+
+    def is_fresh(self, entry, now=None):
+        return (now or time.time()) - entry['checked_at'] < self.max_age
+
+    def validators(self, entry):
+        """Conditional request headers for revalidating a stale entry."""
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def put(self, url, status, etag=None, last_modified=None):
+        self.db.execute('INSERT OR REPLACE INTO links VALUES (?, ?, ?, ?, ?)',
+                        (normalize_url(url), status, etag, last_modified, time.time()))
+
+    def touch(self, url):
+        self.db.execute('UPDATE links SET checked_at = ? WHERE url = ?', (time.time(), normalize_url(url)))
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
@@ -2,16 +2,29 @@
 """
 Simple link checker crawler for local site.
 Usage: python3 scripts/link_check.py http://127.0.0.1:8000
+       python3 scripts/link_check.py --serve            # crawl work/web via a local stand-in
+       python3 scripts/link_check.py --max-in-flight 32 --per-host 8 http://127.0.0.1:8000
 
 Crawls pages under the given root, checks internal and external links,
-and prints a report of broken links.
+and prints a report of broken links. Requests run concurrently on a bounded
+worker pool over keep-alive connections (see link_fetch.py), and HTML pages
+are parsed in full as they stream in. External results
+are cached in work/output/link-cache.sqlite and reused for --max-age (see
+link_cache.py), so repeated runs make few outbound requests.
 """
-import sys, urllib.request, urllib.parse, urllib.error, socket
+import argparse, sys, urllib.parse
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from html.parser import HTMLParser
-from collections import deque
+from pathlib import Path
+
+import metrics
+from link_cache import DEFAULT_MAX_AGE, DEFAULT_PATH as DEFAULT_CACHE, LinkCache, parse_age
+from link_fetch import ConnectionPool, body_feeder, fetch, serve_directory
 
-ROOT = sys.argv[1] if len(sys.argv) > 1 else 'http://127.0.0.1:8000'
 TIMEOUT = 5
+MAX_IN_FLIGHT = 16
+PER_HOST = 4
+DEFAULT_SERVE_DIR = Path(__file__).resolve().parents[1] / 'work' / 'web'
 
 class LinkParser(HTMLParser):
     def __init__(self):
@@ -35,85 +48,158 @@ def is_same_origin(a, b):
     pb = urllib.parse.urlparse(b)
     return (pa.scheme, pa.hostname, pa.port) == (pb.scheme, pb.hostname, pb.port)
 
-def fetch_url(url):
-    try:
-        req = urllib.request.Request(url, headers={'User-Agent':'azaccess-link-checker/1.0'})
-        with urllib.request.urlopen(req, timeout=TIMEOUT) as res:
-            content_type = res.headers.get('Content-Type','')
-            # read up to 64KB for HTML to avoid long downloads
-            data = res.read(65536) if 'text/html' in content_type else b''
-            return res.getcode(), data, content_type
-    except urllib.error.HTTPError as e:
-        return e.code, None, None
-    except urllib.error.URLError as e:
-        return None, None, str(e)
-    except socket.timeout:
-        return None, None, 'timeout'
-    except Exception as e:
-        return None, None, str(e)
-
-
-def crawl(root):
-    visited = set()
-    q = deque([root])
+def fetch_url(pool, url):
+    """Returns (status, links, info); HTML bodies are parsed while they stream in."""
+    parser = LinkParser()
+    def on_body(status, headers):
+        if status < 400 and 'text/html' in headers.get('Content-Type', ''):
+            return body_feeder(parser)
+    status, headers, _, error = fetch(pool, url, on_body=on_body)
+    if status is None:
+        return None, None, error
+    if status >= 400:
+        return status, None, None
+    return status, parser.links, headers.get('Content-Type', '')
+
+def check_external(pool, url, headers=None):
+    """Returns (status, info, etag, last_modified); headers carry cache validators."""
+    status, res_headers, _, error = fetch(pool, url, headers=headers)
+    if status is None:
+        return None, error, None, None
+    return status, None, res_headers.get('ETag'), res_headers.get('Last-Modified')
+
+
+def crawl(root, max_in_flight=MAX_IN_FLIGHT, per_host=PER_HOST, cache=None):
+    """Crawl root with up to max_in_flight concurrent requests (per_host per host).
+
+    External results are read from and written to cache (a LinkCache) when given.
+    """
+    visited = {root}
     broken = []
     checked_external = {}
+    stats = {'external': 0, 'cached': 0, 'revalidated': 0, 'fetched': 0}
+    pool = ConnectionPool(per_host=per_host, timeout=TIMEOUT)
+
+    def record_external(url, code, info):
+        if code is None or code >= 400:
+            checked_external[url] = info if info else code
+            broken.append((url, code if code else 'ERR', info))
+        else:
+            checked_external[url] = True
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        pending = {}
 
-    while q:
-        url = q.popleft()
-        if url in visited:
-            continue
-        visited.add(url)
-        print('Crawling', url)
-        code, data, ct = fetch_url(url)
-        if code is None:
-            broken.append((url, 'ERROR', data))
-            continue
-        if code >= 400:
-            broken.append((url, code, 'HTTP error'))
-            continue
-        # only parse HTML
-        if data and isinstance(data, bytes):
-            try:
-                text = data.decode('utf-8', errors='ignore')
-            except Exception:
-                text = ''
-            p = LinkParser()
-            p.feed(text)
-            for raw in p.links:
-                nu = norm_url(url, raw)
-                if not nu:
+        def submit(kind, url, entry=None):
+            if kind == 'page':
+                print('Crawling', url)
+                fut = executor.submit(fetch_url, pool, url)
+            else:
+                headers = cache.validators(entry) if entry else None
+                fut = executor.submit(check_external, pool, url, headers)
+            pending[fut] = (kind, url, entry)
+
+        submit('page', root)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                kind, url, entry = pending.pop(fut)
+                if kind == 'external':
+                    code, info, etag, last_modified = fut.result()
+                    if code == 304 and entry:
+                        # unchanged since the cached check
+                        code = entry['status']
+                        stats['revalidated'] += 1
+                        cache.touch(url)
+                    elif code is not None and cache:
+                        # network errors are not cached so they get retried next run
+                        cache.put(url, code, etag, last_modified)
+                    stats['fetched'] += 1
+                    record_external(url, code, info)
+                    continue
+                code, links, info = fut.result()
+                if code is None:
+                    broken.append((url, 'ERROR', info))
                     continue
-                # ignore fragments at end
-                nu = nu.split('#')[0]
-                # ignore query-only variations by normalizing
-                # (keep queries for now)
-                if is_same_origin(root, nu):
-                    if nu not in visited:
-                        q.append(nu)
-                else:
-                    # external link: check once
-                    if nu in checked_external:
-                        if checked_external[nu] is False:
-                            broken.append((nu, 'EXTERNAL-ERROR', checked_external[nu]))
+                if code >= 400:
+                    broken.append((url, code, 'HTTP error'))
+                    continue
+                for raw in links:
+                    nu = norm_url(url, raw)
+                    if not nu:
                         continue
-                    c,_,info = fetch_url(nu)
-                    if c is None or (isinstance(c,int) and c>=400):
-                        checked_external[nu] = info if info else c
-                        broken.append((nu, c if c else 'ERR', info))
-                    else:
-                        checked_external[nu] = True
-    return visited, broken
+                    # ignore fragments at end
+                    nu = nu.split('#')[0]
+                    # ignore query-only variations by normalizing
+                    # (keep queries for now)
+                    if is_same_origin(root, nu):
+                        if nu not in visited:
+                            visited.add(nu)
+                            submit('page', nu)
+                    elif nu not in checked_external:
+                        # external link: check once, reusing a fresh cached result
+                        checked_external[nu] = None
+                        stats['external'] += 1
+                        entry = cache.get(nu) if cache else None
+                        if entry and cache.is_fresh(entry):
+                            stats['cached'] += 1
+                            record_external(nu, entry['status'], None)
+                        else:
+                            submit('external', nu, entry)
+    stats['requests'] = pool.requests
+    pool.close()
+    # completion order depends on timing; keep the report stable
+    broken.sort(key=lambda b: (str(b[0]), str(b[1])))
+    return visited, broken, stats
 
-if __name__ == '__main__':
-    print('Link checker starting at', ROOT)
-    visited, broken = crawl(ROOT)
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Crawl a local site and report broken internal and external links.')
+    ap.add_argument('root', nargs='?', default='http://127.0.0.1:8000')
+    ap.add_argument('--max-in-flight', type=int, default=MAX_IN_FLIGHT,
+                    help='maximum concurrent requests (1 crawls serially)')
+    ap.add_argument('--per-host', type=int, default=PER_HOST,
+                    help='maximum concurrent requests to a single host')
+    ap.add_argument('--serve', nargs='?', const=str(DEFAULT_SERVE_DIR), metavar='DIR',
+                    help='serve DIR (default work/web) on a local stand-in server and crawl it')
+    ap.add_argument('--max-age', type=parse_age, default=DEFAULT_MAX_AGE,
+                    help='reuse cached external results younger than this (seconds, or e.g. 90m, 12h, 7d; default 24h)')
+    ap.add_argument('--cache', default=str(DEFAULT_CACHE), help='external link cache file (SQLite)')
+    ap.add_argument('--no-cache', action='store_true', help='check every external link without the cache')
+    metrics.add_arguments(ap)
+    args = ap.parse_args(argv)
+    prof = metrics.from_args('link_check', args)
+    root = args.root
+    server = None
+    if args.serve:
+        server, root = serve_directory(args.serve)
+        print('Serving', args.serve, 'at', root)
+
+    print('Link checker starting at', root)
+    cache = None if args.no_cache else LinkCache(args.cache, args.max_age)
+    try:
+        with prof.stage('fetch'):
+            visited, broken, stats = crawl(root, max_in_flight=args.max_in_flight, per_host=args.per_host, cache=cache)
+    finally:
+        if cache:
+            cache.close()
+        if server:
+            server.shutdown()
     print('\nCrawled pages: ', len(visited))
+    print('External links: {external} ({cached} from cache, {revalidated} revalidated unchanged, '
+          '{fetched} requested)'.format(**stats))
     print('Broken links found:', len(broken))
+    prof.count('pages', len(visited))
+    prof.count('requests', stats['requests'])
+    for key in ('external', 'cached', 'revalidated'):
+        prof.count(key, stats[key])
+    prof.count('broken', len(broken))
     if broken:
         for b in broken:
             print('-', b)
-        sys.exit(2)
     else:
         print('No broken links found')
-        sys.exit(0)
+    prof.finish()
+    return 2 if broken else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Offline link checker: resolves internal links directly on disk, no server needed.
+Usage: python3 scripts/link_check_files.py              # checks work/web and docs
+       python3 scripts/link_check_files.py docs --jobs 4
+       python3 scripts/link_check_files.py --incremental  # only re-check what changed
+       python3 scripts/link_check_files.py --impact work/web/styles.css  # pages linking to a file
+
+Walks the HTML trees, parses every file once (in parallel across cores),
+resolves relative and root-relative href/src targets against the filesystem
+and checks #fragment links against the id (and <a name>) attributes of the
+target page. External URLs are left to link_check.py.
+
+With --incremental a manifest (work/output/link-manifest.json) records each
+page's content hash, extracted links, ids and broken links. Later runs only
+re-parse pages whose hash changed and only re-verify links that were added
+or whose target changed; other files are only re-hashed when their mtime or
+size changed. Without a manifest a full check is done. (The crawler,
+link_check.py, has to fetch every page to find its links, so its incremental
+counterpart is the external-result cache in link_cache.py.)
+
+--impact FILE looks up the pages referencing FILE in the link graph index
+(link_graph.py) and checks only those, e.g. before moving or renaming FILE.
+"""
+import argparse, hashlib, json, os, sys, time, urllib.parse
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+from pathlib import Path
+
+import metrics
+
+repo = Path(__file__).resolve().parents[1]
+DEFAULT_DIRS = [repo / 'work' / 'web', repo / 'docs']
+DEFAULT_MANIFEST = repo / 'work' / 'output' / 'link-manifest.json'
+MANIFEST_VERSION = 2
+HTML_EXTS = ('.html', '.htm')
+# fragments every browser resolves without a matching id
+IMPLICIT_FRAGMENTS = ('', 'top')
+# below this many pages a process pool costs more than it saves
+PARALLEL_MIN = 16
+
+class PageParser(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.links = []
+        self.ids = set()
+    def handle_starttag(self, tag, attrs):
+        for k,v in attrs:
+            if not v:
+                continue
+            if k in ('href','src'):
+                self.links.append((self.getpos()[0], v))
+            elif k == 'id' or (k == 'name' and tag == 'a'):
+                self.ids.add(v)
+
+def scan_page(path):
+    """Parse one HTML file; returns (path, sha1, links, ids)."""
+    data = Path(path).read_bytes()
+    p = PageParser()
+    p.feed(data.decode('utf-8', errors='ignore'))
+    p.close()
+    return str(path), hashlib.sha1(data).hexdigest(), p.links, sorted(p.ids)
+
+def file_hash(path):
+    return hashlib.sha1(Path(path).read_bytes()).hexdigest()
+
+def html_files(dirs):
+    files = []
+    for d in dirs:
+        for root, subdirs, names in os.walk(d):
+            subdirs[:] = sorted(s for s in subdirs if not s.startswith('.') and s != 'node_modules')
+            files += [os.path.join(root, n) for n in sorted(names) if n.lower().endswith(HTML_EXTS)]
+    return files
+
+def resolve(page, link, site_root):
+    """Map a link on page to (target_path, fragment); None for links not checked on disk."""
+    link = link.strip()
+    parts = urllib.parse.urlsplit(link)
+    # external URLs, mailto:, tel:, javascript:, data: and protocol-relative links
+    if parts.scheme or parts.netloc or link.startswith('//'):
+        return None
+    # template placeholders filled in at runtime
+    if '{{' in link or '${' in link:
+        return None
+    fragment = urllib.parse.unquote(parts.fragment)
+    path = urllib.parse.unquote(parts.path)
+    if not path:
+        return page, fragment
+    base = site_root if path.startswith('/') else os.path.dirname(page)
+    target = os.path.normpath(os.path.join(base, path.lstrip('/')))
+    if os.path.isdir(target):
+        target = os.path.join(target, 'index.html')
+    return target, fragment
+
+class LinkVerifier:
+    """Verifies resolved links, caching file existence and target ids."""
+    def __init__(self, pages, site_root):
+        self.site_root = site_root
+        self.exists = {}
+        self.ids = {p: set(entry['ids']) for p, entry in pages.items()}
+        self.external_targets = set()
+        # non-page targets' manifest entries as of the last run (see target_state)
+        self.target_states = {}
+
+    def verify(self, target, fragment):
+        """Returns the reason the link is broken, or None."""
+        if target not in self.exists:
+            self.exists[target] = os.path.isfile(target)
+        if not self.exists[target]:
+            return 'missing file'
+        if fragment in IMPLICIT_FRAGMENTS or not target.lower().endswith(HTML_EXTS):
+            return None
+        if target not in self.ids:
+            # target lives outside the scanned trees: parse it on demand
+            self.ids[target] = set(scan_page(target)[3])
+            self.external_targets.add(target)
+        if fragment not in self.ids[target]:
+            return 'missing anchor #' + fragment
+        return None
+
+def scan_pages(files, jobs=None):
+    """Parse files (in parallel when there are enough); returns path -> manifest entry."""
+    if jobs == 1 or len(files) < PARALLEL_MIN:
+        results = map(scan_page, files)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as ex:
+            results = list(ex.map(scan_page, files, chunksize=max(1, len(files) // ((jobs or os.cpu_count() or 1) * 4))))
+    pages = {}
+    for path, digest, links, ids in results:
+        st = os.stat(path)
+        pages[path] = {'hash': digest, 'mtime': st.st_mtime_ns, 'size': st.st_size, 'links': links, 'ids': ids}
+    return pages
+
+def check_links(pages, site_root, previous=None, changed_targets=frozenset()):
+    """Verify links of pages; returns (broken, verified, verifier).
+
+    previous maps page -> (links, {link: reason}) from the last run; links
+    found there whose target is not in changed_targets keep their verdict.
+    """
+    verifier = LinkVerifier(pages, site_root)
+    previous = previous or {}
+    broken = []
+    verified = 0
+    for page, entry in pages.items():
+        old_links, old_broken = previous.get(page, ((), {}))
+        old_links = set(old_links)
+        for line, link in entry['links']:
+            resolved = resolve(page, link, site_root)
+            if resolved is None:
+                continue
+            target, fragment = resolved
+            if link in old_links and target not in changed_targets:
+                reason = old_broken.get(link)
+            else:
+                reason = verifier.verify(target, fragment)
+                verified += 1
+            if reason:
+                broken.append((page, line, link, reason))
+    broken.sort()
+    return broken, verified, verifier
+
+def load_manifest(path, site_root):
+    try:
+        with open(path, 'r', encoding='utf-8') as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('version') != MANIFEST_VERSION or manifest.get('site_root') != site_root:
+        return None
+    return manifest
+
+def target_state(path, old=None):
+    """Manifest entry of a non-page target, None if it is missing; hashed only when
+    mtime or size differ from old."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if not os.path.isfile(path):
+        return None
+    if old and old['mtime'] == st.st_mtime_ns and old['size'] == st.st_size:
+        return old
+    return {'hash': file_hash(path), 'mtime': st.st_mtime_ns, 'size': st.st_size}
+
+def save_manifest(path, site_root, pages, broken, verifier):
+    rel = lambda p: os.path.relpath(p, site_root)
+    by_page = {}
+    for page, _, link, reason in broken:
+        by_page.setdefault(rel(page), {})[link] = reason
+    # non-HTML (and out-of-tree) targets whose appearance/removal would change verdicts
+    targets = {}
+    for target, exists in verifier.exists.items():
+        if target not in pages:
+            targets[rel(target)] = target_state(target, verifier.target_states.get(target)) if exists else None
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'site_root': site_root,
+        'pages': {rel(p): dict(e, broken=by_page.get(rel(p), {})) for p, e in pages.items()},
+        'targets': targets,
+    }
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as fh:
+        json.dump(manifest, fh, separators=(',', ':'))
+
+def check_incremental(files, site_root, manifest, jobs=None):
+    """Re-parse changed pages and re-verify only affected links against manifest."""
+    absolute = lambda p: os.path.normpath(os.path.join(site_root, p))
+    old_pages = {absolute(p): e for p, e in manifest['pages'].items()}
+    pages, changed = {}, []
+    for path in files:
+        old = old_pages.get(path)
+        st = os.stat(path)
+        if old and old['mtime'] == st.st_mtime_ns and old['size'] == st.st_size:
+            pages[path] = old
+        elif old and old['hash'] == file_hash(path):
+            pages[path] = dict(old, mtime=st.st_mtime_ns, size=st.st_size)
+        else:
+            changed.append(path)
+    pages.update(scan_pages(changed, jobs))
+
+    # targets whose verdicts may differ: pages added, removed or with different ids,
+    # and other files that appeared, disappeared or changed since the last run
+    changed_targets = set(p for p in old_pages if p not in pages)
+    for path in changed:
+        old = old_pages.get(path)
+        if old is None or old['ids'] != pages[path]['ids']:
+            changed_targets.add(path)
+    target_states = {}
+    for target, old in manifest['targets'].items():
+        target = absolute(target)
+        current = target_states[target] = target_state(target, old)
+        if (current and current['hash']) != (old and old['hash']):
+            changed_targets.add(target)
+
+    previous = {p: ([l for _, l in e['links']], e.get('broken', {})) for p, e in old_pages.items()}
+    broken, verified, verifier = check_links(pages, site_root, previous, changed_targets)
+    verifier.target_states = target_states
+    # carry forward out-of-tree targets that were not re-verified this time
+    for target in manifest['targets']:
+        target = absolute(target)
+        if target not in verifier.exists:
+            verifier.exists[target] = os.path.isfile(target)
+    return pages, broken, verified, verifier, changed
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Check internal links in HTML trees on disk.')
+    ap.add_argument('dirs', nargs='*', default=[str(d) for d in DEFAULT_DIRS])
+    ap.add_argument('--site-root', default=str(repo),
+                    help='directory that root-relative links (/path) resolve against (default: repo root)')
+    ap.add_argument('--jobs', type=int, default=None, help='worker processes (default: all cores)')
+    ap.add_argument('--incremental', action='store_true',
+                    help='only re-check pages and links affected since the last --incremental run')
+    ap.add_argument('--manifest', default=str(DEFAULT_MANIFEST), help='manifest file used by --incremental')
+    ap.add_argument('--impact', metavar='FILE', action='append',
+                    help='only check the pages that reference FILE (repeatable; uses the link graph index)')
+    metrics.add_arguments(ap)
+    args = ap.parse_args(argv)
+    stats = metrics.from_args('link_check_files', args)
+
+    start = time.perf_counter()
+    site_root = os.path.abspath(args.site_root)
+    with stats.stage('discover'):
+        files = html_files([os.path.abspath(d) for d in args.dirs if os.path.isdir(d)])
+    if args.impact:
+        # imported here: link_graph builds on this module
+        from link_graph import LinkGraph
+        graph = LinkGraph()
+        graph.update()
+        graph.save()
+        impacted = set()
+        for target in args.impact:
+            pages = graph.linked_from(target)
+            print('{} pages reference {}'.format(len(pages), target))
+            impacted.update(os.path.realpath(p) for p in pages)
+        files = [f for f in files if os.path.realpath(f) in impacted]
+        args.incremental = False
+    manifest = load_manifest(args.manifest, site_root) if args.incremental else None
+    if manifest:
+        with stats.stage('check'):
+            pages, broken, verified, verifier, changed = check_incremental(files, site_root, manifest, args.jobs)
+        print('Incremental check: {} of {} pages changed'.format(len(changed), len(pages)))
+    else:
+        if args.incremental:
+            print('No usable manifest at', args.manifest, '- running a full check')
+        print('Scanning', len(files), 'HTML files')
+        # workers read and parse the pages
+        with stats.stage('parse'):
+            pages = scan_pages(files, args.jobs)
+        with stats.stage('check'):
+            broken, verified, verifier = check_links(pages, site_root)
+    if args.incremental:
+        save_manifest(args.manifest, site_root, pages, broken, verifier)
+    links = sum(len(e['links']) for e in pages.values())
+    print('Verified {} of {} links in {} pages in {:.2f}s'.format(verified, links, len(pages), time.perf_counter() - start))
+    print('Broken links:', len(broken))
+    stats.count('files', len(pages))
+    stats.count('links', links)
+    stats.count('links_verified', verified)
+    stats.count('broken', len(broken))
+    if broken:
+        for page, line, link, reason in broken:
+            print('- {}:{}: {} ({})'.format(os.path.relpath(page, repo), line, link, reason))
+    else:
+        print('No broken links found')
+    stats.finish()
+    return 2 if broken else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,13 +2,24 @@
 """
 Link checker for internal links only.
 Usage: python3 scripts/link_check_internal.py http://127.0.0.1:8000
+       python3 scripts/link_check_internal.py --serve   # check work/web via a local stand-in
+
+Each page is fetched with a single GET that yields status, headers and body
+together and HTML is parsed as it streams in; non-HTML assets (images, CSS, JS, ...) are only checked with HEAD.
 """
-import sys, urllib.request, urllib.parse, urllib.error, socket
+import argparse, posixpath, sys, urllib.parse
 from html.parser import HTMLParser
 from collections import deque
+from pathlib import Path
+
+import metrics
+from link_fetch import ConnectionPool, body_feeder, fetch, serve_directory
 
-ROOT = sys.argv[1] if len(sys.argv) > 1 else 'http://127.0.0.1:8000'
 TIMEOUT = 5
+DEFAULT_SERVE_DIR = Path(__file__).resolve().parents[1] / 'work' / 'web'
+PAGE_EXTS = ('', '.html', '.htm')
+# src on these tags loads a document, not an asset
+FRAME_TAGS = ('iframe', 'frame')
 
 class LinkParser(HTMLParser):
     def __init__(self):
@@ -17,7 +28,7 @@ class LinkParser(HTMLParser):
     def handle_starttag(self, tag, attrs):
         for k,v in attrs:
             if k in ('href','src') and v:
-                self.links.append(v)
+                self.links.append((v, k == 'src' and tag not in FRAME_TAGS))
 
 def norm_url(base, url):
     if url.startswith('javascript:') or url.startswith('mailto:') or url.startswith('tel:'):
@@ -31,62 +42,100 @@ def is_same_origin(a, b):
     pb = urllib.parse.urlparse(b)
     return (pa.scheme, pa.hostname, pa.port) == (pb.scheme, pb.hostname, pb.port)
 
-def fetch_status(url):
-    try:
-        req = urllib.request.Request(url, headers={'User-Agent':'azaccess-link-checker/1.0'})
-        with urllib.request.urlopen(req, timeout=TIMEOUT) as res:
-            return res.getcode()
-    except urllib.error.HTTPError as e:
-        return e.code
-    except Exception as e:
-        return None
+def is_asset(url, from_src):
+    ext = posixpath.splitext(urllib.parse.urlsplit(url).path)[1].lower()
+    return from_src or ext not in PAGE_EXTS
+
+def fetch_asset(pool, url):
+    """Check an asset with HEAD, falling back to GET for servers that reject HEAD."""
+    status, headers, _, _ = fetch(pool, url, method='HEAD')
+    if status in (405, 501):
+        status, headers, _, _ = fetch(pool, url)
+        return status, headers, 2
+    return status, headers, 1
 
-def crawl_internal(root):
+def crawl_internal(root, pool=None):
+    """Returns (visited, broken, stats); stats counts requests made and saved."""
+    pool = pool or ConnectionPool(timeout=TIMEOUT)
     visited = set()
-    q = deque([root])
+    q = deque([(root, False)])
     broken = []
+    stats = {'requests': 0, 'head': 0, 'legacy_requests': 0}
 
     while q:
-        url = q.popleft()
+        url, asset = q.popleft()
         if url in visited:
             continue
         visited.add(url)
         print('Checking', url)
-        status = fetch_status(url)
+        if asset:
+            status, headers, used = fetch_asset(pool, url)
+            stats['requests'] += used
+            stats['head'] += 1
+            p = None
+        else:
+            # only HTML is parsed, chunk by chunk while the body streams in
+            p = LinkParser()
+            def on_body(status, headers):
+                if status < 400 and 'text/html' in headers.get('Content-Type', ''):
+                    return body_feeder(p)
+            status, headers, _, error = fetch(pool, url, on_body=on_body)
+            stats['requests'] += 1
+        # the old pipeline issued a status GET plus a second GET for the body
+        stats['legacy_requests'] += 2 if status is not None and status < 400 else 1
         if status is None or status >= 400:
             broken.append((url, status))
             continue
-        # parse only if HTML
-        try:
-            req = urllib.request.Request(url, headers={'User-Agent':'azaccess-link-checker/1.0'})
-            with urllib.request.urlopen(req, timeout=TIMEOUT) as res:
-                ct = res.headers.get('Content-Type','')
-                if 'text/html' not in ct:
-                    continue
-                data = res.read(65536).decode('utf-8', errors='ignore')
-        except Exception as e:
-            broken.append((url, str(e)))
+        if p is None:
             continue
-        p = LinkParser()
-        p.feed(data)
-        for raw in p.links:
+        for raw, from_src in p.links:
             nu = norm_url(url, raw)
             if not nu:
                 continue
             nu = nu.split('#')[0]
             if is_same_origin(root, nu):
                 if nu not in visited:
-                    q.append(nu)
-    return visited, broken
+                    q.append((nu, is_asset(nu, from_src)))
+    pool.close()
+    stats['saved'] = stats['legacy_requests'] - stats['requests']
+    return visited, broken, stats
 
-if __name__ == '__main__':
-    print('Internal link checker starting at', ROOT)
-    visited, broken = crawl_internal(ROOT)
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Crawl a local site and report broken internal links.')
+    ap.add_argument('root', nargs='?', default='http://127.0.0.1:8000')
+    ap.add_argument('--serve', nargs='?', const=str(DEFAULT_SERVE_DIR), metavar='DIR',
+                    help='serve DIR (default work/web) on a local stand-in server and check it')
+    metrics.add_arguments(ap)
+    args = ap.parse_args(argv)
+    prof = metrics.from_args('link_check_internal', args)
+    root = args.root
+    server = None
+    if args.serve:
+        server, root = serve_directory(args.serve)
+        print('Serving', args.serve, 'at', root)
+
+    print('Internal link checker starting at', root)
+    try:
+        with prof.stage('fetch'):
+            visited, broken, stats = crawl_internal(root)
+    finally:
+        if server:
+            server.shutdown()
     print('\nPages checked:', len(visited))
+    print('Requests made: {} ({} HEAD-only asset checks), {} saved versus the double-GET pipeline ({})'.format(
+        stats['requests'], stats['head'], stats['saved'], stats['legacy_requests']))
     print('Broken internal links:', len(broken))
+    prof.count('pages', len(visited))
+    prof.count('requests', stats['requests'])
+    prof.count('head_requests', stats['head'])
+    prof.count('broken', len(broken))
     if broken:
         for b in broken:
             print('-', b)
-        sys.exit(2)
-    print('No broken internal links found')
-    sys.exit(0)
+    else:
+        print('No broken internal links found')
+    prof.finish()
+    return 2 if broken else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
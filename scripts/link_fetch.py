@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP helpers for the link checkers.
+
+- ConnectionPool keeps one keep-alive connection per host in each worker
+  thread and caps how many requests may be in flight against a single host.
+- body_feeder streams a response body into an HTMLParser as chunks arrive,
+  so pages are parsed in full without buffering them.
+- serve_directory starts a local http.server stand-in (e.g. for work/web) so
+  the checkers can be run without a separately started server.
+"""
+import codecs, functools, http.client, socket, threading, urllib.parse
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+USER_AGENT = 'azaccess-link-checker/1.0'
+TIMEOUT = 5
+MAX_REDIRECTS = 10
+# unread response bodies up to this size are drained so the connection can be reused
+DRAIN_LIMIT = 256 * 1024
+CHUNK_SIZE = 16384
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+# errors raised when a kept-alive connection was closed by the server while idle
+STALE_ERRORS = (http.client.RemoteDisconnected, http.client.CannotSendRequest,
+                http.client.BadStatusLine, ConnectionResetError, BrokenPipeError)
+
+
+class ConnectionPool:
+    def __init__(self, per_host=4, timeout=TIMEOUT):
+        self.per_host = per_host
+        self.timeout = timeout
+        self.requests = 0
+        self._local = threading.local()
+        self._slots = {}
+        self._lock = threading.Lock()
+        # live connections of every thread, closed by close(); dropped ones are removed
+        self._opened = set()
+
+    def _slot(self, key):
+        with self._lock:
+            sem = self._slots.get(key)
+            if sem is None:
+                sem = self._slots[key] = threading.BoundedSemaphore(self.per_host)
+            return sem
+
+    def _connections(self):
+        conns = getattr(self._local, 'conns', None)
+        if conns is None:
+            conns = self._local.conns = {}
+        return conns
+
+    def _connect(self, key):
+        scheme, host, port = key
+        if scheme == 'https':
+            conn = http.client.HTTPSConnection(host, port, timeout=self.timeout)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=self.timeout)
+        with self._lock:
+            self._opened.add(conn)
+        return conn
+
+    def close(self):
+        with self._lock:
+            opened, self._opened = self._opened, set()
+        for conn in opened:
+            conn.close()
+
+    def _drop(self, key):
+        conn = self._connections().pop(key, None)
+        if conn is not None:
+            conn.close()
+            with self._lock:
+                self._opened.discard(conn)
+
+    def _send(self, key, method, target, headers):
+        conns = self._connections()
+        reused = key in conns
+        if not reused:
+            conns[key] = self._connect(key)
+        try:
+            conns[key].request(method, target, headers=headers)
+            with self._lock:
+                self.requests += 1
+            return conns[key].getresponse()
+        except STALE_ERRORS:
+            self._drop(key)
+            if not reused:
+                raise
+            # the server closed the idle keep-alive connection: retry once on a fresh one
+            conns[key] = self._connect(key)
+            conns[key].request(method, target, headers=headers)
+            with self._lock:
+                self.requests += 1
+            return conns[key].getresponse()
+        except Exception:
+            self._drop(key)
+            raise
+
+    def _finish(self, key, res):
+        # leave the connection reusable when possible, otherwise close it
+        if not res.isclosed():
+            if res.length is not None and res.length <= DRAIN_LIMIT:
+                res.read()
+            else:
+                self._drop(key)
+                return
+        if res.will_close:
+            self._drop(key)
+
+    def request(self, method, url, headers=None, body_limit=0, on_body=None):
+        """Issue a request, following redirects like urlopen does.
+
+        Returns (status, headers, body, final_url); body holds at most
+        body_limit bytes (None reads the whole body). When on_body is given it
+        is called with (status, headers) and may return a consumer that is fed
+        the body chunk by chunk as it arrives (then b'' at the end) instead.
+        """
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urllib.parse.urlsplit(url)
+            if parts.scheme not in ('http', 'https') or not parts.hostname:
+                raise ValueError('unsupported URL: ' + url)
+            key = (parts.scheme, parts.hostname, parts.port)
+            target = parts.path or '/'
+            if parts.query:
+                target += '?' + parts.query
+            hdrs = {'User-Agent': USER_AGENT}
+            hdrs.update(headers or {})
+            with self._slot(key):
+                res = self._send(key, method, target, hdrs)
+                location = res.getheader('Location')
+                if res.status in REDIRECT_CODES and location:
+                    self._finish(key, res)
+                    url = urllib.parse.urljoin(url, location)
+                    if res.status == 303 and method != 'HEAD':
+                        method = 'GET'
+                    continue
+                data = b''
+                consumer = on_body(res.status, res.headers) if on_body and method != 'HEAD' else None
+                if consumer:
+                    while True:
+                        chunk = res.read1(CHUNK_SIZE)
+                        consumer(chunk)
+                        if not chunk:
+                            break
+                elif method != 'HEAD' and body_limit != 0:
+                    data = res.read() if body_limit is None else res.read(body_limit)
+                self._finish(key, res)
+                return res.status, res.headers, data, url
+        raise http.client.HTTPException('too many redirects')
+
+
+def fetch(pool, url, method='GET', headers=None, body_limit=0, on_body=None):
+    """Return (status, headers, body, error) without raising for network errors."""
+    try:
+        status, hdrs, data, _ = pool.request(method, url, headers=headers, body_limit=body_limit, on_body=on_body)
+        return status, hdrs, data, None
+    except socket.timeout:
+        return None, None, None, 'timeout'
+    except Exception as e:
+        return None, None, None, str(e)
+
+
+def body_feeder(parser):
+    """Consumer for on_body that decodes UTF-8 incrementally into parser.feed()."""
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+    def feed(chunk):
+        parser.feed(decoder.decode(chunk, final=not chunk))
+        if not chunk:
+            parser.close()
+    return feed
+
+
+class _StandInHandler(SimpleHTTPRequestHandler):
+    # HTTP/1.1 so the checkers' keep-alive connections are exercised
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_directory(directory, port=0):
+    """Serve directory on 127.0.0.1 in a background thread; returns (server, root_url)."""
+    handler = functools.partial(_StandInHandler, directory=str(directory))
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, 'http://127.0.0.1:%d/' % server.server_port
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Persistent link graph of the HTML trees (work/web and docs).
+
+For every page the index (work/output/link-graph.json) keeps its content hash
+and the references found in it: any attribute value or JS string that looks
+like a path to an .html, .md, .js or .css file. Reverse "who links to me"
+edges are derived from those when first needed. update() only re-reads pages whose
+mtime/size changed, so the sync/move scripts can keep it current cheaply and
+then open just the pages that reference what they rewrite.
+
+Usage: python3 scripts/link_graph.py                                  # refresh the index
+       python3 scripts/link_graph.py --linked-from work/web/shared/do-dont.html
+       python3 scripts/link_graph.py --mentioning ../shared/
+"""
+import argparse, json, os, posixpath, re, sys
+from html.parser import HTMLParser
+from pathlib import Path
+
+import metrics
+from link_check_files import DEFAULT_DIRS, file_hash, html_files
+
+repo = Path(__file__).resolve().parents[1]
+DEFAULT_PATH = repo / 'work' / 'output' / 'link-graph.json'
+INDEX_VERSION = 2
+# a run of non-delimiter characters ending in a known extension. Runs are split
+# out first and then searched for the extension, so long runs (minified JS,
+# data: URIs) are scanned once rather than once per start position.
+TOKEN_RE = re.compile(r'[^\s"\'`()<>]+')
+EXT_RE = re.compile(r'\.(?:html?|md|js|css)\b')
+
+def text_refs(text, refs):
+    for token in TOKEN_RE.findall(text):
+        if '.' not in token:
+            continue
+        start = 0
+        for m in EXT_RE.finditer(token):
+            refs.add(token[start:m.end()])
+            start = m.end()
+
+class RefParser(HTMLParser):
+    """Attribute values as the HTML parser (and link_check_files.py) sees them,
+    quoted or not, plus the text of scripts, styles and comments."""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.refs = set()
+    def handle_starttag(self, tag, attrs):
+        for k, v in attrs:
+            if v:
+                text_refs(v, self.refs)
+    handle_startendtag = handle_starttag
+    def handle_data(self, data):
+        text_refs(data, self.refs)
+    def handle_comment(self, data):
+        text_refs(data, self.refs)
+
+def page_refs(text):
+    p = RefParser()
+    p.feed(text)
+    p.close()
+    return sorted(p.refs)
+
+def resolve_ref(page, ref):
+    """Repo-relative target of ref on page (a repo-relative path), or None for external URLs."""
+    ref = ref.split('#')[0].split('?')[0]
+    if not ref or ':' in ref or ref.startswith('//'):
+        return None
+    if ref.startswith('/'):
+        return posixpath.normpath(ref.lstrip('/'))
+    return posixpath.normpath(posixpath.join(posixpath.dirname(page), ref))
+
+class LinkGraph:
+    def __init__(self, path=DEFAULT_PATH, dirs=DEFAULT_DIRS):
+        self.path = Path(path)
+        self.dirs = [str(d) for d in dirs]
+        self.pages = {}
+        self._reverse = None
+        try:
+            with open(self.path, 'r', encoding='utf-8') as fh:
+                data = json.load(fh)
+            if data.get('version') == INDEX_VERSION:
+                self.pages = data['pages']
+        except (OSError, ValueError):
+            pass
+
+    @property
+    def reverse(self):
+        """target -> pages referencing it, built on first use (sync only needs mentioning())."""
+        if self._reverse is None:
+            self._reverse = {}
+            for page, entry in self.pages.items():
+                for ref in entry['refs']:
+                    target = resolve_ref(page, ref)
+                    if target:
+                        self._reverse.setdefault(target, set()).add(page)
+        return self._reverse
+
+    def update(self, files=None):
+        """Bring the index up to date with the trees on disk; returns the pages re-read."""
+        files = html_files(self.dirs) if files is None else files
+        pages, rescanned = {}, []
+        for path in files:
+            rel = os.path.relpath(path, repo).replace(os.sep, '/')
+            old = self.pages.get(rel)
+            st = os.stat(path)
+            if old and old['mtime'] == st.st_mtime_ns and old['size'] == st.st_size:
+                pages[rel] = old
+                continue
+            digest = file_hash(path)
+            if old and old['hash'] == digest:
+                pages[rel] = dict(old, mtime=st.st_mtime_ns, size=st.st_size)
+                continue
+            with open(path, 'r', encoding='utf-8', errors='ignore') as fh:
+                refs = page_refs(fh.read())
+            pages[rel] = {'hash': digest, 'mtime': st.st_mtime_ns, 'size': st.st_size, 'refs': refs}
+            rescanned.append(str(path))
+        self.pages = pages
+        self._reverse = None
+        return rescanned
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as fh:
+            json.dump({'version': INDEX_VERSION, 'pages': self.pages}, fh, separators=(',', ':'), sort_keys=True)
+
+    def linked_from(self, target):
+        """Absolute paths of the pages referencing target."""
+        rel = os.path.relpath(os.path.abspath(target), repo).replace(os.sep, '/')
+        return sorted(str(repo / p) for p in self.reverse.get(rel, ()))
+
+    def mentioning(self, substring, within=None):
+        """Absolute paths of the pages (under within, if given) with a reference containing substring."""
+        pages = sorted(repo / p for p, e in self.pages.items() if any(substring in r for r in e['refs']))
+        if within is not None:
+            within = Path(within).resolve()
+            pages = [p for p in pages if within in p.parents]
+        return [str(p) for p in pages]
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Build or query the link graph of work/web and docs.')
+    ap.add_argument('--linked-from', metavar='FILE', help='list the pages referencing FILE')
+    ap.add_argument('--mentioning', metavar='TEXT', help='list the pages with a reference containing TEXT')
+    ap.add_argument('--index', default=str(DEFAULT_PATH), help='index file (default: work/output/link-graph.json)')
+    metrics.add_arguments(ap)
+    args = ap.parse_args(argv)
+    stats = metrics.from_args('link_graph', args)
+
+    with stats.stage('read'):
+        graph = LinkGraph(args.index)
+    with stats.stage('parse'):
+        rescanned = graph.update()
+    with stats.stage('write'):
+        graph.save()
+    stats.count('files', len(graph.pages))
+    stats.count('files_parsed', len(rescanned))
+    if args.linked_from:
+        pages = graph.linked_from(args.linked_from)
+    elif args.mentioning:
+        pages = graph.mentioning(args.mentioning)
+    else:
+        print('Indexed {} pages ({} re-read), {} link targets'.format(len(graph.pages), len(rescanned), len(graph.reverse)))
+        stats.finish()
+        return 0
+    for p in pages:
+        print(os.path.relpath(p, repo))
+    stats.finish()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Per-stage timing and counters shared by the site scripts.
+
+Scripts add the common options with add_arguments(ap) and build a Metrics
+with from_args(tool, args):
+    --profile        print wall/CPU time per stage and the counters at the end,
+                     and write them to work/output/metrics/<tool>.json
+    --metrics FILE   write the metrics JSON to FILE instead (implies --profile)
+    --pstats FILE    also run under cProfile and dump the stats to FILE
+                     (read with python3 -m pstats FILE)
+
+Stages use the names discover, read, parse, transform, write and fetch where
+they fit; work done inside worker processes is reported by the workers and
+summed, so a stage can take longer than the run on many cores. Counters
+are files, bytes and requests plus anything tool specific.
+
+Compare two metrics files (e.g. archived by CI):
+    python3 scripts/metrics.py old.json new.json
+"""
+import argparse, contextlib, cProfile, datetime, json, os, sys, time
+from collections import Counter
+from pathlib import Path
+
+repo = Path(__file__).resolve().parents[1]
+DEFAULT_DIR = repo / 'work' / 'output' / 'metrics'
+METRICS_VERSION = 1
+STAGES = ('discover', 'read', 'parse', 'transform', 'write', 'fetch')
+
+class Metrics:
+    """Collects stage times and counters for one run; cheap enough to leave on."""
+    def __init__(self, tool, enabled=False, output=None, pstats=None):
+        self.tool = tool
+        self.enabled = enabled or bool(output) or bool(pstats)
+        self.output = output or (DEFAULT_DIR / (tool + '.json') if self.enabled else None)
+        self.pstats = pstats
+        self.stages = {}
+        self.counters = Counter()
+        self.profiler = None
+        self.started = time.perf_counter()
+        self.started_cpu = time.process_time()
+        if pstats:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield self
+        finally:
+            self.add(name, time.perf_counter() - wall, time.process_time() - cpu)
+
+    def add(self, name, wall, cpu=None, calls=1):
+        """Add time measured elsewhere (e.g. in a worker process) to a stage.
+
+        Without cpu the wall time is counted as CPU time too, which holds for the
+        single-threaded workers this is used for.
+        """
+        s = self.stages.setdefault(name, {'wall': 0.0, 'cpu': 0.0, 'calls': 0})
+        s['wall'] += wall
+        s['cpu'] += wall if cpu is None else cpu
+        s['calls'] += calls
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def as_dict(self):
+        order = {name: i for i, name in enumerate(STAGES)}
+        return {
+            'version': METRICS_VERSION,
+            'tool': self.tool,
+            'date': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'argv': sys.argv[1:],
+            'wall': round(time.perf_counter() - self.started, 4),
+            'cpu': round(time.process_time() - self.started_cpu, 4),
+            'stages': {name: {k: round(v, 4) if isinstance(v, float) else v for k, v in s.items()}
+                       for name, s in sorted(self.stages.items(), key=lambda kv: (order.get(kv[0], len(order)), kv[0]))},
+            'counters': dict(sorted(self.counters.items())),
+        }
+
+    def finish(self, out=None):
+        """Stop profiling, print the summary and write the files (if enabled)."""
+        if self.profiler:
+            self.profiler.disable()
+            self.profiler.dump_stats(self.pstats)
+            self.profiler = None
+        if not self.enabled:
+            return None
+        out = out or sys.stdout
+        data = self.as_dict()
+        print('\nProfile ({}): {:.3f}s wall, {:.3f}s CPU'.format(self.tool, data['wall'], data['cpu']), file=out)
+        for name, s in data['stages'].items():
+            print('  {:<12} {:>9.3f}s wall {:>9.3f}s CPU  {:>7} calls'.format(name, s['wall'], s['cpu'], s['calls']), file=out)
+        if data['counters']:
+            print('  ' + ', '.join('{} {}'.format(k, v) for k, v in data['counters'].items()), file=out)
+        Path(self.output).parent.mkdir(parents=True, exist_ok=True)
+        tmp = str(self.output) + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump(data, fh, indent=1)
+            fh.write('\n')
+        os.replace(tmp, self.output)
+        print('  metrics written to', self.output, file=out)
+        if self.pstats:
+            print('  cProfile stats written to', self.pstats, file=out)
+        return data
+
+def add_arguments(ap):
+    ap.add_argument('--profile', action='store_true',
+                    help='report wall/CPU time per stage and counters; write work/output/metrics/<tool>.json')
+    ap.add_argument('--metrics', metavar='FILE', dest='metrics_path', help='write the metrics JSON to FILE (implies --profile)')
+    ap.add_argument('--pstats', metavar='FILE', help='run under cProfile and dump the stats to FILE (implies --profile)')
+
+def from_args(tool, args):
+    return Metrics(tool, args.profile, args.metrics_path, args.pstats)
+
+def compare(old, new):
+    """Lines comparing two metrics dicts, stage by stage."""
+    def pct(a, b):
+        return '{:+.1f}%'.format(100 * (b - a) / a) if a else ''
+    lines = ['{} -> {}: {:.3f}s -> {:.3f}s wall {}'.format(old.get('tool'), new.get('tool'), old['wall'], new['wall'], pct(old['wall'], new['wall']))]
+    for name in list(old['stages']) + [n for n in new['stages'] if n not in old['stages']]:
+        a, b = old['stages'].get(name, {}).get('wall', 0), new['stages'].get(name, {}).get('wall', 0)
+        lines.append('  {:<12} {:>9.3f}s -> {:>9.3f}s {}'.format(name, a, b, pct(a, b)))
+    for name in sorted(set(old['counters']) | set(new['counters'])):
+        a, b = old['counters'].get(name, 0), new['counters'].get(name, 0)
+        if a != b:
+            lines.append('  {:<12} {} -> {}'.format(name, a, b))
+    return lines
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Compare two metrics files written with --profile.')
+    ap.add_argument('old')
+    ap.add_argument('new')
+    args = ap.parse_args(argv)
+    with open(args.old, encoding='utf-8') as fh:
+        old = json.load(fh)
+    with open(args.new, encoding='utf-8') as fh:
+        new = json.load(fh)
+    print('\n'.join(compare(old, new)))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,26 +2,28 @@
 """
 Move HTML files from work/web/shared into work/web root, update internal paths,
 and update links in work/web and docs to point to the new locations.
+Supports the shared fixer modes (--dry-run, --check, --manifest); see fix_engine.py.
+All changes are planned in memory first, so a dry run touches no files; files
+whose content is unchanged are not rewritten and the rest are replaced atomically.
+Only pages that the link graph index (link_graph.py) lists as referencing
+shared/ paths are opened for patching.
 """
-import os, re, shutil
+import os, re, sys
+
+from file_sync import write_atomic
+from fix_engine import Result, finish, parse_args, unified_diff
+from link_graph import LinkGraph
+
 repo = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 web_shared = os.path.join(repo, 'work', 'web', 'shared')
 web_root = os.path.join(repo, 'work', 'web')
 docs_dir = os.path.join(repo, 'docs')
 
-if not os.path.isdir(web_shared):
-    print('No work/web/shared directory found; nothing to do')
-    raise SystemExit(1)
+def read(path):
+    with open(path, 'r', encoding='utf-8') as fh:
+        return fh.read()
 
-html_files = [f for f in os.listdir(web_shared) if f.lower().endswith('.html')]
-print('Found', len(html_files), 'HTML files in work/web/shared')
-
-for name in html_files:
-    src = os.path.join(web_shared, name)
-    dst = os.path.join(web_root, name)
-    print('Processing', name)
-    with open(src, 'r', encoding='utf-8') as fh:
-        s = fh.read()
+def relocate_renderer(s):
     # Adjust CSS/home links: when moved to web root, ../styles.css -> styles.css, ../home.html -> home.html
     s = s.replace('../styles.css', 'styles.css')
     s = s.replace('../home.html', 'home.html')
@@ -32,56 +34,90 @@ for name in html_files:
     # Also, if any other relative fetch paths exist like fetch(mdFile) and use ../shared, normalize to shared/
     s = s.replace("fetch('../shared/", "fetch('shared/")
     s = s.replace('fetch("../shared/', 'fetch("shared/')
-    # Write to web root (overwrite if exists)
-    with open(dst, 'w', encoding='utf-8') as fh:
-        fh.write(s)
-    print('Wrote', dst)
+    return s
+
+def patch_web_links(t):
+    # href='shared/foo.html' or href="shared/foo.html"
+    t = re.sub(r"href=(?P<q>[\'\"])shared/(?P<n>[^\'\"]+?\.html)(?P=q)", lambda m: f"href={m.group('q')}{m.group('n')}{m.group('q')}", t)
+    # Also JS strings 'shared/foo.html'
+    t = re.sub(r"(?P<q>[\'\"])shared/(?P<n>[^\'\"]+?\.html)(?P=q)", lambda m: f"{m.group('q')}{m.group('n')}{m.group('q')}", t)
+    return t
 
-# Update links in work/web HTML files: replace href="shared/<name>.html" -> href="<name>.html"
-print('Updating references in work/web HTML files...')
-for root,dirs,files in os.walk(web_root):
-    for f in files:
-        if not f.lower().endswith('.html'):
+def patch_docs_links(t):
+    t = re.sub(r"\.\./work/web/shared/([\w\-]+?\.html)", r"../work/web/\1", t)
+    t = re.sub(r"\.\./work/web/shared/([\w\-]+?\.md)", r"../work/web/shared/\1", t)
+    return t
+
+def plan(html_files, graph):
+    """Compute every change in memory; returns (writes {path: (old, new, hits)}, deletes)."""
+    writes = {}
+    deletes = [os.path.join(web_shared, name) for name in html_files]
+    for name in html_files:
+        src = os.path.join(web_shared, name)
+        dst = os.path.join(web_root, name)
+        old = read(dst) if os.path.exists(dst) else ''
+        writes[dst] = (old, relocate_renderer(read(src)), ['relocate_renderer'])
+
+    # Update links in work/web HTML files (including the relocated renderers)
+    pages = set(graph.mentioning('shared/', web_root)) | set(writes)
+    for path in sorted(pages):
+        if path in deletes:
             continue
-        path = os.path.join(root,f)
-        with open(path,'r',encoding='utf-8') as fh:
-            t = fh.read()
-        orig = t
-        # href='shared/foo.html' or href="shared/foo.html"
-        t = re.sub(r"href=(?P<q>[\'\"])shared/(?P<n>[^\'\"]+?\.html)(?P=q)", lambda m: f"href={m.group('q')}{m.group('n')}{m.group('q')}", t)
-        # Also JS strings 'shared/foo.html'
-        t = re.sub(r"(?P<q>[\'\"])shared/(?P<n>[^\'\"]+?\.html)(?P=q)", lambda m: f"{m.group('q')}{m.group('n')}{m.group('q')}", t)
-        if t != orig:
-            with open(path,'w',encoding='utf-8') as fh:
-                fh.write(t)
-            print('Patched links in', path)
+        old, cur, hits = writes.get(path) or (read(path), None, [])
+        base = cur if cur is not None else old
+        t = patch_web_links(base)
+        if t != base:
+            writes[path] = (old, t, hits + ['patch_web_links'])
 
-# Update docs HTML files: replace ../work/web/shared/foo.html -> ../work/web/foo.html
-if os.path.isdir(docs_dir):
-    print('Updating references in docs HTML files...')
-    for root,dirs,files in os.walk(docs_dir):
-        for f in files:
-            if not f.lower().endswith('.html'):
+    # Update docs HTML files: replace ../work/web/shared/foo.html -> ../work/web/foo.html
+    if os.path.isdir(docs_dir):
+        for path in graph.mentioning('../work/web/shared/', docs_dir):
+            old = read(path)
+            t = patch_docs_links(old)
+            if t != old:
+                writes[path] = (old, t, ['patch_docs_links'])
+    return writes, deletes
+
+def apply(writes, deletes, write=True, diff=False):
+    results = []
+    for path, (old, new, hits) in sorted(writes.items()):
+        if old == new:
+            continue
+        if write:
+            write_atomic(path, new)
+            print('Wrote' if not old else 'Patched links in', path)
+        results.append(Result(path, 'modify' if old else 'create', hits, unified_diff(path, old, new) if diff else None))
+    # Remove HTML files from work/web/shared (keep md and assets)
+    for p in deletes:
+        patch = unified_diff(p, read(p), '') if diff else None
+        if write:
+            try:
+                os.remove(p)
+                print('Deleted', p)
+            except Exception as e:
+                print('Failed to delete', p, e)
                 continue
-            path = os.path.join(root,f)
-            with open(path,'r',encoding='utf-8') as fh:
-                t = fh.read()
-            orig = t
-            t = re.sub(r"\.\./work/web/shared/([\w\-]+?\.html)", r"../work/web/\1", t)
-            t = re.sub(r"\.\./work/web/shared/([\w\-]+?\.md)", r"../work/web/shared/\1", t)
-            if t != orig:
-                with open(path,'w',encoding='utf-8') as fh:
-                    fh.write(t)
-                print('Patched links in', path)
+        results.append(Result(p, 'delete', ['remove_shared_html'], patch))
+    return results
 
-# Remove HTML files from work/web/shared (keep md and assets)
-print('Removing HTML files from work/web/shared...')
-for name in html_files:
-    p = os.path.join(web_shared, name)
-    try:
-        os.remove(p)
-        print('Deleted', p)
-    except Exception as e:
-        print('Failed to delete', p, e)
+if __name__ == '__main__':
+    args = parse_args('Move work/web/shared HTML renderers into work/web and update links.')
+    if not os.path.isdir(web_shared):
+        print('No work/web/shared directory found; nothing to do')
+        raise SystemExit(1)
 
-print('Done')
+    html_files = [f for f in os.listdir(web_shared) if f.lower().endswith('.html')]
+    print('Found', len(html_files), 'HTML files in work/web/shared')
+    graph = LinkGraph()
+    with args.stats.stage('discover'):
+        graph.update()
+    with args.stats.stage('transform'):
+        writes, deletes = plan(html_files, graph)
+    with args.stats.stage('write'):
+        results = apply(writes, deletes, write=args.write, diff=args.dry_run)
+    args.stats.count('files', len(writes) + len(deletes))
+    if args.write:
+        graph.update()
+        graph.save()
+    print('Done')
+    sys.exit(finish(results, args))
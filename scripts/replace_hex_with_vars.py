@@ -2,8 +2,11 @@
 """
 Replace specific hard-coded hex color values with CSS variable references
 in CSS files across the repo (excluding virtualenv, history, and binary dirs).
+Supports the shared fixer modes (--dry-run, --check, --manifest); see fix_engine.py.
 """
-import os, re
+import os, re, sys
+
+from fix_engine import main, rule
 
 repo = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 exclude_dirs = {'.venv', '.history', 'node_modules', '.git'}
@@ -22,25 +25,24 @@ mapping = {
     '#0c234b0d': 'var(--ua-code-bg)',
 }
 
-css_file_paths = []
-for root, dirs, files in os.walk(repo):
-    # skip excluded dirs
-    parts = set(root.split(os.sep))
-    if parts & exclude_dirs:
-        continue
-    for f in files:
-        if f.lower().endswith('.css'):
-            css_file_paths.append(os.path.join(root,f))
+hex_re = re.compile(r'#([0-9A-Fa-f]{6}|[0-9A-Fa-f]{8}|[0-9A-Fa-f]{3})')
 
-print('Found', len(css_file_paths), 'CSS files to scan')
+RULES = []
 
-hex_re = re.compile(r'#([0-9A-Fa-f]{6}|[0-9A-Fa-f]{8}|[0-9A-Fa-f]{3})')
+def css_files():
+    css_file_paths = []
+    for root, dirs, files in os.walk(repo):
+        # skip excluded dirs
+        parts = set(root.split(os.sep))
+        if parts & exclude_dirs:
+            continue
+        for f in files:
+            if f.lower().endswith('.css'):
+                css_file_paths.append(os.path.join(root,f))
+    return css_file_paths
 
-changed = []
-for path in css_file_paths:
-    with open(path, 'r', encoding='utf-8') as fh:
-        txt = fh.read()
-    orig = txt
+@rule(RULES)
+def hex_to_vars(txt, path):
     # replace only whole hex tokens (lowercase map keys)
     def repl(m):
         h = m.group(0)
@@ -48,13 +50,9 @@ for path in css_file_paths:
         if low in mapping:
             return mapping[low]
         return h
-    txt2 = hex_re.sub(repl, txt)
-    if txt2 != orig:
-        with open(path, 'w', encoding='utf-8') as fh:
-            fh.write(txt2)
-        changed.append(path)
-        print('Patched', path)
-
-print('Done. Files changed:', len(changed))
-for p in changed:
-    print('-', p)
+    return hex_re.sub(repl, txt)
+
+if __name__ == '__main__':
+    files = css_files()
+    print('Found', len(files), 'CSS files to scan')
+    sys.exit(main(RULES, files, description='Replace hard-coded hex colors in CSS with CSS variables.'))
@@ -1,11 +1,18 @@
 #!/usr/bin/env python3
 """
 Replace inline hex color literals in HTML and JS files with CSS variable references.
-The script is conservative: it only replaces a hex when the preceding context (50 chars)
+The script is conservative: it only replaces a hex when the preceding context (60 chars)
 contains a styling keyword (style, color, background, border, fill, stroke, outline).
-Excludes directories: .venv, .history, node_modules, .git
+Excludes directories: .venv, .history, node_modules, .git (pruned during the walk)
+Supports the shared fixer modes (--dry-run, --check, --manifest); see fix_engine.py.
+
+Each file is scanned once with a single combined regex matching both the
+mapped hex values and the styling keywords; files are processed in parallel
+and the run reports its throughput (files/s, MB/s).
 """
-import os, re
+import os, re, sys, time
+
+from fix_engine import finish, parse_args, rule, run
 
 repo = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 exclude_dirs = {'.venv', '.history', 'node_modules', '.git'}
@@ -27,47 +34,57 @@ mapping = {
 keywords = ['style', 'color', 'background', 'border', 'fill', 'stroke', 'outline', 'box-shadow', 'border-left', 'border-color']
 
 file_exts = ('.html', '.htm', '.js', '.jsx', '.ts', '.tsx')
-hex_re = re.compile(r'#([0-9A-Fa-f]{6}|[0-9A-Fa-f]{8}|[0-9A-Fa-f]{3})')
+CONTEXT = 60
+
+# one pass finds keywords and mapped hex values together; longer keys first so
+# '#0c234b0d' is not split into '#0c234b' + '0d', and partial hex tokens never match
+token_re = re.compile(
+    r'(?P<kw>' + '|'.join(re.escape(k) for k in sorted(set(keywords), key=len, reverse=True)) + r')'
+    r'|#(?P<hex>' + '|'.join(re.escape(h[1:]) for h in sorted(mapping, key=len, reverse=True)) + r')(?![0-9A-Fa-f])',
+    re.I)
+
+# where the last keyword inside each keyword starts ('color' in 'border-color'),
+# so a window that cuts a long keyword still sees the keyword at its end
+kw_last_start = {k: max(k.rfind(other) for other in keywords if other in k) for k in keywords}
+
+RULES = []
+
+def source_files():
+    paths = []
+    for root, dirs, files in os.walk(repo):
+        # prune excluded dirs so the walk never descends into them
+        dirs[:] = [d for d in dirs if d not in exclude_dirs]
+        for f in files:
+            if f.lower().endswith(file_exts):
+                paths.append(os.path.join(root, f))
+    return paths
 
-changed_files = []
-for root, dirs, files in os.walk(repo):
-    # skip excluded dirs
-    parts = set(root.split(os.sep))
-    if parts & exclude_dirs:
-        continue
-    for f in files:
-        if not f.lower().endswith(file_exts):
+@rule(RULES)
+def inline_hex_to_vars(txt, path):
+    out = []
+    last = 0
+    # start of the most recent styling keyword; a hex is replaced when one lies
+    # entirely within the CONTEXT characters before it
+    last_kw = -CONTEXT - 1
+    for m in token_re.finditer(txt):
+        if m.group('kw'):
+            last_kw = m.start() + kw_last_start[m.group('kw').lower()]
             continue
-        path = os.path.join(root, f)
-        with open(path, 'r', encoding='utf-8') as fh:
-            try:
-                txt = fh.read()
-            except Exception:
-                continue
-        orig = txt
-        out = []
-        last = 0
-        for m in hex_re.finditer(txt):
-            h = m.group(0)
-            low = h.lower()
-            if low not in mapping:
-                continue
-            start = m.start()
-            context_start = max(0, start-60)
-            ctx = txt[context_start:start].lower()
-            if any(k in ctx for k in keywords):
-                # perform replacement
-                out.append(txt[last:start])
-                out.append(mapping[low])
-                last = m.end()
-        out.append(txt[last:])
-        new_txt = ''.join(out)
-        if new_txt != orig:
-            with open(path, 'w', encoding='utf-8') as fh:
-                fh.write(new_txt)
-            changed_files.append(path)
-            print('Patched', path)
+        start = m.start()
+        if last_kw >= start - CONTEXT:
+            out.append(txt[last:start])
+            out.append(mapping['#' + m.group('hex').lower()])
+            last = m.end()
+    out.append(txt[last:])
+    return ''.join(out)
 
-print('Done. Files changed:', len(changed_files))
-for p in changed_files:
-    print('-', p)
+if __name__ == '__main__':
+    args = parse_args('Replace inline hex colors in HTML/JS with CSS variables.')
+    started = time.perf_counter()
+    files = source_files()
+    results = run(RULES, files, args.jobs, write=args.write, diff=args.dry_run, stats=args.stats)
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    size = sum(os.path.getsize(f) for f in files) / 1e6
+    print('Scanned {} files ({:.1f} MB) in {:.2f}s: {:.0f} files/s, {:.1f} MB/s'.format(
+        len(files), size, elapsed, len(files) / elapsed, size / elapsed))
+    sys.exit(finish(results, args))
@@ -55,7 +55,13 @@ async function run() {
     const webFiles = fs.existsSync(webDir) ? fs.readdirSync(webDir).filter(f => f.endsWith('.html')) : [];
     const docsFiles = fs.existsSync(docsDir) ? fs.readdirSync(docsDir).filter(f => f.endsWith('.html')) : [];
     // Serve as root-relative paths so the static server can resolve from candidate roots
-    const pages = webFiles.map(f => '/' + f).concat(docsFiles.map(f => '/' + f));
+    let pages = webFiles.map(f => '/' + f).concat(docsFiles.map(f => '/' + f));
+    // --pages FILE: only scan the listed paths (e.g. the clean pages from a11y_prescan.py --clean-list)
+    const pagesArg = process.argv.indexOf('--pages');
+    if (pagesArg !== -1 && process.argv[pagesArg + 1]) {
+        const listed = new Set(fs.readFileSync(process.argv[pagesArg + 1], 'utf8').split(/\r?\n/).map(l => l.trim()).filter(Boolean));
+        pages = pages.filter(p => listed.has(p));
+    }
     console.log('Pages to scan:', pages.length);
 
     // Start minimal static server so Playwright can load pages in CI without external setup
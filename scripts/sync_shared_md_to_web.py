@@ -1,14 +1,26 @@
 #!/usr/bin/env python3
 """
 Sync shared markdown into work/web/shared, generate per-md HTML renderers, and update HTML links.
-Run from repository root.
+Run from repository root. Prints the time taken by each stage (--profile adds
+CPU time and counters, see metrics.py).
+
+The link stage asks the link graph index (link_graph.py) which pages
+reference ../shared/ or .md files and only opens those.
+
+By default each renderer loads marked.js from a CDN and renders its .md file
+in the browser. With --prerender the pages are rendered at sync time instead
+(front matter and markdown handled by convert_md_to_static_html.py), so they
+need no JavaScript and make no extra requests.
 """
-import os, shutil, re
+import argparse, html, os, re, sys, time
+
+import metrics
+from file_sync import copy_if_changed, write_atomic, write_if_changed
+from link_graph import LinkGraph
+
 repo = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 work_shared = os.path.join(repo, 'work', 'shared')
 web_shared = os.path.join(repo, 'work', 'web', 'shared')
-# Ensure target
-os.makedirs(web_shared, exist_ok=True)
 # Template for per-file html
 html_template = """<!doctype html>
 <html lang=\"en\">
@@ -55,13 +67,76 @@ html_template = """<!doctype html>
 </body>
 </html>
 """
-# Copy md files and generate html files
-md_files = [f for f in os.listdir(work_shared) if f.lower().endswith('.md')]
-print(f'Found {len(md_files)} md files in {work_shared}')
-for md in md_files:
-    src = os.path.join(work_shared, md)
-    dst_md = os.path.join(web_shared, md)
-    shutil.copyfile(src, dst_md)
+# Template for pre-rendered pages (--prerender): same page, content filled in at sync time
+static_template = """<!doctype html>
+<html lang=\"en\">
+<head>
+  <meta charset=\"utf-8\" />
+  <meta name=\"viewport\" content=\"width=device-width, initial-scale=1\" />
+  <title>{title}</title>
+  <link rel=\"stylesheet\" href=\"../styles.css\" />
+</head>
+<body>
+  <a class=\"skip-link\" href=\"#maincontent\">Skip to main content</a>
+  <header id=\"page-header\"><p><a href=\"../home.html\">Accessibility Home</a> / Docs</p></header>
+  <main id=\"maincontent\" class=\"doc-content\">
+    <article id=\"content\">{content}</article>
+  </main>
+  <footer>
+    <p>&copy; 2025 The University of Arizona.</p>
+  </footer>
+</body>
+</html>
+"""
+def prerender(src):
+    from convert_md_to_static_html import render_parts
+    fm, title, body = render_parts(src)
+    # the marked.js renderer adds the front-matter title as a heading
+    header = '<h1>' + html.escape(str(fm['title'])) + '</h1>\n' if fm.get('title') else ''
+    # links to sibling markdown files (also written ../shared/foo.md) point at
+    # their pre-rendered pages, which sit next to this one in work/web/shared
+    body = re.sub(r'href="(?:\.\./shared/)?([^":/?#]+)\.md(#[^"]*)?"', lambda m: 'href="{}.html{}"'.format(m.group(1), m.group(2) or ''), body)
+    return static_template.replace('{title}', html.escape(str(title)) + ' | Accessibility').replace('{content}', header + body)
+
+# Link rewrites, applied in order: href="../shared/foo.md|html" first, then raw
+# occurrences inside JS strings or other attributes that are not href=...
+WEB_REWRITES = [
+    (re.compile(r"href=(?P<q>[\"'])\.\./shared/(?P<name>[^\"']+?)\.md(?P=q)"), r'href=\g<q>shared/\g<name>.html\g<q>'),
+    (re.compile(r"href=(?P<q>[\"'])\.\./shared/(?P<name>[^\"']+?)\.html(?P=q)"), r'href=\g<q>shared/\g<name>.html\g<q>'),
+    (re.compile(r"\.\./shared/([\w\-]+?)\.md"), r"shared/\1.html"),
+    (re.compile(r"\.\./shared/([\w\-]+?)\.html"), r"shared/\1.html"),
+]
+# docs link to ../work/web/shared/<name>.html
+DOCS_REWRITES = [
+    (re.compile(r"href=(?P<q>[\"'])\.\./shared/(?P<name>[^\"']+?)\.md(?P=q)"), r'href=\g<q>../work/web/shared/\g<name>.html\g<q>'),
+    (re.compile(r"href=(?P<q>[\"'])\.\./shared/(?P<name>[^\"']+?)\.html(?P=q)"), r'href=\g<q>../work/web/shared/\g<name>.html\g<q>'),
+    (re.compile(r"\.\./shared/([\w\-]+?)\.md"), r"../work/web/shared/\1.html"),
+    (re.compile(r"\.\./shared/([\w\-]+?)\.html"), r"../work/web/shared/\1.html"),
+]
+
+def references_md(s):
+    return '.md"' in s or ".md'" in s
+
+def rewrite_links(paths, rewrites):
+    """Read each file once, apply every rewrite and write it back only if it changed.
+
+    Returns (files changed, files still referencing .md).
+    """
+    changed, report = [], []
+    for path in paths:
+        with open(path,'r',encoding='utf-8') as fh:
+            s = fh.read()
+        orig = s
+        for pattern, repl in rewrites:
+            s = pattern.sub(repl, s)
+        if s != orig:
+            write_atomic(path, s)
+            changed.append(path)
+        if references_md(s):
+            report.append(path)
+    return changed, report
+
+def renderer_title(src, md):
     # derive title from frontmatter if present
     title = md.replace('.md','')
     with open(src, 'r', encoding='utf-8') as fh:
@@ -70,102 +145,78 @@ for md in md_files:
         if m:
             ym = re.search(r'^title:\s*(.*)$', m.group(1), re.M)
             if ym:
-                title = ym.group(1).strip().strip('"') + ' | Accessibility'
-    # create html file
-    html_name = md.replace('.md', '.html')
-    dst_html = os.path.join(web_shared, html_name)
-    with open(dst_html, 'w', encoding='utf-8') as out:
-      out.write(html_template.replace('{mdfile}', md).replace('{title}', title))
-print('Copied md files and generated html renderers in work/web/shared')
-
-# Update links in work/web html files
-web_dir = os.path.join(repo, 'work', 'web')
-html_files = []
-for root,dirs,files in os.walk(web_dir):
-    for f in files:
-        if f.lower().endswith('.html'):
-            html_files.append(os.path.join(root,f))
-
-pattern_md = re.compile(r"(href=\"|href=')(?P<prefix>\.\./shared/)(?P<name>[^\"']+?)\.md(?P<suffix>\"|')")
-pattern_md2 = re.compile(r"(href=\"|href=')(?P<prefix>\.\./shared/)(?P<name>[^\"']+?)\.html(?P<suffix>\"|')")
-for path in html_files:
-    with open(path,'r',encoding='utf-8') as fh:
-        s = fh.read()
-    orig = s
-    # Only change links that point to ../shared/*.md or ../shared/*.html to shared/*.html
-    def repl_shared(m):
-      q = m.group('q')
-      name = m.group('name')
-      return f'href={q}shared/{name}.html{q}'
-    s = re.sub(r"href=(?P<q>[\"'])\.\./shared/(?P<name>[^\"']+?)\.md(?P=q)", repl_shared, s)
-    s = re.sub(r"href=(?P<q>[\"'])\.\./shared/(?P<name>[^\"']+?)\.html(?P=q)", repl_shared, s)
-    if s != orig:
-        with open(path,'w',encoding='utf-8') as fh:
-            fh.write(s)
-print('Updated links in work/web HTML files')
-
-# Update links in docs html files to point to ../work/web/shared/<name>.html
-docs_dir = os.path.join(repo, 'docs')
-docs_html = []
-if os.path.isdir(docs_dir):
-    for root,dirs,files in os.walk(docs_dir):
-        for f in files:
-            if f.lower().endswith('.html'):
-                docs_html.append(os.path.join(root,f))
+                title = html.escape(ym.group(1).strip().strip('"')) + ' | Accessibility'
+    return title
 
-for path in docs_html:
-    with open(path,'r',encoding='utf-8') as fh:
-        s = fh.read()
-    orig = s
-    def repl_docs(m):
-      q = m.group('q')
-      name = m.group('name')
-      return f'href={q}../work/web/shared/{name}.html{q}'
-    s = re.sub(r"href=(?P<q>[\"'])\.\./shared/(?P<name>[^\"']+?)\.md(?P=q)", repl_docs, s)
-    s = re.sub(r"href=(?P<q>[\"'])\.\./shared/(?P<name>[^\"']+?)\.html(?P=q)", repl_docs, s)
-    if s != orig:
-        with open(path,'w',encoding='utf-8') as fh:
-            fh.write(s)
-print('Updated links in docs HTML files')
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Sync shared markdown into work/web/shared and update links.')
+    ap.add_argument('--prerender', action='store_true', help='write pre-rendered HTML pages instead of marked.js renderers')
+    metrics.add_arguments(ap)
+    args = ap.parse_args(argv)
+    stats = metrics.from_args('sync_shared_md_to_web', args)
+    # Ensure target
+    os.makedirs(web_shared, exist_ok=True)
 
-# Also replace raw occurrences inside JS strings or other attributes that are not href=...
-for path in html_files:
-    with open(path,'r',encoding='utf-8') as fh:
-        s = fh.read()
-    orig = s
-    # ../shared/foo.md -> shared/foo.html
-    s = re.sub(r"\.\./shared/([\w\-]+?)\.md", r"shared/\1.html", s)
-    s = re.sub(r"\.\./shared/([\w\-]+?)\.html", r"shared/\1.html", s)
-    if s != orig:
-        with open(path,'w',encoding='utf-8') as fh:
-            fh.write(s)
+    # Copy md files and generate html files
+    start = time.perf_counter()
+    with stats.stage('discover'):
+        md_files = [f for f in os.listdir(work_shared) if f.lower().endswith('.md')]
+    print(f'Found {len(md_files)} md files in {work_shared}')
+    # identical targets are left untouched so unchanged files keep their mtime
+    written = 0
+    with stats.stage('write'):
+        for md in md_files:
+            src = os.path.join(work_shared, md)
+            dst_md = os.path.join(web_shared, md)
+            written += copy_if_changed(src, dst_md)
+            # create html file
+            html_name = md.replace('.md', '.html')
+            dst_html = os.path.join(web_shared, html_name)
+            if args.prerender:
+                page = prerender(src)
+            else:
+                page = html_template.replace('{mdfile}', md).replace('{title}', renderer_title(src, md))
+            written += write_if_changed(dst_html, page)
+    stats.count('files', len(md_files))
+    stats.count('files_written', written)
+    print('Copied md files and generated', 'pre-rendered pages' if args.prerender else 'html renderers',
+          'in work/web/shared ({} of {} files written, {:.3f}s)'.format(written, 2 * len(md_files), time.perf_counter() - start))
 
-for path in docs_html:
-    with open(path,'r',encoding='utf-8') as fh:
-        s = fh.read()
-    orig = s
-    s = re.sub(r"\.\./shared/([\w\-]+?)\.md", r"../work/web/shared/\1.html", s)
-    s = re.sub(r"\.\./shared/([\w\-]+?)\.html", r"../work/web/shared/\1.html", s)
-    if s != orig:
-        with open(path,'w',encoding='utf-8') as fh:
-            fh.write(s)
-print('Rewrote raw ../shared/*.md occurrences in work/web and docs HTML files')
+    # Update links in work/web and docs html files in one pass, collecting remaining .md references
+    start = time.perf_counter()
+    web_dir = os.path.join(repo, 'work', 'web')
+    docs_dir = os.path.join(repo, 'docs')
+    graph = LinkGraph()
+    with stats.stage('discover'):
+        graph.update()
+        # only pages referencing ../shared/ can change
+        html_files = graph.mentioning('../shared/', web_dir)
+        docs_html = graph.mentioning('../shared/', docs_dir)
+    with stats.stage('transform'):
+        web_changed, web_report = rewrite_links(html_files, WEB_REWRITES)
+        docs_changed, docs_report = rewrite_links(docs_html, DOCS_REWRITES)
+    report = web_report + docs_report
+    # pages that were not rewritten only need a look if they reference .md files
+    with stats.stage('read'):
+        for path in graph.mentioning('.md'):
+            if path not in html_files and path not in docs_html:
+                with open(path,'r',encoding='utf-8') as fh:
+                    if references_md(fh.read()):
+                        report.append(path)
+    with stats.stage('write'):
+        graph.update()
+        graph.save()
+    stats.count('pages_indexed', len(graph.pages))
+    stats.count('pages_rewritten', len(web_changed) + len(docs_changed))
+    print('Updated links in {} of {} work/web and {} of {} docs HTML files referencing ../shared/ ({} pages indexed, {:.3f}s)'.format(
+        len(web_changed), len(html_files), len(docs_changed), len(docs_html), len(graph.pages), time.perf_counter() - start))
 
-# Final scan: collect any occurrences of .md in HTML files under work/web and docs
-report = []
-for root in [web_dir, docs_dir]:
-    if not root or not os.path.isdir(root):
-        continue
-    for r,ds,fs in os.walk(root):
-        for f in fs:
-            if f.lower().endswith('.html'):
-                p = os.path.join(r,f)
-                with open(p,'r',encoding='utf-8') as fh:
-                    t = fh.read()
-                if '.md"' in t or ".md'" in t:
-                    report.append(p)
+    print('Files still referencing .md in HTML:')
+    for p in sorted(report):
+        print('-', p)
+    print('Done')
+    stats.finish()
+    return 0
 
-print('Files still referencing .md in HTML:')
-for p in report:
-    print('-', p)
-print('Done')
+if __name__ == '__main__':
+    sys.exit(main())
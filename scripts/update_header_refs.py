@@ -2,53 +2,66 @@
 """
 Update HTML pages in `work/web` and `docs` to reference the single shared
 `scripts/header.js` file. Remove duplicate local header.js files if present.
+Only the pages the link graph index (link_graph.py) lists as loading a local
+header.js are opened.
 
 Usage: python3 scripts/update_header_refs.py
 """
-from pathlib import Path
 import sys
+from pathlib import Path
 
-repo = Path(__file__).resolve().parents[1]
-work_web = repo / 'work' / 'web'
-docs = repo / 'docs'
+from fix_engine import DOCS, WORK_WEB, Result, finish, parse_args, rule, run, unified_diff
+from link_graph import LinkGraph
 
-def replace_in_dir(directory, rel_path_to_scripts):
-    modified = []
-    for p in sorted(directory.glob('*.html')):
-        txt = p.read_text(encoding='utf-8')
-        changed = False
-        # Replace script include if it references a local header.js
-        old = '<script src="header.js" defer></script>'
-        new = f'<script src="{rel_path_to_scripts}/header.js" defer></script>'
-        if old in txt and new not in txt:
-            txt = txt.replace(old, new)
-            changed = True
-        # Also handle cases without defer/spaces variations conservatively
-        if 'src="header.js"' in txt and f'src="{rel_path_to_scripts}/header.js"' not in txt:
-            txt = txt.replace('src="header.js"', f'src="{rel_path_to_scripts}/header.js"')
-            changed = True
-        if changed:
-            p.write_text(txt, encoding='utf-8')
-            modified.append(str(p))
-    return modified
+RULES = []
+# relative path from each tree to the repo's scripts/ directory
+SCRIPTS_PATHS = {DOCS: '../scripts', WORK_WEB: '../../scripts'}
 
-print('Updating docs HTML to reference ../scripts/header.js')
-docs_modified = replace_in_dir(docs, '../scripts')
-print('Updating work/web HTML to reference ../../scripts/header.js')
-web_modified = replace_in_dir(work_web, '../../scripts')
+def in_site_tree(path):
+    return Path(path).parent in SCRIPTS_PATHS
 
-print('Docs modified:', len(docs_modified))
-for m in docs_modified: print(' -', m)
-print('Work/web modified:', len(web_modified))
-for m in web_modified: print(' -', m)
+@rule(RULES, applies=in_site_tree)
+def shared_header_script(txt, path):
+    rel_path_to_scripts = SCRIPTS_PATHS[Path(path).parent]
+    # Replace script include if it references a local header.js
+    old = '<script src="header.js" defer></script>'
+    new = f'<script src="{rel_path_to_scripts}/header.js" defer></script>'
+    if old in txt and new not in txt:
+        txt = txt.replace(old, new)
+    # Also handle cases without defer/spaces variations conservatively
+    if 'src="header.js"' in txt and f'src="{rel_path_to_scripts}/header.js"' not in txt:
+        txt = txt.replace('src="header.js"', f'src="{rel_path_to_scripts}/header.js"')
+    return txt
 
-# Remove local copies if they exist
-for local in [work_web / 'header.js', docs / 'header.js']:
-    if local.exists():
-        try:
-            local.unlink()
-            print('Removed local header file:', local)
-        except Exception as e:
-            print('Failed to remove', local, e)
+def remove_local_copies(write=True, diff=False):
+    # Remove local copies if they exist
+    results = []
+    for local in [WORK_WEB / 'header.js', DOCS / 'header.js']:
+        if not local.exists():
+            continue
+        patch = unified_diff(local, local.read_text(encoding='utf-8'), '') if diff else None
+        if write:
+            try:
+                local.unlink()
+                print('Removed local header file:', local)
+            except Exception as e:
+                print('Failed to remove', local, e)
+                continue
+        results.append(Result(str(local), 'delete', ['remove_local_copies'], patch))
+    return results
 
-print('Done.')
+if __name__ == '__main__':
+    args = parse_args('Point pages at the shared scripts/header.js.')
+    print('Updating docs HTML to reference ../scripts/header.js')
+    print('Updating work/web HTML to reference ../../scripts/header.js')
+    graph = LinkGraph()
+    with args.stats.stage('discover'):
+        graph.update()
+        files = [p for tree in SCRIPTS_PATHS for p in graph.linked_from(tree / 'header.js') if in_site_tree(p)]
+    results = run(RULES, files, args.jobs, write=args.write, diff=args.dry_run, stats=args.stats)
+    results += remove_local_copies(args.write, args.dry_run)
+    if args.write:
+        graph.update()
+        graph.save()
+    print('Done.')
+    sys.exit(finish(results, args))
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# the scripts import their sibling modules by name
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'scripts'))
@@ -0,0 +1,45 @@
+import pytest
+
+from contrast_audit import composite, contrast_matrix, contrast_ratio, hex_to_rgb
+
+def test_hex_to_rgb_forms():
+    assert hex_to_rgb('#fff') == (255, 255, 255, 1)
+    assert hex_to_rgb('#0c234b') == (12, 35, 75, 1)
+    assert hex_to_rgb('#0008') == (0, 0, 0, 0x88 / 255)
+    assert hex_to_rgb('#0c234b0d') == (12, 35, 75, 13 / 255)
+    with pytest.raises(ValueError):
+        hex_to_rgb('#12345')
+
+def test_contrast_ratio_extremes():
+    assert contrast_ratio(hex_to_rgb('#000'), hex_to_rgb('#fff')) == pytest.approx(21)
+    assert contrast_ratio(hex_to_rgb('#777'), hex_to_rgb('#777')) == pytest.approx(1)
+
+def test_composite():
+    white = (255, 255, 255, 1)
+    assert composite((12, 35, 75, 1), white) == (12, 35, 75, 1)
+    assert composite((0, 0, 0, 0), white) == white
+    assert composite((0, 0, 0, 0.5), white) == (128, 128, 128, 1)
+    assert composite(hex_to_rgb('#0c234b0d'), white) == (243, 244, 246, 1)
+
+def pair_ratio(fg, bg, backdrop=(255, 255, 255, 1)):
+    bg = composite(hex_to_rgb(bg), backdrop)
+    return contrast_ratio(composite(hex_to_rgb(fg), bg), bg)
+
+def test_matrix_matches_pairwise_compositing():
+    colors = {'navy': '#0c234b', 'tint': '#0c234b0d', 'red': '#ab0520', 'veil': '#00000080', 'white': '#fff'}
+    names, ratio, masks = contrast_matrix(colors)
+    assert names == sorted(colors)
+    for i, fg in enumerate(names):
+        for j, bg in enumerate(names):
+            assert ratio[i][j] == pytest.approx(pair_ratio(colors[fg], colors[bg]))
+    assert masks['aa_normal'][names.index('navy')][names.index('white')]
+    # the translucent tint vanishes over navy but is near-white over the white backdrop
+    assert ratio[names.index('tint')][names.index('navy')] == pytest.approx(1)
+    assert ratio[names.index('navy')][names.index('tint')] > 12
+
+def test_matrix_backdrop():
+    colors = {'veil': '#00000080', 'white': '#fff'}
+    black = (0, 0, 0, 1)
+    names, ratio, _ = contrast_matrix(colors, backdrop=black)
+    assert ratio[names.index('white')][names.index('veil')] == pytest.approx(pair_ratio('#fff', '#00000080', black))
+    assert ratio[names.index('white')][names.index('veil')] == pytest.approx(21)
@@ -0,0 +1,62 @@
+from fix_engine import rule
+from html_rewriter import Tag, parse_attrs, rewrite, start_tags
+
+def tags(text, names=None):
+    warnings = []
+    found = [(name, raw) for _, name, raw in start_tags(text, names, warnings.append)]
+    return found, warnings
+
+def test_quotes_hide_gt_and_other_quotes():
+    found, warnings = tags('<a title="1 > 0" data-x=\'say "hi"\' href=x.html>link</a>')
+    assert found == [('a', '<a title="1 > 0" data-x=\'say "hi"\' href=x.html>')]
+    assert warnings == []
+
+def test_quote_inside_unquoted_value_is_literal():
+    found, _ = tags('<a href=it\'s.html>x</a><b>')
+    assert [name for name, _ in found] == ['a', 'b']
+    assert parse_attrs(found[0][1], 'a') == [('href', "it's.html")]
+
+def test_quoted_value_runs_to_its_closing_quote():
+    found, _ = tags('<img alt="a>\n<b c="d">')
+    assert found == [('img', '<img alt="a>\n<b c="d">')]
+
+def test_unterminated_quote_ends_at_next_gt():
+    found, warnings = tags('<p>\n<img alt="broken src=x.png>\n<main id=m>')
+    assert found == [('p', '<p>'), ('img', '<img alt="broken src=x.png>'), ('main', '<main id=m>')]
+    assert len(warnings) == 1 and warnings[0].startswith('line 2:')
+
+def test_comments_scripts_and_names():
+    text = '<!-- <main> --><script>if (a<b) x = "<main>";</script><main><nav>'
+    assert tags(text)[0] == [('script', '<script>'), ('main', '<main>'), ('nav', '<nav>')]
+    assert tags(text, {'main'})[0] == [('main', '<main>')]
+
+def test_parse_attrs_unescapes_and_lowercases():
+    raw = '<a HREF="a.html?x=1&amp;y=2" hidden data-v=1>'
+    assert parse_attrs(raw, 'a') == [('href', 'a.html?x=1&y=2'), ('hidden', None), ('data-v', '1')]
+
+def test_set_escapes_and_keeps_quotes():
+    tag = Tag('a', [('title', 'x')], "<a title='x'>")
+    tag.set('title', 'a "quoted" & <b>')
+    assert tag.raw == "<a title='a &quot;quoted&quot; &amp; &lt;b&gt;'>"
+    tag.set('aria-label', "it's", first=True)
+    assert tag.raw.startswith('<a aria-label="it&#x27;s" ')
+
+def test_set_bare_and_self_closing():
+    tag = Tag('input', [('hidden', None)], '<input hidden />')
+    tag.set('hidden', 'hidden')
+    tag.set('type', 'text')
+    assert tag.raw == '<input hidden="hidden" type="text" />'
+
+def test_rewrite_only_touches_changed_tags():
+    rules = []
+
+    @rule(rules, tags=('main',))
+    def main_landmark(tag, path):
+        if not tag.has('role'):
+            tag.set('role', 'main')
+
+    text = '<body>\n<MAIN  class="x">\n<main role="main"></main></MAIN></body>'
+    out, hits = rewrite(text, rules, 'page.html')
+    assert out == '<body>\n<MAIN  class="x" role="main">\n<main role="main"></main></MAIN></body>'
+    assert hits == ['main_landmark']
+    assert rewrite(out, rules, 'page.html') == (out, [])
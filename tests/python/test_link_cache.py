@@ -0,0 +1,76 @@
+import pytest
+
+from link_cache import LinkCache, normalize_url, parse_age
+from link_check import crawl
+from link_fetch import serve_directory
+
+@pytest.fixture
+def cache(tmp_path):
+    c = LinkCache(tmp_path / 'cache.sqlite', max_age=3600)
+    yield c
+    c.close()
+
+def test_parse_age():
+    assert parse_age('90') == 90
+    assert parse_age('90m') == 5400
+    assert parse_age(' 1.5h ') == 5400
+    assert parse_age('7d') == 7 * 86400
+    with pytest.raises(ValueError):
+        parse_age('soon')
+
+def test_normalize_url():
+    assert normalize_url('HTTPS://Example.EDU:443#top') == 'https://example.edu/'
+    assert normalize_url('http://example.edu:8080/a?b=1#c') == 'http://example.edu:8080/a?b=1'
+
+def test_put_get_and_ttl(cache):
+    assert cache.get('https://example.edu/') is None
+    cache.put('https://example.edu/', 200, etag='"v1"')
+    entry = cache.get('https://EXAMPLE.edu/#x')
+    assert (entry['status'], entry['etag'], entry['last_modified']) == (200, '"v1"', None)
+    assert cache.is_fresh(entry)
+    assert cache.is_fresh(entry, now=entry['checked_at'] + 3599)
+    assert not cache.is_fresh(entry, now=entry['checked_at'] + 3600)
+
+def test_validators_and_touch(cache):
+    cache.put('https://example.edu/a', 200, etag='"v1"', last_modified='Mon, 06 Oct 2025 00:00:00 GMT')
+    entry = cache.get('https://example.edu/a')
+    assert cache.validators(entry) == {'If-None-Match': '"v1"', 'If-Modified-Since': 'Mon, 06 Oct 2025 00:00:00 GMT'}
+    assert cache.validators({'etag': None, 'last_modified': None}) == {}
+    cache.db.execute('UPDATE links SET checked_at = 0')
+    assert not cache.is_fresh(cache.get('https://example.edu/a'))
+    cache.touch('https://example.edu/a')
+    touched = cache.get('https://example.edu/a')
+    assert cache.is_fresh(touched)
+    assert (touched['status'], touched['etag']) == (200, '"v1"')
+
+def test_crawl_reuses_and_revalidates(tmp_path):
+    (tmp_path / 'ext').mkdir()
+    (tmp_path / 'ext' / 'page.html').write_text('<p>external</p>', encoding='utf-8')
+    ext_server, ext_root = serve_directory(tmp_path / 'ext')
+    (tmp_path / 'site').mkdir()
+    (tmp_path / 'site' / 'index.html').write_text(
+        '<a href="{0}page.html">ok</a> <a href="{0}gone.html">gone</a>'.format(ext_root), encoding='utf-8')
+    site_server, site_root = serve_directory(tmp_path / 'site')
+    path = tmp_path / 'cache.sqlite'
+
+    def run(max_age):
+        cache = LinkCache(path, max_age=max_age)
+        try:
+            return crawl(site_root + 'index.html', cache=cache)
+        finally:
+            cache.close()
+    try:
+        _, broken, stats = run(3600)
+        assert [(url, code) for url, code, _ in broken] == [(ext_root + 'gone.html', 404)]
+        assert (stats['fetched'], stats['cached'], stats['revalidated']) == (2, 0, 0)
+        # fresh: nothing is fetched again
+        _, broken_again, stats = run(3600)
+        assert broken_again == broken
+        assert (stats['fetched'], stats['cached']) == (0, 2)
+        # stale: the page revalidates with If-Modified-Since (304), the 404 is re-fetched
+        _, broken_again, stats = run(0)
+        assert broken_again == broken
+        assert (stats['fetched'], stats['cached'], stats['revalidated']) == (2, 0, 1)
+    finally:
+        site_server.shutdown()
+        ext_server.shutdown()
@@ -0,0 +1,53 @@
+import os
+
+import link_graph
+from link_graph import LinkGraph, page_refs, resolve_ref
+
+def test_quoted_and_unquoted_attributes():
+    text = '<a href="a.html#top">a</a> <a href=b.html>b</a> <link rel=stylesheet href=\'c.css\'>'
+    assert page_refs(text) == ['a.html', 'b.html', 'c.css']
+
+def test_entities_in_attributes_are_decoded():
+    assert page_refs('<a href="x.html?a=1&amp;b=2">x</a>') == ['x.html']
+    assert page_refs('<a href="../shared/do&#45;dont.md">x</a>') == ['../shared/do-dont.md']
+
+def test_scripts_styles_and_comments():
+    text = ('<script>const f = "../shared/faq.md"; load(`docs/a.js`)</script>'
+            '<style>@import url(theme.css);</style><!-- old: legacy.html -->')
+    assert page_refs(text) == ['../shared/faq.md', 'docs/a.js', 'legacy.html', 'theme.css']
+
+def test_text_and_other_extensions():
+    assert page_refs('<p>See notes.txt or index.html.</p><img src=logo.png>') == ['index.html']
+    assert page_refs('<link href="styles.css?v=2">') == ['styles.css']
+
+def test_long_token_is_linear():
+    assert page_refs('<script>' + 'x' * 200000 + '.js</script>') == ['x' * 200000 + '.js']
+
+def test_resolve_ref():
+    assert resolve_ref('work/web/a.html', '../shared/b.md#x') == 'work/shared/b.md'
+    assert resolve_ref('work/web/a.html', 'c.html?q=1') == 'work/web/c.html'
+    assert resolve_ref('docs/a.html', '/work/web/index.html') == 'work/web/index.html'
+    assert resolve_ref('docs/a.html', 'https://example.edu/x.html') is None
+    assert resolve_ref('docs/a.html', '//cdn.example.edu/x.js') is None
+    assert resolve_ref('docs/a.html', '#top') is None
+
+def test_graph_update_and_reverse(tmp_path, monkeypatch):
+    monkeypatch.setattr(link_graph, 'repo', tmp_path)
+    web = tmp_path / 'work' / 'web'
+    web.mkdir(parents=True)
+    (web / 'a.html').write_text('<a href=b.html>b</a>', encoding='utf-8')
+    (web / 'b.html').write_text('<a href="../shared/faq.md">faq</a>', encoding='utf-8')
+    index = tmp_path / 'graph.json'
+    graph = LinkGraph(index, dirs=[web])
+    assert len(graph.update()) == 2
+    graph.save()
+    assert graph.linked_from(web / 'b.html') == [str(web / 'a.html')]
+    assert graph.mentioning('../shared/') == [str(web / 'b.html')]
+
+    graph = LinkGraph(index, dirs=[web])
+    assert graph.update() == []
+    (web / 'a.html').write_text('<a href=c.html>c</a>', encoding='utf-8')
+    os.utime(web / 'a.html', ns=(1, 1))
+    assert graph.update() == [str(web / 'a.html')]
+    assert graph.linked_from(web / 'b.html') == []
+    assert graph.linked_from(web / 'c.html') == [str(web / 'a.html')]